@@ -1,6 +1,5 @@
 # assemble_from_videos.py
-import shutil
-import os, random, math, subprocess, tempfile, json
+import os, random, math, subprocess, tempfile, json, time
 from glob import glob
 from typing import List, Dict, Tuple
 from moviepy.editor import AudioFileClip, VideoFileClip, concatenate_videoclips, CompositeAudioClip
@@ -13,8 +12,15 @@ import tempfile, os
 
 import re
 import unicodedata
+import hashlib
+
+from concurrent.futures import ThreadPoolExecutor
 
 from make_kb_videos import ken_burns_clip
+import encoding_profile
+from file_utils import concat_copy
+import media_probe
+import title_card_cache
 
 _FORBIDDEN_WIN = re.compile(r'[<>:"/\\|?*\x00-\x1F]')  # forbidden + control chars
 _WS = re.compile(r"\s+")
@@ -155,9 +161,10 @@ def _make_title_card_ffmpeg(
     fade_out = fade_in
     fade_out_start = max(dur - fade_out, 0.0)
 
-    # write title to a UTF-8 file (FFmpeg reads it correctly)
-    tmp_txt = os.path.join(tempfile.gettempdir(), f"title_{os.getpid()}.txt")
-    with open(tmp_txt, "w", encoding="utf-8") as f:
+    # write title to a UTF-8 file (FFmpeg reads it correctly); one file per call,
+    # cards may be rendered on several threads at once
+    fd, tmp_txt = tempfile.mkstemp(prefix="title_", suffix=".txt")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
         f.write(title)
 
     # escape only for *paths* inside filtergraph
@@ -194,6 +201,45 @@ def _make_title_card_ffmpeg(
     except:
         pass
 
+
+def _title_cards_cached(titles: List[str], w: int, h: int, fps: int, dur: float, workers: int | None = None, **style) -> List[str]:
+    """
+    Title-card MP4 for each title, served from title_card_cache; cards not cached
+    yet are rendered in parallel (TITLE_CARD_WORKERS, default 4). `style` takes
+    the keyword arguments of _make_title_card_ffmpeg (fontfile, bg, fontsize, ...).
+    """
+    keys = [title_card_cache.make_key(t, w, h, fps, dur, **style) for t in titles]
+    paths = [title_card_cache.get(k) for k in keys]
+    misses = {}
+    for i, k in enumerate(keys):
+        if paths[i] is None:
+            misses.setdefault(k, titles[i])  # repeated titles render once
+
+    def _render(key, title):
+        tmp = title_card_cache.temp_path(key)
+        try:
+            _make_title_card_ffmpeg(out_path=str(tmp), title=title, w=w, h=h, fps=fps, dur=dur, **style)
+            return title_card_cache.commit(key, tmp)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    print(f"[TitleCards] {len(titles)} cards: {len(titles) - sum(1 for p in paths if p is None)} cached, {len(misses)} to render")
+    if misses:
+        workers = max(1, min(workers or int(os.getenv("TITLE_CARD_WORKERS", "4")), len(misses)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            rendered = dict(zip(misses, pool.map(lambda kt: _render(*kt), misses.items())))
+        paths = [p or rendered[k] for p, k in zip(paths, keys)]
+
+    title_card_cache.evict(keep=paths)
+    return paths
+
+# Hierarchical re-encode concat: at most CONCAT_GROUP_SIZE inputs (decoders) per
+# ffmpeg, CONCAT_WORKERS of them at a time, so peak memory / open files stay flat
+# however long the playlist is.
+CONCAT_GROUP_SIZE = int(os.getenv("CONCAT_GROUP_SIZE", "16"))
+CONCAT_WORKERS = int(os.getenv("CONCAT_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // 4)
+
 def _ffmpeg_concat_reencode(
     plan,
     out_path: str,
@@ -203,6 +249,8 @@ def _ffmpeg_concat_reencode(
     keep_audio: bool,
     crf: int = 18,
     preset: str = "veryfast",
+    group_size: int | None = None,
+    workers: int | None = None,
 ):
     """
     Concatenate clips via FFmpeg filter concat.
@@ -210,10 +258,47 @@ def _ffmpeg_concat_reencode(
 
     - If use_d < full_d: trims to use_d.
     - If use_d > full_d: extends LAST FRAME to reach use_d (and pads audio if kept).
+
+    Plans longer than group_size are encoded in groups (in parallel) to one
+    uniform intermediate profile, then joined with file_utils.concat_copy.
     """
     if not _bin_exists("ffmpeg"):
         raise RuntimeError("ffmpeg not found in PATH; cannot concatenate with re-encode.")
+    if not plan:
+        raise RuntimeError("Concat plan is empty.")
+
+    group_size = max(2, group_size or CONCAT_GROUP_SIZE)
+    if len(plan) <= group_size:
+        return _ffmpeg_concat_reencode_group(plan, out_path, fps, w, h, keep_audio, crf, preset)
+
+    groups = [plan[i:i + group_size] for i in range(0, len(plan), group_size)]
+    workers = max(1, min(workers or CONCAT_WORKERS, len(groups)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"[Concat] {len(plan)} clips -> {len(groups)} groups of <= {group_size}, {workers} at a time")
+
+    with tempfile.TemporaryDirectory(prefix="__tmp_groups_", dir=os.path.dirname(out_path) or ".") as td:
+        group_paths = [os.path.join(td, f"group_{i:04d}.mp4") for i in range(len(groups))]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(
+                lambda gp: _ffmpeg_concat_reencode_group(gp[0], gp[1], fps, w, h, keep_audio, crf, preset, threads),
+                zip(groups, group_paths),
+            ))
+
+        # Groups share one encoding profile
+        concat_copy(group_paths, out_path, keep_audio=keep_audio)
 
+def _ffmpeg_concat_reencode_group(
+    plan,
+    out_path: str,
+    fps: int,
+    w: int,
+    h: int,
+    keep_audio: bool,
+    crf: int = 18,
+    preset: str = "veryfast",
+    threads: int = 0,
+):
+    """One ffmpeg: every plan item as an input, one filter-graph concat (see _ffmpeg_concat_reencode)."""
     tiny = 0.02
     n = len(plan)
     if n == 0:
@@ -273,7 +358,9 @@ def _ffmpeg_concat_reencode(
     if keep_audio:
         cmd += ["-map", "[aout]"]
 
-    cmd += ["-r", str(fps), "-c:v", "libx264", "-crf", str(crf), "-preset", preset]
+    cmd += ["-r", str(fps), "-c:v", "libx264", "-crf", str(crf), "-preset", preset, "-pix_fmt", "yuv420p"]
+    if threads:
+        cmd += ["-threads", str(threads)]
     if keep_audio:
         cmd += ["-c:a", "aac", "-b:a", "192k"]
     else:
@@ -284,6 +371,252 @@ def _ffmpeg_concat_reencode(
     subprocess.run(cmd, check=True)
 
 
+# --------------------------
+# Selective normalization concat
+# --------------------------
+# Encoders able to reproduce a reference stream for the concat demuxer
+_VIDEO_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+_AUDIO_ENCODERS = {"aac": "aac", "mp3": "libmp3lame", "opus": "libopus"}
+# ffprobe profile name -> encoder -profile:v
+_VIDEO_PROFILES = {
+    "h264": {"Baseline": "baseline", "Constrained Baseline": "baseline", "Main": "main", "High": "high",
+             "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444"},
+    "hevc": {"Main": "main", "Main 10": "main10"},
+}
+# NAL unit types carrying parameter sets (H.264: SPS/PPS, HEVC: VPS/SPS/PPS)
+_PARAM_NAL_TYPES = {"h264": ({7, 8}, lambda b: b & 0x1F), "hevc": ({32, 33, 34}, lambda b: (b >> 1) & 0x3F)}
+
+_param_sets_cache: Dict[Tuple, bytes | None] = {}
+
+def _parameter_sets(path: str, codec: str) -> bytes | None:
+    """
+    The stream's parameter-set NAL units (SPS/PPS, + VPS for HEVC), as found before
+    its first frame in Annex B form; None if they can't be read.
+
+    Stream-copied segments must share these byte for byte: the concat demuxer's MP4
+    output keeps a single avcC/hvcC (the first file's), so a clip with the same
+    codec/size/fps but another encoder's SPS/PPS decodes as garbage after the switch.
+    """
+    if codec not in _PARAM_NAL_TYPES:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if key in _param_sets_cache:
+        return _param_sets_cache[key]
+
+    cmd = ["ffmpeg", "-v", "error", "-i", path, "-map", "0:v:0", "-c:v", "copy",
+           "-bsf:v", f"{codec}_mp4toannexb", "-frames:v", "1", "-f", codec, "-"]
+    p = subprocess.run(cmd, capture_output=True)
+    result = None
+    if p.returncode == 0 and p.stdout:
+        types, nal_type = _PARAM_NAL_TYPES[codec]
+        nals = [n.rstrip(b"\x00") for n in p.stdout.split(b"\x00\x00\x01")]
+        params = [n for n in nals if n and nal_type(n[0]) in types]
+        result = b"\x00\x00\x01".join(params) or None
+    _param_sets_cache[key] = result
+    return result
+
+def _encoder_profile_args(ref_stream: Dict) -> List[str]:
+    """-profile:v / -level matching the reference stream, where the encoder can express them."""
+    codec = ref_stream.get("codec_name")
+    args = []
+    prof = _VIDEO_PROFILES.get(codec, {}).get(ref_stream.get("profile"))
+    if prof:
+        args += ["-profile:v", prof]
+    level = ref_stream.get("level")
+    if codec == "h264" and level and level > 0:
+        args += ["-level", f"{level / 10:.1f}"]
+    return args
+
+def _normalize_clip(
+    in_path: str,
+    out_path: str,
+    full_d: float,
+    use_d: float,
+    ref_stream: Dict,
+    audio_ref: Tuple | None,
+    has_audio: bool,
+    crf: int = 18,
+    preset: str = "veryfast",
+):
+    """
+    Re-encode one clip to the reference profile (codec/size/fps/pix_fmt, and the
+    reference audio codec/rate/channels when audio_ref is given), trimmed or
+    last-frame-extended to use_d like _ffmpeg_concat_reencode does.
+    Clips without audio get silence so every segment has the same streams.
+    """
+    tiny = 0.02
+    w, h = ref_stream["width"], ref_stream["height"]
+    extra = max(0.0, float(use_d) - float(full_d))
+
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-nostats", "-loglevel", "error", "-i", in_path]
+    vchain = "[0:v]setpts=PTS-STARTPTS"
+    if extra > tiny:
+        vchain += f",tpad=stop_mode=clone:stop_duration={extra:.3f}"
+    vchain += (
+        f",trim=duration={use_d:.3f},setpts=PTS-STARTPTS,"
+        f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+        f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,"
+        f"setsar=1,fps={ref_stream['avg_frame_rate']},format={ref_stream['pix_fmt']}[v]"
+    )
+    fc = [vchain]
+    maps = ["-map", "[v]"]
+    out_args = ["-c:v", _VIDEO_ENCODERS[ref_stream["codec_name"]], "-crf", str(crf), "-preset", preset,
+                "-pix_fmt", ref_stream["pix_fmt"], *_encoder_profile_args(ref_stream)]
+
+    if audio_ref:
+        a_codec, a_rate, a_channels = audio_ref
+        if has_audio:
+            achain = "[0:a]asetpts=PTS-STARTPTS"
+            if extra > tiny:
+                achain += ",apad"
+        else:
+            cmd += ["-f", "lavfi", "-i", f"anullsrc=r={a_rate}:cl=stereo"]
+            achain = "[1:a]anull"
+        achain += f",atrim=duration={use_d:.3f},asetpts=PTS-STARTPTS,aresample={a_rate}[a]"
+        fc.append(achain)
+        maps += ["-map", "[a]"]
+        out_args += ["-c:a", _AUDIO_ENCODERS[a_codec], "-b:a", "192k", "-ar", str(a_rate), "-ac", str(a_channels or 2)]
+    else:
+        out_args += ["-an"]
+
+    cmd += ["-filter_complex", ";".join(fc), *maps, *out_args, "-movflags", "+faststart", out_path]
+    p = subprocess.run(cmd, capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(f"ffmpeg normalize failed for {in_path}:\n{(p.stderr or '').strip()}")
+    return out_path
+
+def _ffmpeg_concat_smart(
+    plan,
+    out_path: str,
+    fps: int,
+    w: int,
+    h: int,
+    keep_audio: bool,
+    records: Dict[str, Dict] | None = None,
+    crf: int = 18,
+    preset: str = "veryfast",
+    profile=None,
+):
+    """
+    Concatenate plan items (path, full_d, use_d) re-encoding only what has to be:
+      - the dominant codec/size/fps/pix_fmt (+ audio codec/rate/channels when
+        keep_audio) profile among the clips is the reference
+      - clips already in that profile, with the reference's exact parameter sets
+        (see _parameter_sets) and played in full are used as-is
+      - outliers (other profile, other encoder, missing audio, trimmed/extended)
+        are re-encoded to it, with the reference's codec profile/level; if their
+        parameter sets still differ from the reference's, every clip is re-encoded
+      - everything is joined with file_utils.concat_copy (video stream-copied)
+    Falls back to _ffmpeg_concat_reencode (w/h/fps) when the reference profile
+    can't be reproduced. Returns the reference stream info dict (None on fallback).
+
+    A draft encoding profile normalizes every clip to its (smaller) size / fps instead.
+    """
+    if not _bin_exists("ffmpeg"):
+        raise RuntimeError("ffmpeg not found in PATH; cannot concatenate.")
+    tiny = 0.02
+    if not plan:
+        raise RuntimeError("Concat plan is empty.")
+
+    records = dict(records or {})
+    missing = [p for p, _, _ in plan if p not in records]
+    if missing:
+        records.update(_probe_inputs(missing))
+    if keep_audio and not any(records[p]["has_audio"] for p, _, _ in plan):
+        keep_audio = False
+
+    prof = encoding_profile.get(profile)
+    preset, crf = prof.x264(preset, crf)
+
+    def _key(p):
+        r = records[p]
+        return (r["profile"], r["audio_profile"] if keep_audio else None)
+
+    if prof.is_draft:
+        # Draft: every clip is normalized to a small synthetic reference instead
+        dw, dh = prof.size(w, h)
+        ref_stream = {"codec_name": "h264", "width": dw, "height": dh,
+                      "avg_frame_rate": str(prof.frame_rate(fps)), "pix_fmt": "yuv420p"}
+        audio_ref = ("aac", 48000, 2) if keep_audio else None
+        ref_params = None
+        outliers = list(range(len(plan)))
+        print(f"[Concat] {prof.name} profile: normalizing {len(plan)} clips to {dw}x{dh}, {prof.frame_rate(fps)} fps")
+    else:
+        # Dominant profile: most clips, then most seconds
+        weight = {}
+        for p, _full_d, use_d in plan:
+            k = _key(p)
+            if k[0] is None or (keep_audio and k[1] is None):
+                continue
+            n, secs = weight.get(k, (0, 0.0))
+            weight[k] = (n + 1, secs + float(use_d))
+        ref_key = max(weight, key=weight.get) if weight else None
+        if (
+            ref_key is None
+            or ref_key[0][0] not in _VIDEO_ENCODERS
+            or (keep_audio and ref_key[1][0] not in _AUDIO_ENCODERS)
+        ):
+            print(f"[Concat] no reproducible reference profile ({ref_key}); re-encoding everything")
+            _ffmpeg_concat_reencode(plan, out_path=out_path, fps=fps, w=w, h=h, keep_audio=keep_audio, crf=crf, preset=preset)
+            return None
+
+        codec = ref_key[0][0]
+        candidates = [
+            i for i, (p, full_d, use_d) in enumerate(plan)
+            if _key(p) == ref_key and abs(float(use_d) - float(full_d)) <= tiny
+        ]
+        cand_paths = list(dict.fromkeys(plan[i][0] for i in candidates))
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(cand_paths) or 1))) as pool:
+            params = dict(zip(cand_paths, pool.map(lambda p: _parameter_sets(p, codec), cand_paths)))
+
+        # Reference: the most common parameter sets among the copyable clips
+        counts = {}
+        for i in candidates:
+            ps = params[plan[i][0]]
+            if ps:
+                counts[ps] = counts.get(ps, 0) + 1
+        ref_params = max(counts, key=counts.get) if counts else None
+        copies = {i for i in candidates if ref_params and params[plan[i][0]] == ref_params}
+        ref_path = plan[min(copies)][0] if copies else next(p for p, _, _ in plan if _key(p) == ref_key)
+        ref_stream = records[ref_path]["stream"]
+        audio_ref = ref_key[1] if keep_audio else None
+        outliers = [i for i in range(len(plan)) if i not in copies]
+        print(f"[Concat] reference {ref_key[0]}; {len(copies)}/{len(plan)} clips stream-copied, "
+              f"{len(outliers)} normalized")
+
+    with tempfile.TemporaryDirectory(prefix="__tmp_norm_", dir=os.path.dirname(out_path) or ".") as td:
+        seg_paths = [p for p, _, _ in plan]
+
+        def _normalize(i):
+            p, full_d, use_d = plan[i]
+            return _normalize_clip(
+                p, os.path.join(td, f"{i:05d}.mp4"), full_d, use_d, ref_stream,
+                audio_ref, records[p]["has_audio"], crf=crf, preset=preset,
+            )
+
+        def _normalize_all(indices):
+            with ThreadPoolExecutor(max_workers=max(1, min(CONCAT_WORKERS, len(indices)))) as pool:
+                for i, norm_path in zip(indices, pool.map(_normalize, indices)):
+                    seg_paths[i] = norm_path
+
+        if outliers:
+            _normalize_all(outliers)
+            copied = [i for i in range(len(plan)) if i not in outliers]
+            if copied and _parameter_sets(seg_paths[outliers[0]], ref_stream["codec_name"]) != ref_params:
+                # Our encode can't reproduce the source encoder's SPS/PPS: mixing them
+                # would break decoding at the switches, so normalize the rest as well
+                print(f"[Concat] re-encoded clips don't match the reference parameter sets; "
+                      f"normalizing the other {len(copied)} clips too")
+                _normalize_all(copied)
+
+        concat_copy(seg_paths, out_path, keep_audio=keep_audio)
+    return ref_stream
+
+
 def _ffmpeg_concat_reencode_old_working(
     plan,
     out_path: str,
@@ -641,28 +974,8 @@ def _ffprobe_stream_info(path: str) -> Dict:
     Return primary video stream info as a dict:
     {codec_name, width, height, avg_frame_rate (string), pix_fmt}
     """
-    try:
-        out = subprocess.check_output([
-            "ffprobe", "-v", "error",
-            "-select_streams", "v:0",
-            "-show_entries", "stream=codec_name,width,height,avg_frame_rate,pix_fmt",
-            "-of", "json",
-            path
-        ], universal_newlines=True)
-        data = json.loads(out)
-        streams = data.get("streams", [])
-        if not streams:
-            return {}
-        s = streams[0]
-        return {
-            "codec_name": s.get("codec_name"),
-            "width": s.get("width"),
-            "height": s.get("height"),
-            "avg_frame_rate": s.get("avg_frame_rate"),
-            "pix_fmt": s.get("pix_fmt"),
-        }
-    except Exception:
-        return {}
+    info = media_probe.try_probe(path)
+    return info.video_stream_info() if info else {}
 
 def split_video(input_path,  max_duration=180):
     print("✅ Received split_video Arguments:", locals())
@@ -737,90 +1050,105 @@ def convert_landscape_to_portrait(
 
 def _ffprobe_duration(path: str) -> float:
     """Return duration in seconds using ffprobe (format duration)."""
+    d = media_probe.duration(path)
+    if d is not None:
+        return d
+    # MoviePy fallback (slower but robust)
     try:
-        out = subprocess.check_output([
-            "ffprobe", "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
-            path
-        ], universal_newlines=True).strip()
-        return float(out)
+        return float(VideoFileClip(path).duration)
     except Exception:
-        # MoviePy fallback (slower but robust)
-        try:
-            return float(VideoFileClip(path).duration)
-        except Exception:
-            return 0.0
+        return 0.0
 
 def _has_audio_stream(path: str) -> bool:
+    return media_probe.has_audio(path)
+    
+def _concat_profile(info: Dict) -> Tuple | None:
+    """(codec, width, height, fps, pix_fmt) of a stream-info dict; None if any field is missing."""
+    if not info or not all(info.get(k) for k in ["codec_name","width","height","avg_frame_rate","pix_fmt"]):
+        return None
+    # Normalize avg_frame_rate textual forms (e.g., "30000/1001" vs "29.97")
+    afr = info["avg_frame_rate"]
     try:
-        out = subprocess.check_output([
-            "ffprobe", "-v", "error",
-            "-select_streams", "a:0",
-            "-show_entries", "stream=codec_type",
-            "-of", "json",
-            path
-        ], universal_newlines=True)
-        data = json.loads(out)
-        return bool(data.get("streams"))
+        if "/" in afr:
+            n, d = afr.split("/")
+            afr_float = float(n) / float(d) if float(d) != 0 else 0.0
+        else:
+            afr_float = float(afr)
     except Exception:
-        return False
-    
-def _can_safe_concat(video_paths: List[str]) -> Tuple[bool, str]:
+        afr_float = 0.0
+    return (info["codec_name"], info["width"], info["height"], round(afr_float, 3), info["pix_fmt"])
+
+def _probe_inputs(paths: List[str], workers: int | None = None) -> Dict[str, Dict]:
+    """
+    Planning stage: probe every unique file once, concurrently (media_probe.probe_many)
+    and return one record per path:
+      {"duration": float (0.0 if unreadable), "has_audio": bool,
+       "stream": primary video stream info dict, "profile": _concat_profile(stream),
+       "audio_profile": (codec, sample_rate, channels) of the first audio stream or None}
+    """
+    t0 = time.time()
+    infos = media_probe.probe_many(paths, max_workers=workers)
+    records = {}
+    for p, info in infos.items():
+        d = info.duration if info else None
+        if d is None:
+            d = _ffprobe_duration(p)  # MoviePy fallback
+        stream = info.video_stream_info() if info else {}
+        a = info.audio if info else None
+        records[p] = {
+            "duration": float(d or 0.0),
+            "has_audio": a is not None,
+            "stream": stream,
+            "profile": _concat_profile(stream),
+            "audio_profile": (a.codec_name, a.sample_rate, a.channels) if a and a.sample_rate else None,
+        }
+    print(f"[Plan] probed {len(records)} files in {time.time() - t0:.2f}s")
+    return records
+
+def _dominant_stream(paths: List[str], records: Dict[str, Dict]) -> Dict:
+    """Stream info of the most common concat profile among `paths` ({} if none is readable)."""
+    counts = {}
+    for p in paths:
+        prof = records[p]["profile"]
+        if prof is not None:
+            counts.setdefault(prof, [0, p])[0] += 1
+    if not counts:
+        return {}
+    _, ref_path = max(counts.values(), key=lambda c: c[0])
+    return records[ref_path]["stream"]
+
+def _can_safe_concat(video_paths: List[str], records: Dict[str, Dict] | None = None) -> Tuple[bool, str]:
     """
     Check if all videos share the same codec/resolution/fps/pix_fmt,
     which is required for FFmpeg concat with -c:v copy.
+    `records` (from _probe_inputs) avoids probing the files again.
     """
     if not _bin_exists("ffmpeg") or not _bin_exists("ffprobe"):
         return False, "FFmpeg/FFprobe not available"
+    if records is None:
+        records = _probe_inputs(video_paths)
 
     ref = None
     for p in video_paths:
-        info = _ffprobe_stream_info(p)
-        if not info or not all(info.get(k) for k in ["codec_name","width","height","avg_frame_rate","pix_fmt"]):
+        prof = records[p]["profile"]
+        if prof is None:
             return False, f"Missing stream info for: {os.path.basename(p)}"
 
-        # Normalize avg_frame_rate textual forms (e.g., "30000/1001" vs "29.97")
-        afr = info["avg_frame_rate"]
-        if afr and "/" in afr:
-            n, d = afr.split("/")
-            try:
-                afr_float = float(n) / float(d) if float(d) != 0 else 0.0
-            except Exception:
-                afr_float = 0.0
-        else:
-            try:
-                afr_float = float(afr)
-            except Exception:
-                afr_float = 0.0
-        info["_afr_float"] = afr_float
-
         if ref is None:
-            ref = info
+            ref = prof
             continue
 
-        same = (
-            info["codec_name"] == ref["codec_name"] and
-            info["width"] == ref["width"] and
-            info["height"] == ref["height"] and
-            info["pix_fmt"] == ref["pix_fmt"] and
-            abs(info["_afr_float"] - ref["_afr_float"]) < 1e-3
-        )
+        same = prof[:3] == ref[:3] and prof[4] == ref[4] and abs(prof[3] - ref[3]) < 1e-3
         if not same:
             reason = (
                 f"Mismatch: {os.path.basename(p)} "
-                f"(codec={info['codec_name']}, size={info['width']}x{info['height']}, "
-                f"fps≈{info['_afr_float']:.3f}, pix_fmt={info['pix_fmt']}) "
-                f"vs ref (codec={ref['codec_name']}, size={ref['width']}x{ref['height']}, "
-                f"fps≈{ref['_afr_float']:.3f}, pix_fmt={ref['pix_fmt']})"
+                f"(codec={prof[0]}, size={prof[1]}x{prof[2]}, fps≈{prof[3]:.3f}, pix_fmt={prof[4]}) "
+                f"vs ref (codec={ref[0]}, size={ref[1]}x{ref[2]}, fps≈{ref[3]:.3f}, pix_fmt={ref[4]})"
             )
             return False, reason
 
     return True, "All inputs match (codec/size/fps/pix_fmt)"
 
-# --------------------------
-# Discovery helpers
-# --------------------------
 def _find_audio(audio_folder: str) -> str:
     audio_exts = ("*.mp3","*.wav","*.m4a","*.aac","*.flac","*.ogg")
     files = []
@@ -1057,7 +1385,8 @@ def _make_slowed_clip_to_duration(
     fps: int,
     w: int,
     h: int,
-    keep_audio: bool
+    keep_audio: bool,
+    profile=None,
 ):
     """
     Create a temporary re-encoded clip whose *playback* duration becomes target_dur
@@ -1093,7 +1422,7 @@ def _make_slowed_clip_to_duration(
     else:
         cmd += ["-an"]
 
-    cmd += ["-c:v", "libx264", "-preset", "veryfast", "-crf", "18", out_path]
+    cmd += ["-c:v", "libx264", *encoding_profile.get(profile).x264_args("veryfast", 18), out_path]
     _run_cmd(cmd)
 
 def _make_looped_audio(
@@ -1262,39 +1591,32 @@ def assemble_videos_new(
 
         # Build an expanded list of segments:
         # clip1, title(for clip2), clip2, title(for clip3), clip3, ...
-        temp_dir = os.path.join(os.path.dirname(output_path) or ".", "__tmp_titlecards")
-        os.makedirs(temp_dir, exist_ok=True)
-
+        # Cards come from the persistent title-card cache (title_card_cache.py)
         section_title_map = _try_load_section_titles_from_order_xlsx(video_folder)
 
-        segments = [video_paths[0]]
-        for i in range(1, len(video_paths)):
-            next_clip = video_paths[i]
-            
-            # next_title = _infer_title_from_path(next_clip)
-
+        titles = []
+        for next_clip in video_paths[1:]:
             # Prefer section_title from order.xlsx (if present), else fallback to filename inference
             base = os.path.basename(next_clip)
             next_title = section_title_map.get(base) or _infer_title_from_path(next_clip)
+            titles.append(f"{title_prefix} {next_title}".strip())
 
-
-            card_path = os.path.join(temp_dir, f"title_{i:03d}.mp4")
-
-            _make_title_card_ffmpeg(
-                out_path=card_path,
-                title=f"{title_prefix} {next_title}".strip(),
-                w=out_w,
-                h=out_h,
-                fps=fps,
-                dur=breathing_sec,
-                bg=title_bg,
-                fontfile=title_fontfile,
-                fontsize=title_font_size,
-                fontcolor=title_text_color,
-                box_alpha=title_box_alpha,
-                box_border=title_box_border,
-                fade_sec=title_fade_sec,
-            )
+        card_paths = _title_cards_cached(
+            titles,
+            w=out_w,
+            h=out_h,
+            fps=fps,
+            dur=breathing_sec,
+            bg=title_bg,
+            fontfile=title_fontfile,
+            fontsize=title_font_size,
+            fontcolor=title_text_color,
+            box_alpha=title_box_alpha,
+            box_border=title_box_border,
+            fade_sec=title_fade_sec,
+        )
+        segments = [video_paths[0]]
+        for card_path, next_clip in zip(card_paths, video_paths[1:]):
             segments.append(card_path)
             segments.append(next_clip)
 
@@ -1337,17 +1659,10 @@ def assemble_videos_new(
 
         # If no BG audio, finalize by moving tmp_concat to output_path
         if not bg_audio_path:
-            try:
-                if os.path.abspath(tmp_concat) != os.path.abspath(output_path):
-                    if os.path.exists(output_path):
-                        os.remove(output_path)
-                    os.replace(tmp_concat, output_path)
-            finally:
-                # Cleanup temp title cards
-                try:
-                    shutil.rmtree(temp_dir, ignore_errors=True)
-                except:
-                    pass
+            if os.path.abspath(tmp_concat) != os.path.abspath(output_path):
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                os.replace(tmp_concat, output_path)
             print(f"[OK] Saved: {output_path}")
             return output_path
 
@@ -1404,10 +1719,6 @@ def assemble_videos_new(
                     os.remove(p)
             except:
                 pass
-        try:
-            shutil.rmtree(temp_dir, ignore_errors=True)
-        except:
-            pass
 
         print(f"[OK] Saved: {output_path}")
         return output_path
@@ -2006,6 +2317,52 @@ def _make_kenburns_tail_mp4(last_frame_png: str, out_mp4: str, dur: float, w: in
 # --------------------------
 # Main assembly
 # --------------------------
+# Clip orders saved by draft renders, keyed by output path. Kept outside the
+# output folder: routes clear edit_vid_output between the draft and the final.
+DRAFT_ORDER_DIR = os.getenv(
+    "DRAFT_ORDER_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "draft_orders"),
+)
+
+def _draft_order_path(output_path: str) -> str:
+    key = hashlib.sha1(os.path.abspath(output_path).encode("utf-8")).hexdigest()
+    return os.path.join(DRAFT_ORDER_DIR, f"{key}.json")
+
+def _reuse_draft_order(output_path: str, video_paths: List[str], prof) -> List[str]:
+    """
+    Draft and final renders of one output share a plan: a draft saves its clip
+    order (DRAFT_ORDER_DIR); the next final render of that output plays them in
+    that order (and consumes the file) instead of reshuffling. Raises
+    RuntimeError if the final render's clips differ from the draft's.
+    """
+    side = _draft_order_path(output_path)
+    if prof.is_draft:
+        os.makedirs(DRAFT_ORDER_DIR, exist_ok=True)
+        with open(side, "w", encoding="utf-8") as f:
+            json.dump({"output": os.path.abspath(output_path),
+                       "videos": [os.path.abspath(p) for p in video_paths]}, f, ensure_ascii=False, indent=2)
+        return video_paths
+    try:
+        with open(side, "r", encoding="utf-8") as f:
+            saved = json.load(f)["videos"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return video_paths
+    by_abs = {os.path.abspath(p): p for p in video_paths}
+    if len(by_abs) != len(video_paths) or sorted(saved) != sorted(by_abs):
+        added = sorted(set(by_abs) - set(saved))
+        missing = sorted(set(saved) - set(by_abs))
+        raise RuntimeError(
+            f"Clips changed since the draft render of {output_path} "
+            f"({len(added)} added, {len(missing)} missing, e.g. {(added + missing)[:3]}). "
+            f"Render a new draft, or delete {side} to render without its order."
+        )
+    try:
+        os.remove(side)
+    except OSError:
+        pass
+    print("[Plan] reusing the clip order of the draft render")
+    return [by_abs[p] for p in saved]
+
 def assemble_videos(
     video_folder: str,
     audio_folder: str,
@@ -2023,10 +2380,12 @@ def assemble_videos(
     clear_output_dir: bool = False,
     use_bg_audio: bool = True,
     video_paths_override: list[str] | None = None,    
+    render_profile: str | None = None,
 ):
     """
     If bg audio exists -> match bg-audio duration (existing behavior).
     If bg audio is missing/empty -> just merge the clips (still supports ffmpeg concat fallback).
+    render_profile: "final" / "draft" (encoding_profile.py); None -> RENDER_PROFILE.
     """
 
     # print("Received assemble_videos Arguments:", locals())
@@ -2059,6 +2418,12 @@ def assemble_videos(
     if shuffle and len(video_paths) > 1:
         random.shuffle(video_paths)
 
+    prof = encoding_profile.get(render_profile)
+    video_paths = _reuse_draft_order(output_path, video_paths, prof)
+
+    # Planning: probe every clip once, concurrently (duration / audio / concat profile)
+    records = _probe_inputs(video_paths)
+
     # Try to load bg audio (optional now)
     # audio_path = _try_find_audio(audio_folder)
     audio_path = _try_find_audio(audio_folder) if use_bg_audio else None
@@ -2093,8 +2458,8 @@ def assemble_videos(
     # -------------------------------------------------------------------------
     if breathing_mode == "title_card":
         # Probe first clip to set output canvas (w/h). We keep a stable canvas for all title cards.
-        # v0 = _ffprobe_stream_info(video_paths[0], stream_type="v:0")
-        v0 = _ffprobe_stream_info(video_paths[0])
+        # Canvas of the most common clip profile, so cards match the clips they sit between
+        v0 = _dominant_stream(video_paths, records) or records[video_paths[0]]["stream"]
 
         if not v0:
             raise RuntimeError(f"Could not ffprobe first video: {video_paths[0]}")
@@ -2115,33 +2480,28 @@ def assemble_videos(
 
         # Build an expanded list of segments:
         # clip1, title(for clip2), clip2, title(for clip3), clip3, ...
-        temp_dir = os.path.join(os.path.dirname(output_path) or ".", "__tmp_titlecards")
-        os.makedirs(temp_dir, exist_ok=True)
-
+        # Cards come from the persistent title-card cache (title_card_cache.py)
+        titles = [f"{title_prefix} {_infer_title_from_path(p)}".strip() for p in video_paths[1:]]
+        card_w, card_h = prof.size(out_w, out_h)
+        card_paths = _title_cards_cached(
+            titles,
+            w=card_w,
+            h=card_h,
+            fps=prof.frame_rate(fps),
+            dur=breathing_sec,
+            bg=title_bg,
+            fontfile=title_fontfile,
+            fontsize=title_font_size,
+            fontcolor=title_text_color,
+            box_alpha=title_box_alpha,
+            box_border=title_box_border,
+            fade_sec=title_fade_sec,
+        )
         segments = [video_paths[0]]
-        for i in range(1, len(video_paths)):
-            next_clip = video_paths[i]
-            next_title = _infer_title_from_path(next_clip)
-            card_path = os.path.join(temp_dir, f"title_{i:03d}.mp4")          
-
-
-            _make_title_card_ffmpeg(
-                out_path=card_path,
-                title=f"{title_prefix} {next_title}".strip(),
-                w=out_w,
-                h=out_h,
-                fps=fps,
-                dur=breathing_sec,
-                bg=title_bg,
-                fontfile=title_fontfile,
-                fontsize=title_font_size,
-                fontcolor=title_text_color,
-                box_alpha=title_box_alpha,
-                box_border=title_box_border,
-                fade_sec=title_fade_sec,
-            )
+        for card_path, next_clip in zip(card_paths, video_paths[1:]):
             segments.append(card_path)
             segments.append(next_clip)
+        records.update(_probe_inputs(card_paths))
 
         # If we are keeping clip audio, ensure each segment has audio.
         # Title cards DO have silent audio, but real clips might not.
@@ -2155,7 +2515,7 @@ def assemble_videos(
         #             )
         if keep_video_audio:
             for p in segments:
-                if not _has_audio_stream(p):
+                if not records[p]["has_audio"]:
                     raise RuntimeError(
                         f"Input segment has no audio stream but keep_video_audio=True:\n  {p}\n"
                         "Fix: re-export that clip with audio, OR set keep_video_audio=False."
@@ -2165,35 +2525,30 @@ def assemble_videos(
         tmp_concat = os.path.join(os.path.dirname(output_path) or ".", "__tmp_concat.mp4")
         plan = []
         for p in segments:
-            d = _ffprobe_duration(p)
+            d = records[p]["duration"]
             if d <= 0.02:
                 continue
             # plan.append((p, d, d))
             plan.append((p, d, _target_duration(p, d)))
 
-        _ffmpeg_concat_reencode(
+        _ffmpeg_concat_smart(
             plan=plan,
             out_path=tmp_concat,
             fps=fps,
             w=out_w,
             h=out_h,
             keep_audio=keep_video_audio,
+            records=records,
+            profile=prof,
         )
 
 
         # If no BG audio, finalize by moving tmp_concat to output_path
         if not audio_path:
-            try:
-                if os.path.abspath(tmp_concat) != os.path.abspath(output_path):
-                    if os.path.exists(output_path):
-                        os.remove(output_path)
-                    os.replace(tmp_concat, output_path)
-            finally:
-                # Cleanup temp title cards
-                try:
-                    shutil.rmtree(temp_dir, ignore_errors=True)
-                except:
-                    pass
+            if os.path.abspath(tmp_concat) != os.path.abspath(output_path):
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                os.replace(tmp_concat, output_path)
             print(f"[OK] Saved: {output_path}")
             return output_path
 
@@ -2250,10 +2605,6 @@ def assemble_videos(
                     os.remove(p)
             except:
                 pass
-        try:
-            shutil.rmtree(temp_dir, ignore_errors=True)
-        except:
-            pass
 
         print(f"[OK] Saved: {output_path}")
         return output_path
@@ -2272,7 +2623,7 @@ def assemble_videos(
         # Probe a real source clip to get stable canvas size BEFORE we generate KB tails
         probe_src = None
         for _p in video_paths:
-            _d0 = _ffprobe_duration(_p)
+            _d0 = records[_p]["duration"]
             if _d0 and _d0 > tiny:
                 probe_src = _p
                 break
@@ -2282,7 +2633,7 @@ def assemble_videos(
                 except: pass
             raise RuntimeError("All candidate videos are zero-length or unreadable.")
 
-        v0 = _ffprobe_stream_info(probe_src)
+        v0 = records[probe_src]["stream"]
         if not v0:
             if audio:
                 try: audio.close()
@@ -2303,7 +2654,7 @@ def assemble_videos(
         # Build plan using each video once (in manifest order), applying duration overrides
         plan = []
         for p in video_paths:
-            d = _ffprobe_duration(p)
+            d = records[p]["duration"]
             if d <= tiny:
                 continue
             use_d = _target_duration(p, d)
@@ -2329,7 +2680,8 @@ def assemble_videos(
                     fps=fps,
                     w=out_w,
                     h=out_h,
-                    keep_audio=keep_video_audio
+                    keep_audio=keep_video_audio,
+                    profile=prof,
                 )
 
                 temp_speed_assets.append(slowed_mp4)
@@ -2370,13 +2722,15 @@ def assemble_videos(
         tmp_concat = os.path.join(os.path.dirname(output_path) or ".", "__tmp_durconcat.mp4")
 
         # Build the video with trim/extend behavior
-        _ffmpeg_concat_reencode(
+        _ffmpeg_concat_smart(
             plan=plan,
             out_path=tmp_concat,
             fps=fps,
             w=out_w,
             h=out_h,
             keep_audio=keep_video_audio,
+            records=records,
+            profile=prof,
         )
 
         # If no bg audio: finalize
@@ -2496,7 +2850,7 @@ def assemble_videos(
             tiny = 0.02
             plan = []
             for p in video_paths:
-                d = _ffprobe_duration(p)
+                d = records[p]["duration"]
                 if d > tiny:
                     plan.append((p, d, d))
 
@@ -2525,32 +2879,23 @@ def assemble_videos(
             subprocess.run(cmd, check=True)
             return
 
-        # Multi-clip: attempt ffmpeg concat if safe (stream copy)
+        # Multi-clip: copy what already matches the dominant profile, normalize the rest
         if prefer_ffmpeg_concat and _bin_exists("ffmpeg"):
-            can_concat, reason = _can_safe_concat(video_paths)
-            if can_concat:
-                with tempfile.TemporaryDirectory() as td:
-                    list_txt = os.path.join(td, "list.txt")
-                    with open(list_txt, "w", encoding="utf-8") as f:
-                        for p in video_paths:
-                            safe_p = p.replace("'", r"'\''")
-                            f.write(f"file '{safe_p}'\n")
-
-                    cmd = [
-                        "ffmpeg", "-y",
-                        "-f", "concat", "-safe", "0",
-                        "-i", list_txt,
-                        "-c", "copy",
-                    ]
-                    if not keep_video_audio:
-                        cmd += ["-an"]
-                    cmd += [output_path]
-
-                    print("▶ Concat (no bg audio):", " ".join(cmd))
-                    subprocess.run(cmd, check=True)
+            tiny = 0.02
+            plan = [(p, records[p]["duration"], records[p]["duration"]) for p in video_paths if records[p]["duration"] > tiny]
+            if plan:
+                v0 = records[plan[0][0]]["stream"]
+                _ffmpeg_concat_smart(
+                    plan=plan,
+                    out_path=output_path,
+                    fps=fps,
+                    w=int(v0.get("width") or 1920),
+                    h=int(v0.get("height") or 1080),
+                    keep_audio=keep_video_audio,
+                    records=records,
+                    profile=prof,
+                )
                 return
-            else:
-                print(f"[Info] Falling back to MoviePy (concat not safe): {reason}")
 
         # MoviePy fallback (robust)
         clips = []
@@ -2604,7 +2949,7 @@ def assemble_videos(
     tiny = 0.02
     durations, valid_paths = [], []
     for p in video_paths:
-        d = _ffprobe_duration(p)
+        d = records[p]["duration"]
         if d > tiny:
             valid_paths.append(p)
             durations.append(d)
@@ -2648,70 +2993,63 @@ def assemble_videos(
         subprocess.run(cmd, check=True)
         return
 
-    # Try high-performance ffmpeg concat path
-    if prefer_ffmpeg_concat:
-        can_concat, reason = _can_safe_concat(valid_paths)
-        if can_concat:
-            audio.close()
-            with tempfile.TemporaryDirectory() as td:
-                list_txt = os.path.join(td, "list.txt")
-                with open(list_txt, "w", encoding="utf-8") as f:
-                    for (p, _, _) in plan:
-                        safe_p = p.replace("'", r"'\''")
-                        f.write(f"file '{safe_p}'\n")
+    # High-performance ffmpeg concat path: stream-copy the clips that match the
+    # dominant profile, normalize only the outliers (and the trimmed last clip)
+    if prefer_ffmpeg_concat and _bin_exists("ffmpeg"):
+        audio.close()
+        with tempfile.TemporaryDirectory() as td:
+            temp_concat = os.path.join(td, "concat.mp4")
 
-                temp_concat = os.path.join(td, "concat.mp4")
+            v0 = records[valid_paths[0]]["stream"]
+            _ffmpeg_concat_smart(
+                plan=plan,
+                out_path=temp_concat,
+                fps=fps,
+                w=int(v0.get("width") or 1920),
+                h=int(v0.get("height") or 1080),
+                keep_audio=keep_video_audio,
+                records=records,
+                profile=prof,
+            )
 
-                # Concat with both video+audio (if present), stream copy
-                cmd_concat = [
+            has_v_audio = _has_audio_stream(temp_concat)
+
+            if not keep_video_audio or not has_v_audio:
+                # Only bg audio
+                cmd_mux = [
                     "ffmpeg", "-y",
-                    "-f", "concat", "-safe", "0",
-                    "-i", list_txt,
-                    "-c", "copy",
-                    temp_concat,
+                    "-i", temp_concat,
+                    "-i", audio_path,
+                    "-map", "0:v:0", "-map", "1:a:0",
+                    "-c:v", "copy",
+                    "-c:a", "aac", "-b:a", "192k",
+                    "-shortest",
+                    output_path,
+                ]
+            else:
+                # Mix concat audio + bg
+                fc = (
+                    f"[0:a]volume={video_volume}[v0];"
+                    f"[1:a]volume={bg_volume}[a1];"
+                    f"[v0][a1]amix=inputs=2:normalize=1[aout]"
+                )
+                cmd_mux = [
+                    "ffmpeg", "-y",
+                    "-i", temp_concat,
+                    "-i", audio_path,
+                    "-filter_complex", fc,
+                    "-map", "0:v:0", "-map", "[aout]",
+                    "-c:v", "copy",
+                    "-c:a", "aac", "-b:a", "192k",
+                    "-shortest",
+                    output_path,
                 ]
-                subprocess.run(cmd_concat, check=True)
-
-                has_v_audio = _has_audio_stream(temp_concat)
-
-                if not keep_video_audio or not has_v_audio:
-                    # Only bg audio
-                    cmd_mux = [
-                        "ffmpeg", "-y",
-                        "-i", temp_concat,
-                        "-i", audio_path,
-                        "-map", "0:v:0", "-map", "1:a:0",
-                        "-c:v", "copy",
-                        "-c:a", "aac", "-b:a", "192k",
-                        "-shortest",
-                        output_path,
-                    ]
-                else:
-                    # Mix concat audio + bg
-                    fc = (
-                        f"[0:a]volume={video_volume}[v0];"
-                        f"[1:a]volume={bg_volume}[a1];"
-                        f"[v0][a1]amix=inputs=2:normalize=1[aout]"
-                    )
-                    cmd_mux = [
-                        "ffmpeg", "-y",
-                        "-i", temp_concat,
-                        "-i", audio_path,
-                        "-filter_complex", fc,
-                        "-map", "0:v:0", "-map", "[aout]",
-                        "-c:v", "copy",
-                        "-c:a", "aac", "-b:a", "192k",
-                        "-shortest",
-                        output_path,
-                    ]
 
-                print("▶ Concat+Mux:", " ".join(cmd_mux))
-                subprocess.run(cmd_mux, check=True)
-            return
-        else:
-            print(f"[Info] Falling back to MoviePy (concat not safe): {reason}")
+            print("▶ Concat+Mux:", " ".join(cmd_mux))
+            subprocess.run(cmd_mux, check=True)
+        return
 
-    # MoviePy fallback (non-uniform inputs)
+    # MoviePy fallback (ffmpeg concat disabled/unavailable)
     clips = []
     try:
         for (p, full_d, use_d) in plan:
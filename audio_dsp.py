@@ -0,0 +1,339 @@
+# audio_dsp.py — vectorized DSP core for auto_mix (numpy only, no scipy/numba)
+#
+# Drop-in replacements for the per-sample Python loops in auto_mix:
+#   - biquad():          block-based transposed direct form II biquad
+#   - moving_average():  cumsum box filter == np.convolve(x, ones/w, "same")
+#   - soft_knee_gr_db(): vectorized soft-knee gain-reduction curve
+#   - envelope_follow(): attack/release one-pole follower
+#
+# Run `python audio_dsp.py` to check against the reference loops and time them.
+import time
+import numpy as np
+
+# ---------------------------
+# Reference (sample-by-sample) implementations — golden outputs
+# ---------------------------
+def _biquad_ref(b, a, x):
+    y = np.zeros_like(x)
+    if x.ndim == 1:
+        z1 = z2 = 0.0
+        for n in range(len(x)):
+            y[n] = b[0]*x[n] + z1
+            z1_new = b[1]*x[n] - a[1]*y[n] + z2
+            z2 = b[2]*x[n] - a[2]*y[n]
+            z1 = z1_new
+    else:
+        z1 = np.zeros(x.shape[1]); z2 = np.zeros(x.shape[1])
+        for n in range(x.shape[0]):
+            y[n, :] = b[0]*x[n, :] + z1
+            z1_new = b[1]*x[n, :] - a[1]*y[n, :] + z2
+            z2 = b[2]*x[n, :] - a[2]*y[n, :]
+            z1 = z1_new
+    return y
+
+def _soft_knee_gr_db_ref(lvl, thr_db, ratio, knee_db):
+    k0 = thr_db - knee_db/2; k1 = thr_db + knee_db/2
+    def gr_db(L):
+        if L < k0: over = 0.0
+        elif L > k1: over = L - thr_db
+        else:
+            t = (L - k0)/knee_db; over = t*t*(knee_db/2.0)
+        return 0.0 if over <= 0 else over - over/ratio
+    return np.array([gr_db(L) for L in lvl])
+
+def _envelope_follow_ref(x, atk, rel, y0=0.0):
+    sm = np.zeros_like(x); prev = y0
+    for i, g in enumerate(x):
+        c = atk if g > prev else rel
+        prev = c*prev + (1-c)*g
+        sm[i] = prev
+    return sm
+
+# ---------------------------
+# Box filter
+# ---------------------------
+def moving_average(x, win):
+    """Centered box average, same output as np.convolve(x, np.ones(win)/win, mode='same')."""
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[0]
+    if win <= 1:
+        return x.copy()
+    if n < win:
+        return np.convolve(x, np.ones(win)/win, mode="same")
+    csum = np.concatenate([[0.0], np.cumsum(x)])
+    # 'same' keeps full-convolution outputs j = (win-1)//2 ... (win-1)//2 + n - 1,
+    # each the sum of x[j-win+1 .. j] clipped to the signal.
+    j = np.arange(n) + (win - 1)//2
+    hi = np.minimum(j + 1, n)
+    lo = np.maximum(j + 1 - win, 0)
+    out = (csum[hi] - csum[lo]) / win
+    # cumsum differences can go a hair below zero on silent, non-negative input
+    return np.maximum(out, 0.0) if np.all(x >= 0) else out
+
+# ---------------------------
+# Biquad
+# ---------------------------
+def _biquad_zero_input(b, a, n):
+    """Responses to unit initial states (z1=1) and (z2=1) with zero input."""
+    g1 = np.zeros(n); g2 = np.zeros(n)
+    for g, (z1, z2) in ((g1, (1.0, 0.0)), (g2, (0.0, 1.0))):
+        for i in range(n):
+            y = z1
+            z1, z2 = -a[1]*y + z2, -a[2]*y
+            g[i] = y
+            if abs(z1) < 1e-300 and abs(z2) < 1e-300:
+                break
+    return g1, g2
+
+def _biquad_impulse(b, a, n):
+    h = np.zeros(n)
+    z1 = z2 = 0.0
+    for i in range(n):
+        xi = 1.0 if i == 0 else 0.0
+        y = b[0]*xi + z1
+        z1, z2 = b[1]*xi - a[1]*y + z2, b[2]*xi - a[2]*y
+        h[i] = y
+    return h
+
+def biquad(b, a, x, block=2048):
+    """
+    Transposed direct form II biquad (a[0] == 1), same output as the
+    sample loop in auto_mix._lfilter. x: (n,) or (n, ch).
+
+    The signal is cut into blocks. Every block's zero-state response is an
+    FFT convolution with the impulse response truncated to the block length
+    (exact inside a block), done for all blocks at once. The filter state is
+    then carried across blocks using only the last two outputs of each
+    block, and the zero-input responses are added back in one vector op.
+    """
+    x = np.asarray(x)
+    if x.ndim == 2:
+        y = np.empty_like(x)
+        for ch in range(x.shape[1]):
+            y[:, ch] = biquad(b, a, x[:, ch], block=block)
+        return y
+
+    n = x.shape[0]
+    if n == 0:
+        return np.zeros_like(x)
+    B = int(min(block, n))
+    nb = -(-n // B)
+    xb = np.zeros(nb * B)
+    xb[:n] = x
+    xb = xb.reshape(nb, B)
+
+    h = _biquad_impulse(b, a, B)
+    g1, g2 = _biquad_zero_input(b, a, B)
+
+    nfft = 1 << int(np.ceil(np.log2(2*B)))
+    H = np.fft.rfft(h, nfft)
+    zs = np.fft.irfft(np.fft.rfft(xb, nfft, axis=1) * H, nfft, axis=1)[:, :B]
+
+    # Carry (z1, z2) from block to block
+    z1s = np.zeros(nb); z2s = np.zeros(nb)
+    z1 = z2 = 0.0
+    b1, b2, a1, a2 = b[1], b[2], a[1], a[2]
+    g1_last, g2_last = g1[-1], g2[-1]
+    g1_prev, g2_prev = (g1[-2], g2[-2]) if B > 1 else (0.0, 0.0)
+    for j in range(nb):
+        z1s[j] = z1; z2s[j] = z2
+        y_last = zs[j, -1] + z1*g1_last + z2*g2_last
+        x_last = xb[j, -1]
+        if B > 1:
+            y_prev = zs[j, -2] + z1*g1_prev + z2*g2_prev
+            x_prev = xb[j, -2]
+            z1 = b1*x_last - a1*y_last + b2*x_prev - a2*y_prev
+        else:
+            z1 = b1*x_last - a1*y_last + z2
+        z2 = b2*x_last - a2*y_last
+
+    y = zs + z1s[:, None]*g1[None, :] + z2s[:, None]*g2[None, :]
+    return y.reshape(-1)[:n].astype(x.dtype, copy=False)
+
+# ---------------------------
+# Compressor curve
+# ---------------------------
+def soft_knee_gr_db(lvl, thr_db, ratio, knee_db):
+    """Gain reduction (dB, >= 0) for levels `lvl` (dB) with a quadratic soft knee."""
+    lvl = np.asarray(lvl, dtype=np.float64)
+    k0 = thr_db - knee_db/2; k1 = thr_db + knee_db/2
+    t = (lvl - k0)/knee_db if knee_db else np.zeros_like(lvl)
+    over = np.where(lvl < k0, 0.0, np.where(lvl > k1, lvl - thr_db, t*t*(knee_db/2.0)))
+    return np.where(over <= 0, 0.0, over - over/ratio)
+
+# ---------------------------
+# Envelope follower
+# ---------------------------
+class _OnePoleBlocks:
+    """
+    y[n] = c[n]*y[n-1] + (1-c[n])*u[n] with y[-1] = y0, solved block-wise.
+
+    Inside a block the recurrence is a cumprod/cumsum; blocks are chained
+    with a short scalar loop over block boundaries. Coefficients can be
+    swapped per block (update), so only changed blocks are re-solved.
+    """
+
+    def __init__(self, u, cmin, y0):
+        self.n = u.shape[0]
+        # Keep the in-block decay >= 1e-3 so cumsum(u/P) stays well conditioned
+        if cmin >= 1.0:
+            B = 4096
+        else:
+            B = int(np.clip(np.log(1e-3)/np.log(max(cmin, 1e-300)), 1, 4096))
+        self.B = B
+        self.nb = -(-self.n // B)
+        self.u = np.zeros(self.nb * B)
+        self.u[:self.n] = u
+        self.u = self.u.reshape(self.nb, B)
+        self.C = np.ones((self.nb, B))
+        self.P = np.ones((self.nb, B))
+        self.loc = np.zeros((self.nb, B))
+        self.y0 = y0
+
+    def update(self, c, rows=None):
+        C = np.ones(self.nb * self.B)
+        C[:self.n] = c
+        C = C.reshape(self.nb, self.B)
+        if rows is None:
+            rows = np.arange(self.nb)
+        Cr = C[rows]
+        P = np.cumprod(Cr, axis=1)
+        self.C[rows] = Cr
+        self.P[rows] = P
+        self.loc[rows] = P * np.cumsum((1.0 - Cr) * self.u[rows] / P, axis=1)
+
+    def solve(self):
+        starts = np.empty(self.nb)
+        p_end = self.P[:, -1].tolist(); l_end = self.loc[:, -1].tolist()
+        y = self.y0
+        for j in range(self.nb):
+            starts[j] = y
+            y = p_end[j]*y + l_end[j]
+        return (self.P*starts[:, None] + self.loc).reshape(-1)[:self.n]
+
+def envelope_follow(x, atk, rel, y0=0.0, max_iter=32):
+    """
+    Attack/release smoother, same output as
+
+        prev = y0
+        for g in x:
+            c = atk if g > prev else rel
+            prev = c*prev + (1-c)*g
+
+    Once attack/release is fixed per sample the recurrence is linear, so it
+    is solved vectorized for a guessed branch pattern, the pattern is
+    re-derived from the result, and this repeats until it is stable (only
+    blocks whose branches changed are re-solved). Every pass makes at least
+    the prefix up to the first wrong branch exact; if it has not settled
+    after `max_iter` passes, the tail is finished with the reference loop.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[0]
+    if n == 0:
+        return np.zeros_like(x)
+    prev = np.empty(n); prev[0] = y0; prev[1:] = x[:-1]
+    attack = x > prev
+    solver = _OnePoleBlocks(x, min(atk, rel), y0)
+    solver.update(np.where(attack, atk, rel))
+    for _ in range(max_iter):
+        y = solver.solve()
+        prev[1:] = y[:-1]
+        new_attack = x > prev
+        changed = new_attack != attack
+        if not changed.any():
+            return y
+        attack = new_attack
+        flat = np.zeros(solver.nb * solver.B, dtype=bool)
+        flat[:n] = changed
+        rows = np.flatnonzero(flat.reshape(solver.nb, solver.B).any(axis=1))
+        solver.update(np.where(attack, atk, rel), rows)
+    y = solver.solve()
+    prev[1:] = y[:-1]
+    first = int(np.argmax((x > prev) != attack))
+    y0_tail = y[first - 1] if first > 0 else y0
+    y[first:] = _envelope_follow_ref(x[first:], atk, rel, y0=y0_tail)
+    return y
+
+# ---------------------------
+# Golden check + benchmark
+# ---------------------------
+def _test_signal(sr, seconds, seed=7):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sr*seconds)) / sr
+    # tone + noise with a slow amplitude envelope and silent gaps
+    env = 0.5*(1 + np.sin(2*np.pi*0.7*t)) * (np.sin(2*np.pi*0.23*t) > -0.6)
+    y = env*(0.4*np.sin(2*np.pi*220*t) + 0.2*rng.standard_normal(t.size))
+    return y.astype(np.float32)
+
+def golden_check(sr=44100, seconds=6.0, verbose=True):
+    """Compare vectorized DSP against the sample loops. Returns {name: max abs error}."""
+    import auto_mix
+    x = _test_signal(sr, seconds)
+    errs = {}
+
+    for name, (b, a) in (
+        ("highpass", auto_mix._highpass_coeffs(sr, cutoff=80.0)),
+        ("presence_eq", auto_mix._presence_eq_coeffs(sr, freq=3500.0, gain_db=2.5)),
+    ):
+        # float64 in: same arithmetic as the loop. float32 in: the loop rounds
+        # its feedback to float32, so expect ~1e-5 (below one 16-bit LSB).
+        x64 = x.astype(np.float64)
+        errs[name] = float(np.max(np.abs(biquad(b, a, x64) - _biquad_ref(b, a, x64))))
+        errs[name + "_f32"] = float(np.max(np.abs(biquad(b, a, x) - _biquad_ref(b, a, x))))
+
+    win = max(1, int(sr*0.01))
+    errs["moving_average"] = float(np.max(np.abs(
+        moving_average(x.astype(np.float64)**2, win)
+        - np.convolve(x.astype(np.float64)**2, np.ones(win)/win, mode="same"))))
+
+    lvl = np.linspace(-60, 6, 20001)
+    errs["soft_knee_gr_db"] = float(np.max(np.abs(
+        soft_knee_gr_db(lvl, -18.0, 3.0, 6.0) - _soft_knee_gr_db_ref(lvl, -18.0, 3.0, 6.0))))
+
+    rms = np.sqrt(moving_average(x.astype(np.float64)**2, win) + 1e-12)
+    gr = soft_knee_gr_db(20*np.log10(rms), -18.0, 3.0, 6.0)
+    atk = np.exp(-1.0/(sr*0.005)); rel = np.exp(-1.0/(sr*0.090))
+    errs["envelope_follow"] = float(np.max(np.abs(
+        envelope_follow(gr, atk, rel) - _envelope_follow_ref(gr, atk, rel))))
+
+    if verbose:
+        for k, v in errs.items():
+            print(f"[GOLDEN] {k:<16} max |err| = {v:.3e}")
+    return errs
+
+def benchmark(sr=44100, seconds=30.0):
+    """Time reference loops vs vectorized versions on `seconds` of mono audio."""
+    import auto_mix
+    x = _test_signal(sr, seconds)
+    b, a = auto_mix._highpass_coeffs(sr, cutoff=80.0)
+    win = max(1, int(sr*0.01))
+    rms = np.sqrt(moving_average(x.astype(np.float64)**2, win) + 1e-12)
+    lvl = 20*np.log10(rms)
+    gr = soft_knee_gr_db(lvl, -18.0, 3.0, 6.0)
+    atk = np.exp(-1.0/(sr*0.005)); rel = np.exp(-1.0/(sr*0.090))
+
+    cases = (
+        ("biquad", lambda: _biquad_ref(b, a, x), lambda: biquad(b, a, x)),
+        ("moving_average",
+         lambda: np.convolve(x.astype(np.float64)**2, np.ones(win)/win, mode="same"),
+         lambda: moving_average(x.astype(np.float64)**2, win)),
+        ("soft_knee_gr_db",
+         lambda: _soft_knee_gr_db_ref(lvl, -18.0, 3.0, 6.0),
+         lambda: soft_knee_gr_db(lvl, -18.0, 3.0, 6.0)),
+        ("envelope_follow",
+         lambda: _envelope_follow_ref(gr, atk, rel),
+         lambda: envelope_follow(gr, atk, rel)),
+    )
+    print(f"[BENCH] {seconds:.0f}s mono @ {sr} Hz")
+    results = {}
+    for name, ref, fast in cases:
+        t0 = time.perf_counter(); ref(); t_ref = time.perf_counter() - t0
+        t0 = time.perf_counter(); fast(); t_fast = time.perf_counter() - t0
+        results[name] = (t_ref, t_fast)
+        print(f"[BENCH] {name:<16} loop {t_ref*1000:9.1f} ms   vectorized {t_fast*1000:8.1f} ms"
+              f"   x{t_ref/max(t_fast, 1e-9):.0f}")
+    return results
+
+if __name__ == "__main__":
+    golden_check()
+    benchmark()
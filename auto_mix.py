@@ -5,6 +5,8 @@ import numpy as np
 from pydub import AudioSegment
 import pyloudnorm as pyln
 
+from audio_dsp import biquad, moving_average, soft_knee_gr_db, envelope_follow
+
 # ---------------------------
 # Helpers
 # ---------------------------
@@ -26,71 +28,47 @@ def _normalize_peak(y, peak_db=-1.0):
     return y * (_db_to_lin(peak_db) / peak)
 
 def _lfilter(b, a, x):
-    y = np.zeros_like(x)
-    if x.ndim == 1:
-        z1 = z2 = 0.0
-        for n in range(len(x)):
-            y[n] = b[0]*x[n] + z1
-            z1_new = b[1]*x[n] - a[1]*y[n] + z2
-            z2 = b[2]*x[n] - a[2]*y[n]
-            z1 = z1_new
-    else:
-        z1 = np.zeros(x.shape[1]); z2 = np.zeros(x.shape[1])
-        for n in range(x.shape[0]):
-            y[n, :] = b[0]*x[n, :] + z1
-            z1_new = b[1]*x[n, :] - a[1]*y[n, :] + z2
-            z2 = b[2]*x[n, :] - a[2]*y[n, :]
-            z1 = z1_new
-    return y
+    return biquad(b, a, x)
 
-def _highpass(v, sr, cutoff=80.0, q=0.707):
+def _highpass_coeffs(sr, cutoff=80.0, q=0.707):
     w0 = 2*np.pi*cutoff/sr; alpha = np.sin(w0)/(2*q); c = np.cos(w0)
     b0=(1+c)/2; b1=-(1+c); b2=(1+c)/2; a0=1+alpha; a1=-2*c; a2=1-alpha
-    b=np.array([b0,b1,b2])/a0; a=np.array([1.0,a1/a0,a2/a0])
+    return np.array([b0,b1,b2])/a0, np.array([1.0,a1/a0,a2/a0])
+
+def _highpass(v, sr, cutoff=80.0, q=0.707):
+    b, a = _highpass_coeffs(sr, cutoff=cutoff, q=q)
     return _lfilter(b,a,v)
 
-def _presence_eq(v, sr, freq=3500.0, gain_db=2.5, q=1.0):
+def _presence_eq_coeffs(sr, freq=3500.0, gain_db=2.5, q=1.0):
     A=10**(gain_db/40); w0=2*np.pi*freq/sr; alpha=np.sin(w0)/(2*q); c=np.cos(w0)
     b0=1+alpha*A; b1=-2*c; b2=1-alpha*A; a0=1+alpha/A; a1=-2*c; a2=1-alpha/A
-    b=np.array([b0,b1,b2])/a0; a=np.array([1.0,a1/a0,a2/a0])
+    return np.array([b0,b1,b2])/a0, np.array([1.0,a1/a0,a2/a0])
+
+def _presence_eq(v, sr, freq=3500.0, gain_db=2.5, q=1.0):
+    b, a = _presence_eq_coeffs(sr, freq=freq, gain_db=gain_db, q=q)
     return _lfilter(b,a,v)
 
 def _soft_knee_comp(x, sr, thr_db=-18.0, ratio=3.0, atk_ms=5.0, rel_ms=90.0, makeup_db=3.0, knee_db=6.0):
     win=max(1,int(sr*0.01))
     mono=x if x.ndim==1 else np.mean(x,axis=1)
-    rms=np.sqrt(np.convolve(mono**2, np.ones(win)/win, mode='same') + 1e-12)
+    rms=np.sqrt(moving_average(mono**2, win) + 1e-12)
     lvl=_lin_to_db(rms)
-    k0=thr_db - knee_db/2; k1=thr_db + knee_db/2
-    def gr_db(L):
-        if L<k0: over=0.0
-        elif L>k1: over=L-thr_db
-        else:
-            t=(L-k0)/knee_db; over=t*t*(knee_db/2.0)
-        return 0.0 if over<=0 else over - over/ratio
-    gr=np.array([gr_db(L) for L in lvl])
+    gr=soft_knee_gr_db(lvl, thr_db, ratio, knee_db)
     atk=np.exp(-1.0/(sr*(atk_ms/1000.0))); rel=np.exp(-1.0/(sr*(rel_ms/1000.0)))
-    sm=np.zeros_like(gr); prev=0.0
-    for i,g in enumerate(gr):
-        c=atk if g>prev else rel
-        prev=c*prev + (1-c)*g
-        sm[i]=prev
+    sm=envelope_follow(gr, atk, rel)
     gain=_db_to_lin(-(sm))*_db_to_lin(makeup_db)
     return x*gain if x.ndim==1 else x*gain[:,None]
 
 def _sidechain_duck(music, vocal, sr, duck_db=10.0, floor_db=-1.0, atk_ms=12.0, rel_ms=220.0, pre_ms=20.0, sens_db=-42.0):
     win = max(1, int(sr * 0.02))
     mono_v = vocal if vocal.ndim == 1 else np.mean(vocal, axis=1)
-    env = np.sqrt(np.convolve(mono_v**2, np.ones(win)/win, mode='same') + 1e-12)
+    env = np.sqrt(moving_average(mono_v**2, win) + 1e-12)
     env_db = _lin_to_db(env)
     trig = np.clip((env_db - sens_db) / max(1e-6, (0 - sens_db)), 0, 1)
     pre = int(sr * pre_ms / 1000.0)
     trig = np.concatenate([trig[:1].repeat(pre), trig])[:len(trig)]
     atk = np.exp(-1.0/(sr*(atk_ms/1000.0))); rel = np.exp(-1.0/(sr*(rel_ms/1000.0)))
-    sm = np.zeros_like(trig); prev = 0.0
-    for i, t in enumerate(trig):
-        c = atk if t > prev else rel
-        prev = c*prev + (1-c)*t
-        sm[i] = prev
+    sm = envelope_follow(trig, atk, rel)
     duck_curve_db = -(sm * duck_db) + floor_db
     g = _db_to_lin(duck_curve_db)
     L = min(len(g), music.shape[0])
@@ -156,8 +134,7 @@ def _trim_leading_silence(y: np.ndarray, sr: int, top_db: float = 40.0) -> np.nd
     mono = y if y.ndim == 1 else np.mean(y, axis=1)
     win = max(1, int(sr * 0.02))  # 20 ms
     # RMS
-    kernel = np.ones(win) / win
-    rms = np.sqrt(np.convolve(mono**2, kernel, mode="same") + 1e-12)
+    rms = np.sqrt(moving_average(mono**2, win) + 1e-12)
     rms_db = _lin_to_db(rms)
     # threshold relative to 0 dBFS -> consider below -top_db as silence
     idx = np.argmax(rms_db > -top_db)
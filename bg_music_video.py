@@ -5,6 +5,8 @@ import shutil
 from pathlib import Path
 from typing import Optional
 
+import media_probe
+
 VIDEO_EXTS = {".mp4", ".mov", ".mkv", ".avi", ".webm", ".m4v"}
 AUDIO_EXTS = {".wav", ".mp3", ".m4a", ".aac", ".flac", ".ogg"}
 
@@ -32,26 +34,8 @@ def _first_file(folder: Path, exts: set[str]) -> Optional[Path]:
 
 def _has_audio_stream(path: Path) -> bool:
     """Return True if the video has at least one audio stream."""
-    try:
-        result = subprocess.run(
-            [
-                "ffprobe",
-                "-v", "error",
-                "-select_streams", "a",
-                "-show_entries", "stream=index",
-                "-of", "csv=p=0",
-                str(path),
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.DEVNULL,
-            text=True,
-            check=True,
-        )
-        # If there is at least one audio stream, stdout will contain lines like "0"
-        return bool(result.stdout.strip())
-    except subprocess.CalledProcessError:
-        # ffprobe itself failed (corrupt file, etc.)
-        return False
+    # False as well when ffprobe itself fails (corrupt file, etc.)
+    return media_probe.has_audio(path)
 
 
 def merge_all_videos_with_bg_music(
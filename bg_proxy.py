@@ -0,0 +1,222 @@
+# bg_proxy.py — browse-size previews for the background video library
+#
+# The scene builder lists /background_videos through _list_current and the
+# browser used to pull every full-resolution MP4 just to show a tile. Each
+# library video <name> now gets, under CACHE_DIR/<same relative folder>:
+#   <name>.proxy.mp4    small H.264 copy (short side PROXY_HEIGHT, no audio, faststart)
+#   <name>.poster.jpg   one frame from early in the clip
+#   <name>.sprite.jpg   SPRITE_TILES frames spread over the clip, in one row (hover scrub)
+#   <name>.json         source size/mtime + sprite geometry; written last, so it marks
+#                       the set as complete
+#
+# Generation is incremental: listing a folder calls schedule(), which queues
+# only new or changed videos on a small background pool and returns at once;
+# tiles use the previews as soon as they exist and the original until then.
+# sweep() builds the whole library in the foreground and drops previews of
+# deleted videos.
+#
+# Env overrides:
+#     BG_PROXY_DIR        (default: <repo>/cache/bg_proxies)
+#     BG_PROXY_HEIGHT     short side of the proxy in pixels (default: 240)
+#     BG_PROXY_WORKERS    videos processed at once (default: 2)
+#     BG_SPRITE_TILES     frames per sprite sheet (default: 10)
+#     BG_SPRITE_TILE_W    width of one sprite frame in pixels (default: 160)
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import media_probe
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = Path(os.getenv("BG_PROXY_DIR", str(BASE_DIR / "cache" / "bg_proxies")))
+PROXY_HEIGHT = int(os.getenv("BG_PROXY_HEIGHT", "240"))
+WORKERS = int(os.getenv("BG_PROXY_WORKERS", "2"))
+SPRITE_TILES = int(os.getenv("BG_SPRITE_TILES", "10"))
+SPRITE_TILE_W = int(os.getenv("BG_SPRITE_TILE_W", "160"))
+
+# Bump when the generated files change, so old previews are rebuilt
+_VERSION = 1
+
+_pool = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _out(rel: str, kind: str) -> Path:
+    """CACHE_DIR/<rel>.<kind>, e.g. ('a/b.mov', 'proxy.mp4') -> a/b.mov.proxy.mp4"""
+    r = Path(rel)
+    return CACHE_DIR / r.parent / f"{r.name}.{kind}"
+
+
+def _source_sig(src: Path):
+    st = src.stat()
+    return [st.st_size, st.st_mtime_ns, _VERSION]
+
+
+def _read_meta(rel: str):
+    try:
+        with open(_out(rel, "json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def previews(base_dir: Path, rel: str):
+    """
+    Preview files of base_dir/rel if they are complete and up to date, else None:
+    {"proxy": "a/b.proxy.mp4", "poster": ..., "sprite": ... or None,
+     "sprite_tiles": n, "tile_w": w, "tile_h": h, "v": source mtime}  (paths relative to CACHE_DIR)
+    """
+    meta = _read_meta(rel)
+    if not meta:
+        return None
+    try:
+        if meta.get("source") != _source_sig(Path(base_dir) / rel):
+            return None
+    except OSError:
+        return None
+    return _public(meta)
+
+
+def _public(meta):
+    out = {k: v for k, v in meta.items() if k != "source"}
+    out["v"] = meta["source"][1]  # source mtime: cache-buster for the preview URLs
+    return out
+
+
+def _ffmpeg(cmd, what):
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg {what} failed:\n{proc.stderr[-2000:]}")
+
+
+def build(base_dir: Path, rel: str, force: bool = False):
+    """Generate the previews of base_dir/rel (skipped if already up to date). Returns previews()."""
+    if not force:
+        done = previews(base_dir, rel)
+        if done:
+            return done
+    src = Path(base_dir) / rel
+    sig = _source_sig(src)
+    info = media_probe.try_probe(src)
+    dur = info.duration if info and info.duration else None
+    w, h = (info.width, info.height) if info and info.width and info.height else (None, None)
+
+    proxy, poster, sprite = _out(rel, "proxy.mp4"), _out(rel, "poster.jpg"), _out(rel, "sprite.jpg")
+    proxy.parent.mkdir(parents=True, exist_ok=True)
+    tag = f"{os.getpid()}.{threading.get_ident()}.tmp"
+    # short side -> PROXY_HEIGHT, never upscaled
+    scale = (f"scale=w='if(gte(iw,ih),-2,min(iw,{PROXY_HEIGHT}))'"
+             f":h='if(gte(iw,ih),min(ih,{PROXY_HEIGHT}),-2)'")
+
+    tmp = proxy.with_name(f"{proxy.stem}.{tag}.mp4")
+    _ffmpeg(["ffmpeg", "-y", "-v", "error", "-i", str(src), "-map", "0:v:0",
+             "-vf", scale,
+             "-c:v", "libx264", "-preset", "veryfast", "-crf", "30", "-pix_fmt", "yuv420p",
+             "-an", "-movflags", "+faststart", str(tmp)], "proxy")
+    os.replace(tmp, proxy)
+
+    # Poster from slightly into the clip (first frames are often black / fading in)
+    t = min(1.0, dur * 0.1) if dur else 0
+    tmp = poster.with_name(f"{poster.stem}.{tag}.jpg")
+    _ffmpeg(["ffmpeg", "-y", "-v", "error", "-ss", f"{t:.3f}", "-i", str(proxy),
+             "-frames:v", "1", "-q:v", "4", str(tmp)], "poster")
+    os.replace(tmp, poster)
+
+    # Sprite: SPRITE_TILES frames evenly over the clip (first seconds if duration is unknown)
+    tile_w = SPRITE_TILE_W
+    tile_h = max(2, int(round(tile_w * h / w / 2)) * 2) if w and h else None
+    n = max(1, SPRITE_TILES)
+    rate = f"{n}/{dur:.3f}" if dur else "1"
+    tmp = sprite.with_name(f"{sprite.stem}.{tag}.jpg")
+    try:
+        _ffmpeg(["ffmpeg", "-y", "-v", "error", "-i", str(proxy),
+                 "-vf", f"fps={rate},scale={tile_w}:{tile_h or -2},tile={n}x1",
+                 "-frames:v", "1", "-q:v", "5", str(tmp)], "sprite")
+        os.replace(tmp, sprite)
+        sprite_rel = sprite.relative_to(CACHE_DIR).as_posix()
+    except RuntimeError as e:
+        print(f"[BgProxy] no sprite for {rel}: {e}")
+        sprite_rel = None
+
+    meta = {
+        "source": sig,
+        "proxy": proxy.relative_to(CACHE_DIR).as_posix(),
+        "poster": poster.relative_to(CACHE_DIR).as_posix(),
+        "sprite": sprite_rel,
+        "sprite_tiles": n,
+        "tile_w": tile_w,
+        "tile_h": tile_h,
+    }
+    tmp = _out(rel, f"{tag}.json")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, _out(rel, "json"))
+    return _public(meta)
+
+
+def _build_quietly(base_dir, rel):
+    try:
+        build(base_dir, rel)
+        print(f"[BgProxy] built previews for {rel}")
+    except Exception as e:
+        print(f"[BgProxy] failed for {rel}: {e}")
+    finally:
+        with _lock:
+            _pending.discard((str(base_dir), rel))
+
+
+def schedule(base_dir: Path, rels) -> int:
+    """Queue videos without up-to-date previews on the background pool. Returns how many were queued."""
+    global _pool
+    queued = 0
+    for rel in rels:
+        if previews(base_dir, rel):
+            continue
+        key = (str(base_dir), rel)
+        with _lock:
+            if key in _pending:
+                continue
+            _pending.add(key)
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=max(1, WORKERS), thread_name_prefix="bg-proxy")
+        _pool.submit(_build_quietly, base_dir, rel)
+        queued += 1
+    return queued
+
+
+def sweep(base_dir: Path, exts, workers=None) -> dict:
+    """Build previews for every video under base_dir and delete previews whose video is gone."""
+    base_dir = Path(base_dir)
+    rels = sorted(p.relative_to(base_dir).as_posix() for p in base_dir.rglob("*")
+                  if p.is_file() and p.suffix.lower() in exts)
+    todo = [r for r in rels if not previews(base_dir, r)]
+    failed = 0
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, workers or WORKERS)) as ex:
+            futures = {ex.submit(build, base_dir, r): r for r in todo}
+            for fut, r in futures.items():
+                try:
+                    fut.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"[BgProxy] failed for {r}: {e}")
+
+    keep = {_out(r, "json") for r in rels}
+    removed = 0
+    if CACHE_DIR.exists():
+        for meta in CACHE_DIR.rglob("*.json"):
+            if meta in keep or ".tmp." in meta.name:
+                continue
+            stem = meta.name[: -len(".json")]
+            for kind in ("json", "proxy.mp4", "poster.jpg", "sprite.jpg"):
+                try:
+                    (meta.parent / f"{stem}.{kind}").unlink()
+                except OSError:
+                    pass
+            removed += 1
+    print(f"[BgProxy] {len(rels)} videos: built {len(todo) - failed}, failed {failed}, removed {removed} stale")
+    return {"videos": len(rels), "built": len(todo) - failed, "failed": failed, "removed": removed}
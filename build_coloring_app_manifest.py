@@ -1,6 +1,21 @@
+# build_coloring_app_manifest.py — v2.json manifest + WEBP thumbs for the coloring app
+#
+# Runs are incremental: a sidecar cache (one JSON per manifest root) maps each
+# page PNG's (path, size, mtime) to its (w, h) and to the (size, mtime, sha1) of
+# its thumb, so unchanged pages are neither opened nor re-thumbnailed. Pages that
+# miss are processed in a process pool, and v2.json is rewritten only when its
+# content or a thumb's bytes changed (updated_at then moves too).
+#
+# Env overrides:
+#     COLORING_MANIFEST_CACHE_DIR   (default: <repo>/cache/coloring_manifest)
+#     COLORING_MANIFEST_WORKERS     thumbnail processes (default: CPU count)
 from PIL import Image  # pip install pillow
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
+import hashlib
+import os
+import time
 import traceback  # to print detailed error info
 import  json
 
@@ -8,6 +23,10 @@ import  json
 BASE_DIR = Path(__file__).resolve().parent
 COLORING_BASE = BASE_DIR
 
+CACHE_DIR = Path(os.getenv("COLORING_MANIFEST_CACHE_DIR", str(BASE_DIR / "cache" / "coloring_manifest")))
+WORKERS = int(os.getenv("COLORING_MANIFEST_WORKERS", str(os.cpu_count() or 4)))
+_INLINE_JOBS = 4  # fewer misses than this are processed in-process (pool start-up costs more)
+
 # COLORING_BASE = BASE_DIR / "downloads"
 # COLORING_BASE.mkdir(exist_ok=True)
 
@@ -37,6 +56,65 @@ def _ensure_webp_thumb(src_png: Path, dest_webp: Path, edge: int, force: bool =
         return False
 
 
+def _stat_key(path: Path) -> list:
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _file_sha1(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _process_page(src_png: str, dest_webp: str, edge: int, make_thumb: bool):
+    """
+    Pool worker for one page: PNG size (None if unreadable) and, when make_thumb,
+    a fresh thumb. Returns ((w, h) | None, [thumb size, mtime_ns, sha1] | None).
+    """
+    src_png, dest_webp = Path(src_png), Path(dest_webp)
+    size = None
+    try:
+        with Image.open(src_png) as im:
+            size = im.size
+    except Exception:
+        traceback.print_exc()
+    ok = _ensure_webp_thumb(src_png, dest_webp, edge, force=True) if make_thumb else dest_webp.exists()
+    thumb = _stat_key(dest_webp) + [_file_sha1(dest_webp)] if ok else None
+    return size, thumb
+
+
+def _cache_path(root: Path) -> Path:
+    return CACHE_DIR / (hashlib.sha1(str(root).encode("utf-8")).hexdigest()[:16] + ".json")
+
+
+def _load_cache(root: Path) -> dict:
+    try:
+        data = json.loads(_cache_path(root).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data.get("pages", {}) if data.get("root") == str(root) else {}
+
+
+def _save_cache(root: Path, pages: dict) -> None:
+    path = _cache_path(root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"root": str(root), "pages": pages}), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _run_pages(jobs: list, workers: int | None = None) -> list:
+    """_process_page over jobs [(src, dest, edge, make_thumb)], in a process pool when there are enough."""
+    if len(jobs) < _INLINE_JOBS:
+        return [_process_page(*job) for job in jobs]
+    workers = max(1, min(workers or WORKERS, len(jobs)))
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(_process_page, *zip(*jobs), chunksize=max(1, len(jobs) // (workers * 4))))
+
+
 def build_coloring_manifest(source_subfolder: str | None = None,
                             thumb_edge: int = 640,
                             force: bool = False) -> dict:
@@ -49,8 +127,9 @@ def build_coloring_manifest(source_subfolder: str | None = None,
       Within each category:
         - If <cat>/pages/ exists, use that as pagesDir.
         - Else use <cat> itself as pagesDir.
-    - Thumbs are written into <cat>/thumbs/ as <id>@2x.webp.
-    - Manifest is written to <root>/v2.json.
+    - Thumbs are written into <cat>/thumbs/ as <id>@2x.webp; unchanged pages
+      reuse their cached size and thumb, force=True rebuilds every thumb.
+    - Manifest is written to <root>/v2.json, only if it changed.
 
     URL mapping:
       src/thumb = "/quiz/downloads/<path_relative_to_downloads>"
@@ -65,10 +144,17 @@ def build_coloring_manifest(source_subfolder: str | None = None,
     if not root.is_dir():
         raise FileNotFoundError(f"Folder not found: {root}")
 
+    t0 = time.perf_counter()
     categories: list[dict] = []
     total_pages = 0
     total_thumbs = 0
 
+    prev_cache = _load_cache(root)
+    cache: dict[str, dict] = {}
+    jobs: list[tuple] = []      # (src png, dest webp, edge, make_thumb) for pages that missed
+    pending: list[tuple] = []   # (item, cache key, png stat key) matching jobs
+    thumbs_changed = False
+
     # Immediate subfolders of root are categories
     cat_dirs = [p for p in sorted(root.iterdir(), key=lambda x: x.name.lower()) if p.is_dir()]
 
@@ -113,28 +199,35 @@ def build_coloring_manifest(source_subfolder: str | None = None,
             src_path = svg_path or png_path
             src_ext = src_path.suffix.lstrip(".").lower()
 
-            # --- Size: prefer PNG's size if available ---
-            if png_path and png_path.exists():
-                try:
-                    with Image.open(png_path) as im:
-                        w, h = im.size
-                except Exception:
-                    traceback.print_exc()
-                    w, h = 1600, 1200
-            else:
-                # SVG only – fallback to defaults
-                w, h = 1600, 1200
+            # SVG only – fallback size; PNG pages get theirs from the cache or the pool below
+            w, h = 1600, 1200
+            job = None
 
             # --- Thumbnail: prefer PNG; else fall back to SVG URL ---
             if png_path and png_path.exists():
                 dest_webp = thumbs_dir / f"{id_}@2x.webp"
-                ok = _ensure_webp_thumb(png_path, dest_webp, thumb_edge, force=force)
-                if not ok:
-                    thumb_url = None
-                else:
-                    rel_thumb = dest_webp.resolve().relative_to(root).as_posix()
-                    thumb_url = f"https://coloring.readernook.com/static/v2/{rel_thumb}"
+                rel_thumb = dest_webp.resolve().relative_to(root).as_posix()
+                thumb_url = f"https://coloring.readernook.com/static/v2/{rel_thumb}"
+
+                key = png_path.resolve().relative_to(root).as_posix()
+                src_key = _stat_key(png_path)
+                hit = prev_cache.get(key)
+                fresh = bool(hit) and hit.get("src") == src_key and hit.get("edge") == thumb_edge
+                if fresh and not force and hit.get("thumb") and dest_webp.exists() \
+                        and _stat_key(dest_webp) == hit["thumb"][:2]:
+                    # Unchanged page, thumb still the one we wrote: nothing to open
+                    w, h = hit["w"], hit["h"]
+                    cache[key] = hit
                     total_thumbs += 1
+                else:
+                    if force or not dest_webp.exists():
+                        make_thumb = True
+                    elif hit:
+                        make_thumb = not fresh
+                    else:
+                        # No cache entry yet (first incremental run): trust thumbs newer than the page
+                        make_thumb = dest_webp.stat().st_mtime_ns < src_key[1]
+                    job = ((str(png_path), str(dest_webp), thumb_edge, make_thumb), key, src_key)
             elif svg_path and svg_path.exists():
                 # No PNG – just use the SVG as thumb URL
                 rel_svg = svg_path.resolve().relative_to(root).as_posix()
@@ -148,14 +241,18 @@ def build_coloring_manifest(source_subfolder: str | None = None,
 
             label = nice_label(id_)
 
-            items.append({
+            item = {
                 "id": id_,
                 "label": label,
                 "src": src_url,     # <-- SVG when both exist
                 "thumb": thumb_url, # <-- PNG-based WEBP when PNG exists
                 "w": w,
                 "h": h,
-            })
+            }
+            items.append(item)
+            if job:
+                jobs.append(job[0])
+                pending.append((item, job[1], job[2]))
 
             total_pages += 1
 
@@ -166,6 +263,21 @@ def build_coloring_manifest(source_subfolder: str | None = None,
                 "items": items,
             })
 
+    # --- Pages that missed the cache: sizes + thumbs in a process pool ---
+    for (item, key, src_key), (size, thumb) in zip(pending, _run_pages(jobs)):
+        if size:
+            item["w"], item["h"] = size
+        if thumb:
+            total_thumbs += 1
+        else:
+            item["thumb"] = None
+        prev_thumb = (prev_cache.get(key) or {}).get("thumb")
+        if not thumb or not prev_thumb or thumb[2] != prev_thumb[2]:
+            thumbs_changed = True
+        if size:
+            cache[key] = {"src": src_key, "w": size[0], "h": size[1], "edge": thumb_edge, "thumb": thumb}
+    _save_cache(root, cache)
+
     manifest = {
         "version": source_subfolder or "root",
         "updated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
@@ -173,7 +285,17 @@ def build_coloring_manifest(source_subfolder: str | None = None,
     }
 
     manifest_path = root / "v2.json"
-    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    try:
+        old = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        old = None
+    changed = thumbs_changed or not old or \
+        {k: old.get(k) for k in ("version", "categories")} != {k: manifest[k] for k in ("version", "categories")}
+    if changed:
+        manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"[Manifest] {total_pages} pages, {len(jobs)} processed, {total_pages - len(jobs)} cached, "
+          f"{'written' if changed else 'unchanged'} in {time.perf_counter() - t0:.2f}s")
 
     return {
         "manifest_path": str(manifest_path),
@@ -181,4 +303,6 @@ def build_coloring_manifest(source_subfolder: str | None = None,
         "categories": len(categories),
         "total_pages": total_pages,
         "total_thumbs": total_thumbs,
+        "processed_pages": len(jobs),
+        "changed": changed,
     }
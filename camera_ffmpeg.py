@@ -0,0 +1,196 @@
+# camera_ffmpeg.py — ffmpeg-native camera movement for story images
+#
+# effects.create_camera_movement_clip builds every frame in Python (numpy crop,
+# cv2 LANCZOS resize, BGR->RGB) and MoviePy re-encodes the result. This renders
+# the same movement in a single ffmpeg call:
+#   - the start/end rectangles and the easing become per-frame expressions
+#   - scale (eval=frame) zooms the image so the current rectangle is exactly the
+#     output size, then a fixed-size crop picks it out. Sub-pixel smooth, unlike
+#     zoompan, which snaps the window to whole input pixels.
+#   - identical start/end rectangles (still frame / Ken Burns) are mirrored too
+#
+# The MoviePy version stays as the reference implementation for parity checks
+# (scraper.py: CAMERA_BACKEND=moviepy).
+#
+# Env overrides:
+#     CAMERA_FFMPEG_PRESET  x264 preset of the rendered segments (default: veryfast)
+#     CAMERA_FFMPEG_CRF     x264 CRF of the rendered segments (default: 18)
+import math
+import os
+import subprocess
+from tempfile import NamedTemporaryFile
+
+import requests
+from PIL import Image
+
+X264_PRESET = os.getenv("CAMERA_FFMPEG_PRESET", "veryfast")
+X264_CRF = os.getenv("CAMERA_FFMPEG_CRF", "18")
+
+# Ken Burns used for still frames with an animation (effects.add_ken_burns_effect defaults)
+KB_START_ZOOM = 1.2
+KB_END_ZOOM = 1.0
+
+
+def _local_image(image_path):
+    """Local path for `image_path`, downloading http(s) URLs to a temp file."""
+    if not (image_path.startswith("http://") or image_path.startswith("https://")):
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Image not found at path: {image_path}")
+        return image_path
+    response = requests.get(image_path, stream=True)
+    response.raise_for_status()
+    suffix = os.path.splitext(image_path.split("?", 1)[0])[1] or ".png"
+    with NamedTemporaryFile(delete=False, suffix=suffix) as f:
+        f.write(response.content)
+        return f.name
+
+
+def _num(v):
+    """Compact float literal for ffmpeg expressions."""
+    return f"{float(v):.6f}".rstrip("0").rstrip(".") or "0"
+
+
+def _esc(expr):
+    """Escape commas so an expression survives filtergraph parsing unquoted."""
+    return expr.replace(",", "\\,")
+
+
+def _fit_rect(rect, aspect, img_w, img_h):
+    """
+    (left, top, width, height) of a camera rectangle, height derived from the
+    start aspect ratio (like the MoviePy path), shrunk/moved to lie inside the image.
+    """
+    w = float(rect["width"])
+    h = w / aspect
+    s = min(1.0, img_w / w, img_h / h)
+    w, h = w * s, h * s
+    left = min(max(0.0, float(rect["left"])), img_w - w)
+    top = min(max(0.0, float(rect["top"])), img_h - h)
+    return left, top, w, h
+
+
+def _movement_progress_expr(duration, fps, movement_percentage):
+    """
+    Progress 0..1 as a function of the frame number n. Same curve as the MoviePy
+    easing: cube-root ease-out that finishes at movement_percentage of the clip,
+    then holds on the end frame.
+    """
+    move_frames = duration * fps * movement_percentage / 100.0
+    if move_frames <= 0:
+        return "1"
+    return f"pow(min(n/{_num(move_frames)},1),1/3)"
+
+
+def _movement_filter(start, end, img_w, img_h, out_w, out_h, progress):
+    l0, t0, w0, h0 = start
+    l1, t1, w1, h1 = end
+
+    # Crop once to the area the camera ever sees, so per-frame scaling stays small
+    bx = max(0, math.floor(min(l0, l1)))
+    by = max(0, math.floor(min(t0, t1)))
+    bw = min(img_w, math.ceil(max(l0 + w0, l1 + w1))) - bx
+    bh = min(img_h, math.ceil(max(t0 + h0, t1 + h1))) - by
+
+    P = f"({progress})"
+    W = f"({_num(w0)}+{_num(w1 - w0)}*{P})"
+    H = f"({_num(h0)}+{_num(h1 - h0)}*{P})"
+    X = f"({_num(l0 - bx)}+{_num(l1 - l0)}*{P})"
+    Y = f"({_num(t0 - by)}+{_num(t1 - t0)}*{P})"
+    sw = f"ceil({bw}*{out_w}/{W})"
+    sh = f"ceil({bh}*{out_h}/{H})"
+    # crop's iw/ih stay at the first frame's size, so bound x/y with the scale expressions
+    cx = f"max(0,min({X}*{out_w}/{W},{sw}-{out_w}))"
+    cy = f"max(0,min({Y}*{out_h}/{H},{sh}-{out_h}))"
+    return (
+        f"crop={bw}:{bh}:{bx}:{by},"
+        f"scale=w={_esc(sw)}:h={_esc(sh)}:eval=frame:flags=bicubic,"
+        f"crop={out_w}:{out_h}:{_esc(cx)}:{_esc(cy)}"
+    )
+
+
+def _ken_burns_filter(rect, out_w, out_h, frames):
+    """Still rectangle, cover-scaled (never down) and centre-cropped, zooming 1.2 -> 1 with smoothstep."""
+    left, top, w, h = (int(v) for v in rect)
+    scale = max(out_w / w, out_h / h, 1.0)
+    base_w, base_h = int(w * scale), int(h * scale)
+    u = f"min(n/{max(frames - 1, 1)},1)"
+    Z = f"({_num(KB_START_ZOOM)}+{_num(KB_END_ZOOM - KB_START_ZOOM)}*{u}*{u}*(3-2*{u}))"
+    sw = f"ceil({out_w}*{Z})"
+    sh = f"ceil({out_h}*{Z})"
+    return (
+        f"crop={w}:{h}:{left}:{top},"
+        f"scale={base_w}:{base_h}:flags=lanczos,"
+        f"crop={out_w}:{out_h}:{(base_w - out_w) // 2}:{(base_h - out_h) // 2},"
+        f"scale=w={_esc(sw)}:h={_esc(sh)}:eval=frame:flags=bicubic,"
+        f"crop={out_w}:{out_h}:{_esc(f'floor(({sw}-{out_w})/2)')}:{_esc(f'floor(({sh}-{out_h})/2)')}"
+    )
+
+
+def camera_movement_filter(image_size, start_frame, end_frame, duration=5, fps=30,
+                           movement_percentage=70, img_animation='Zoom In', target_resolution=(1920, 1080)):
+    """
+    Filter chain (looped still image in, `target_resolution` frames out) for the
+    camera movement of effects.create_camera_movement_clip. image_size is (w, h).
+
+    start_frame / end_frame are {width, height, left, top} in image pixels. If
+    they are identical the clip is a still (img_animation == '') or a Ken Burns
+    zoom, as in the MoviePy version.
+    """
+    img_w, img_h = image_size
+    out_w, out_h = (int(v) for v in target_resolution)
+    frames = max(1, math.ceil(duration * fps - 1e-6))
+    aspect = start_frame['width'] / start_frame['height']
+
+    is_still = all(start_frame[k] == end_frame[k] for k in ("width", "height", "left", "top"))
+    if is_still:
+        # The MoviePy path crops the raw rectangle (its own aspect ratio) for stills
+        left = max(0, int(start_frame['left']))
+        top = max(0, int(start_frame['top']))
+        rect = (left, top,
+                min(int(start_frame['width']), img_w - left),
+                min(int(start_frame['height']), img_h - top))
+        if img_animation == '':
+            return f"crop={rect[2]}:{rect[3]}:{rect[0]}:{rect[1]},scale={out_w}:{out_h}:flags=lanczos"
+        return _ken_burns_filter(rect, out_w, out_h, frames)
+
+    start = _fit_rect(start_frame, aspect, img_w, img_h)
+    end = _fit_rect(end_frame, aspect, img_w, img_h)
+    progress = _movement_progress_expr(duration, fps, movement_percentage)
+    return _movement_filter(start, end, img_w, img_h, out_w, out_h, progress)
+
+
+def render_camera_movement(image_path, start_frame, end_frame, output_path, duration=5, fps=30,
+                           movement_percentage=70, img_animation='Zoom In', target_resolution=(1920, 1080)):
+    """
+    Render the camera movement of effects.create_camera_movement_clip straight to
+    an H.264 file (no audio) of exactly `target_resolution`.
+
+    Returns output_path. Raises RuntimeError with ffmpeg's stderr on failure.
+    """
+    src = _local_image(image_path)
+    with Image.open(src) as im:
+        image_size = im.size
+    frames = max(1, math.ceil(duration * fps - 1e-6))
+    vf = camera_movement_filter(image_size, start_frame, end_frame, duration, fps,
+                                movement_percentage, img_animation, target_resolution)
+
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-nostats", "-loglevel", "error",
+        "-loop", "1", "-framerate", str(fps), "-i", src,
+        "-vf", f"{vf},format=yuv420p",
+        "-frames:v", str(frames),
+        "-c:v", "libx264", "-preset", X264_PRESET, "-crf", str(X264_CRF),
+        "-pix_fmt", "yuv420p", "-an",
+        output_path,
+    ]
+    try:
+        p = subprocess.run(cmd, capture_output=True, text=True)
+    finally:
+        if src != image_path:
+            try:
+                os.remove(src)
+            except OSError:
+                pass
+    if p.returncode != 0:
+        raise RuntimeError(f"ffmpeg camera movement failed for {image_path}:\n{(p.stderr or '').strip()}")
+    return output_path
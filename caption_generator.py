@@ -9,7 +9,8 @@ import time
 from bs4 import BeautifulSoup, Tag
 from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
 import requests
-import whisper
+from whisper_registry import whisper_model
+from transcription_cache import cached_transcribe
 import traceback
 import json
 #from scraper import safe_copy
@@ -25,6 +26,27 @@ import unicodedata
 
 MAX_WORD_DURATION = 2.0  # seconds
 
+HINDI_TRANSCRIBE_OPTIONS = dict(
+    task="transcribe",
+    word_timestamps=True,
+    language="hi",     # or "en" for English
+    verbose=True,
+    fp16=False,         # Important on CPU
+    initial_prompt=(
+        "यह एक शांत, भक्तिमय हिंदी कथा है। विराम चिह्न सरल रखें। "
+        "देवनागरी में ही लिखें, अंग्रेज़ी लिप्यंतरण नहीं।"
+    ),
+    condition_on_previous_text=False,
+    temperature=(0.0, 0.2, 0.4)
+)
+
+# Transcribe through the on-disk transcript cache; the model is only loaded on a miss
+def _transcribe_cached(audio_path, model_name, options):
+    def _run():
+        with whisper_model(model_name) as model:
+            return model.transcribe(audio_path, **options)
+    return cached_transcribe(audio_path, model_name, options.get("language"), options, _run)
+
 # Extract Audio from Video
 def extract_audio(video_path, audio_path):
     video = VideoFileClip(video_path)
@@ -70,8 +92,8 @@ def generate_aligned_subtitles(audio_path, website_text, max_words):
 
     print("Received generate_aligned_subtitles Arguments:", locals())
 
-    model = whisper.load_model("base")
-    result = model.transcribe(audio_path, word_timestamps=True)
+    with whisper_model("base") as model:
+        result = model.transcribe(audio_path, word_timestamps=True)
     grouped_subtitles = []
     current_caption = []
     current_start = None
@@ -212,25 +234,10 @@ def prepare_file_for_adding_captions_n_headings_thru_html(url, input_video_path=
         # model = whisper.load_model("medium")
         # captions_data = model.transcribe(audio_path, word_timestamps=True, language="hi")
         #model = whisper.load_model("large")
-        model = whisper.load_model("large-v3")
-        captions_data = model.transcribe(
-                            audio_path,
-                            task="transcribe",
-                            word_timestamps=True,
-                            language="hi",     # or "en" for English
-                            verbose=True,
-                            fp16=False,         # Important on CPU
-                            initial_prompt=(
-                                "यह एक शांत, भक्तिमय हिंदी कथा है। विराम चिह्न सरल रखें। "
-                                "देवनागरी में ही लिखें, अंग्रेज़ी लिप्यंतरण नहीं।"
-                            ),
-                            condition_on_previous_text=False,
-                            temperature=(0.0, 0.2, 0.4)
-                        )
+        captions_data = _transcribe_cached(audio_path, "large-v3", HINDI_TRANSCRIBE_OPTIONS)
 
     else:
-        model = whisper.load_model("base")
-        captions_data = model.transcribe(audio_path, word_timestamps=True)
+        captions_data = _transcribe_cached(audio_path, "base", {"word_timestamps": True})
 
     print("Detected language:", captions_data.get("language"))
 
@@ -453,33 +460,20 @@ def prepare_captions_file_for_notebooklm_audio(
         except Exception as e:
             print(f"[WARN] Normalization failed: {e}; using unnormalized audio.")
 
-    # --- Load Whisper model (larger for songs) ---
-    model_name = model_size_for_songs  # "base" | "medium" | "large"
-    model = whisper.load_model(model_name)
+    # --- Pick Whisper model (larger for songs; Hindi always uses large-v3) ---
+    is_hindi = language.lower().startswith("hi")
+    model_name = "large-v3" if is_hindi else model_size_for_songs  # "base" | "medium" | "large"
 
     # --- Transcribe (keep condition_on_previous_text=False) ---
-    if language.lower().startswith("hi"):
-        model = whisper.load_model("large-v3")
-        captions_data = model.transcribe(
-                            vocal_path,
-                            task="transcribe",
-                            word_timestamps=True,
-                            language="hi",     # or "en" for English
-                            verbose=True,
-                            fp16=False,         # Important on CPU
-                            initial_prompt=(
-                                "यह एक शांत, भक्तिमय हिंदी कथा है। विराम चिह्न सरल रखें। "
-                                "देवनागरी में ही लिखें, अंग्रेज़ी लिप्यंतरण नहीं।"
-                            ),
-                            condition_on_previous_text=False,
-                            temperature=(0.0, 0.2, 0.4)
-                        )        
+    if is_hindi:
+        options = HINDI_TRANSCRIBE_OPTIONS
     else:
-        captions_data = model.transcribe(
-            vocal_path, word_timestamps=True, language="en",
+        options = dict(
+            word_timestamps=True, language="en",
             condition_on_previous_text=False,
             temperature=0.0
         )
+    captions_data = _transcribe_cached(vocal_path, model_name, options)
 
     # ... your word_timestamps building & JSON write stays the same ...
     #return captions_data.get("text", "").strip()
@@ -525,25 +519,10 @@ def prepare_captions_file_for_notebooklm_audio_DND( audio_path="audio.wav",  lan
         # model = whisper.load_model("medium")
         # captions_data = model.transcribe(audio_path, word_timestamps=True, language="hi")
         #model = whisper.load_model("large")
-        model = whisper.load_model("large-v3")
-        captions_data = model.transcribe(
-                            audio_path,
-                            task="transcribe",
-                            word_timestamps=True,
-                            language="hi",     # or "en" for English
-                            verbose=True,
-                            fp16=False,         # Important on CPU
-                            initial_prompt=(
-                                "यह एक शांत, भक्तिमय हिंदी कथा है। विराम चिह्न सरल रखें। "
-                                "देवनागरी में ही लिखें, अंग्रेज़ी लिप्यंतरण नहीं।"
-                            ),
-                            condition_on_previous_text=False,
-                            temperature=(0.0, 0.2, 0.4)
-                        )
+        captions_data = _transcribe_cached(audio_path, "large-v3", HINDI_TRANSCRIBE_OPTIONS)
 
     else:
-        model = whisper.load_model("base")
-        captions_data = model.transcribe(audio_path, word_timestamps=True)
+        captions_data = _transcribe_cached(audio_path, "base", {"word_timestamps": True})
 
     print("Detected language:", captions_data.get("language"))
 
@@ -8,6 +8,288 @@ from PIL import Image, ImageOps, ImageFilter, ImageDraw
 from pathlib import Path
 
 
+# =========================
+#  Frame Sinks
+# =========================
+
+class _PipeFrameSink:
+    """
+    Stream raw frames into one long-lived ffmpeg encoder.
+
+    Frames are pushed through a small bounded queue to a writer thread that
+    feeds ffmpeg's stdin, so frame generation and encoding overlap. The
+    hold-start/hold-end frames are written once and duplicated by ffmpeg
+    (tpad clone) instead of being sent repeatedly.
+    """
+
+    def __init__(
+        self,
+        output_path,
+        width: int,
+        height: int,
+        fps: int,
+        pix_fmt: str = "rgb24",
+        hold_start_frames: int = 0,
+        hold_end_frames: int = 0,
+        queue_size: int = 8,
+        ffmpeg_path: str = "ffmpeg",
+    ):
+        import queue
+        import tempfile
+        import threading
+
+        self.width = width
+        self.height = height
+        self.hold_start_frames = max(0, int(hold_start_frames))
+        self.hold_end_frames = max(0, int(hold_end_frames))
+        self.frames_written = 0
+
+        # Hold frames are sent once; tpad clones them for the remaining count.
+        pad_start = max(0, self.hold_start_frames - 1)
+        pad_end = max(0, self.hold_end_frames - 1)
+        vf = []
+        if pad_start or pad_end:
+            vf.append(
+                f"tpad=start={pad_start}:start_mode=clone:"
+                f"stop={pad_end}:stop_mode=clone"
+            )
+
+        cmd = [
+            ffmpeg_path, "-y",
+            "-f", "rawvideo",
+            "-pix_fmt", pix_fmt,
+            "-s", f"{width}x{height}",
+            "-framerate", str(fps),
+            "-i", "-",
+        ]
+        if vf:
+            cmd += ["-vf", ",".join(vf)]
+        cmd += [
+            "-c:v", "libx264",
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            str(output_path),
+        ]
+
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=self._stderr,
+        )
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._error = None
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    def _writer(self):
+        while True:
+            buf = self._queue.get()
+            if buf is None:
+                break
+            if self._error is not None:
+                continue  # drain so the producer never blocks
+            try:
+                self._proc.stdin.write(buf)
+            except (BrokenPipeError, OSError) as e:
+                self._error = e
+
+    def write(self, frame: np.ndarray) -> None:
+        if frame.shape[0] != self.height or frame.shape[1] != self.width:
+            raise ValueError(
+                f"Frame size {frame.shape[1]}x{frame.shape[0]} does not match "
+                f"sink size {self.width}x{self.height}"
+            )
+        if self._error is not None:
+            self.close()
+        self._queue.put(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+        self.frames_written += 1
+
+    def write_hold_start(self, frame: np.ndarray) -> None:
+        if self.hold_start_frames:
+            self.write(frame)
+
+    def write_hold_end(self, frame: np.ndarray) -> None:
+        if self.hold_end_frames:
+            self.write(frame)
+
+    @property
+    def total_frames(self) -> int:
+        pad = max(0, self.hold_start_frames - 1) + max(0, self.hold_end_frames - 1)
+        return self.frames_written + pad
+
+    def close(self) -> None:
+        if self._proc is None:
+            if self._error is not None:
+                raise RuntimeError(f"ffmpeg frame pipe failed: {self._error}")
+            return
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        returncode = self._proc.wait()
+        self._proc = None
+
+        self._stderr.seek(0)
+        stderr = self._stderr.read().decode("utf-8", errors="replace")
+        self._stderr.close()
+
+        if returncode != 0:
+            raise RuntimeError(
+                f"ffmpeg failed with code {returncode}:\n"
+                f"STDERR:\n{stderr}"
+            )
+        if self._error is not None:
+            raise RuntimeError(f"ffmpeg frame pipe failed: {self._error}")
+
+    def abort(self) -> None:
+        if self._proc is None:
+            return
+        try:
+            self._proc.kill()
+        except OSError:
+            pass
+        self._queue.put(None)
+        self._thread.join()
+        self._proc.wait()
+        self._proc = None
+        self._stderr.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+class _PngFrameSink:
+    """
+    Debug sink: write every frame (holds included) as frame_%04d.png and,
+    if `output_path` is given, encode the folder with ffmpeg on close.
+    """
+
+    def __init__(
+        self,
+        frames_dir,
+        output_path=None,
+        fps: int = 30,
+        color_order: str = "rgb",
+        hold_start_frames: int = 0,
+        hold_end_frames: int = 0,
+        ffmpeg_path: str = "ffmpeg",
+    ):
+        self.frames_dir = Path(frames_dir)
+        self.frames_dir.mkdir(parents=True, exist_ok=True)
+        self.output_path = output_path
+        self.fps = fps
+        self.color_order = color_order
+        self.hold_start_frames = max(0, int(hold_start_frames))
+        self.hold_end_frames = max(0, int(hold_end_frames))
+        self.ffmpeg_path = ffmpeg_path
+        self.frames_written = 0
+
+    def write(self, frame: np.ndarray) -> None:
+        path = self.frames_dir / f"frame_{self.frames_written:04d}.png"
+        if self.color_order == "bgr":
+            cv2.imwrite(str(path), frame)
+        else:
+            Image.fromarray(frame.astype(np.uint8)).save(path)
+        self.frames_written += 1
+
+    def write_hold_start(self, frame: np.ndarray) -> None:
+        for _ in range(self.hold_start_frames):
+            self.write(frame)
+
+    def write_hold_end(self, frame: np.ndarray) -> None:
+        for _ in range(self.hold_end_frames):
+            self.write(frame)
+
+    @property
+    def total_frames(self) -> int:
+        return self.frames_written
+
+    def close(self) -> None:
+        if self.output_path is None:
+            return
+        cmd = [
+            self.ffmpeg_path, "-y",
+            "-framerate", str(self.fps),
+            "-i", str(self.frames_dir / "frame_%04d.png"),
+            "-c:v", "libx264",
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            str(self.output_path),
+        ]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(
+                f"ffmpeg failed with code {proc.returncode}:\n"
+                f"STDOUT:\n{proc.stdout}\n\nSTDERR:\n{proc.stderr}"
+            )
+
+    def abort(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        return False
+
+
+FRAME_SINK_MODES = ("pipe", "png")
+
+
+def _open_frame_sink(
+    frame_sink: str,
+    output_path,
+    width: int,
+    height: int,
+    fps: int,
+    color_order: str = "rgb",
+    hold_start_frames: int = 0,
+    hold_end_frames: int = 0,
+    frames_dir=None,
+):
+    """
+    Build a frame sink for an animation:
+      - "pipe": raw frames straight into one ffmpeg process (default)
+      - "png" : debug mode, PNG frames on disk then a second ffmpeg pass
+    """
+    mode = (frame_sink or "pipe").lower()
+    if mode == "pipe":
+        return _PipeFrameSink(
+            output_path,
+            width,
+            height,
+            fps,
+            pix_fmt="bgr24" if color_order == "bgr" else "rgb24",
+            hold_start_frames=hold_start_frames,
+            hold_end_frames=hold_end_frames,
+        )
+    if mode == "png":
+        if frames_dir is None:
+            raise ValueError("frames_dir is required for the 'png' frame sink.")
+        return _PngFrameSink(
+            frames_dir,
+            output_path=output_path,
+            fps=fps,
+            color_order=color_order,
+            hold_start_frames=hold_start_frames,
+            hold_end_frames=hold_end_frames,
+        )
+    raise ValueError(f"Unknown frame_sink {frame_sink!r}; expected one of {FRAME_SINK_MODES}")
+
+
 def _quantize_to_color_labels(img: Image.Image, num_colors: int = 7):
     """
     Use Pillow's adaptive palette to quantize the image into `num_colors`
@@ -38,6 +320,7 @@ def _create_coloring_animation_by_color(
     hold_end_sec: float = 1.2,
     target_size: tuple[int, int] | None = None,
     bg_color=(255, 255, 255),
+    frame_sink: str = "pipe",
 ):
     """
     More 'artistic' coloring animation:
@@ -47,9 +330,11 @@ def _create_coloring_animation_by_color(
       - Then move to next color
 
     Looks like an artist coloring the page one color at a time.
+
+    frame_sink: "pipe" streams frames into ffmpeg; "png" writes PNG frames
+    to a temp folder first (debug).
     """
     from tempfile import TemporaryDirectory
-    import subprocess
 
     # Load original
     img = Image.open(input_path).convert("RGB")
@@ -131,120 +416,95 @@ def _create_coloring_animation_by_color(
             duration_sec=4.0,
             target_size=target_size,
             bg_color=bg_color,
+            frame_sink=frame_sink,
         )
 
+    hold_line_frames = int(round(hold_line_sec * fps))
+    hold_end_frames = int(round(hold_end_sec * fps))
+
     with TemporaryDirectory() as tmpdir:
-        tmpdir_path = Path(tmpdir)
-        frame_idx = 0
+        sink = _open_frame_sink(
+            frame_sink,
+            output_path,
+            w,
+            h,
+            fps,
+            color_order="rgb",
+            hold_start_frames=hold_line_frames,
+            hold_end_frames=hold_end_frames,
+            frames_dir=tmpdir,
+        )
+        with sink:
+            # Start from pure line-art
+            current_frame = line_np.copy()
 
-        # Start from pure line-art
-        current_frame = line_np.copy()
+            # Hold line-art for a moment
+            sink.write_hold_start(current_frame.astype(np.uint8))
 
-        # Hold line-art for a moment
-        hold_line_frames = int(round(hold_line_sec * fps))
-        for _ in range(hold_line_frames):
-            Image.fromarray(current_frame.astype(np.uint8)).save(
-                tmpdir_path / f"frame_{frame_idx:04d}.png"
-            )
-            frame_idx += 1
-
-        # Animate each color cluster
-        for color_idx_pos, pal_idx in enumerate(ordered_indices):
-            # Binary mask for this color
-            mask_color = (labels == pal_idx).astype(np.float32)  # 0 or 1
-
-            # Slightly erode/dilate via blur to avoid pixel-noise edges
-            mask_img = Image.fromarray((mask_color * 255).astype(np.uint8))
-            mask_img = mask_img.filter(ImageFilter.GaussianBlur(radius=0.8))
-            mask_color = np.array(mask_img, dtype=np.float32) / 255.0
-
-            # Skip super tiny regions
-            if mask_color.sum() < 50:
-                continue
-
-            # For this color, gradually reveal with random brushiness
-            # Skip super tiny regions
-            if mask_color.sum() < 50:
-                continue
-
-            # ---- Directional brush front for this color ----
-            ys, xs = np.where(mask_color > 0.2)
-            if ys.size == 0:
-                continue
-
-            min_x, max_x = xs.min(), xs.max()
-            min_y, max_y = ys.min(), ys.max()
-
-            # Random stroke direction for this color (in radians)
-            theta = float(rng.uniform(0.0, 2.0 * np.pi))
-            dir_x, dir_y = float(np.cos(theta)), float(np.sin(theta))
-
-            # Project each pixel to a 1D coordinate along the stroke direction
-            proj = (xx - min_x) * dir_x + (yy - min_y) * dir_y
-            proj_region = proj[mask_color > 0.2]
-            p_min, p_max = proj_region.min(), proj_region.max()
-            proj_norm = (proj - p_min) / (p_max - p_min + 1e-6)  # 0→1 over region
-
-            # For this color, gradually reveal with a wavy brush front
-            for step in range(brush_steps_per_color):
-                t = (step + 1) / brush_steps_per_color  # 0→1
-
-                # Threshold that moves across the region, with noise-based waviness
-                threshold = proj_norm + noise_map * 0.25
-                reveal_mask = (mask_color > 0.1) & (threshold <= t)
-                reveal_mask = reveal_mask.astype(np.float32)
-
-                # Soften edge a bit
-                reveal_img = Image.fromarray((reveal_mask * 255).astype(np.uint8))
-                reveal_img = reveal_img.filter(ImageFilter.GaussianBlur(radius=1.4))
-                reveal_mask = np.array(reveal_img, dtype=np.float32) / 255.0
-
-                # Restrict strictly to this color region
-                reveal_mask *= (mask_color > 0.05).astype(np.float32)
-
-                # Expand to 3 channels
-                reveal_3 = np.dstack([reveal_mask] * 3)
-
-                # Blend this color from original img into current_frame
-                current_frame = current_frame * (1.0 - reveal_3) + img_np * reveal_3
-
-                # 🔴 NEW: re-impose black ink lines so they never get washed out
-                current_frame = np.minimum(current_frame, line_np)
-
-                current_frame = np.clip(current_frame, 0, 255)
-
-                # Save frame
-                Image.fromarray(current_frame.astype(np.uint8)).save(
-                    tmpdir_path / f"frame_{frame_idx:04d}.png"
-                )
-                frame_idx += 1
-
-
-        # Hold final fully-colored frame
-        hold_end_frames = int(round(hold_end_sec * fps))
-        final_frame = np.array(img, dtype=np.uint8)
-        for _ in range(hold_end_frames):
-            Image.fromarray(final_frame).save(
-                tmpdir_path / f"frame_{frame_idx:04d}.png"
-            )
-            frame_idx += 1
+            # Animate each color cluster
+            for color_idx_pos, pal_idx in enumerate(ordered_indices):
+                # Binary mask for this color
+                mask_color = (labels == pal_idx).astype(np.float32)  # 0 or 1
 
-        # ffmpeg encode
-        cmd = [
-            "ffmpeg", "-y",
-            "-framerate", str(fps),
-            "-i", str(tmpdir_path / "frame_%04d.png"),
-            "-c:v", "libx264",
-            "-pix_fmt", "yuv420p",
-            "-movflags", "+faststart",
-            str(output_path),
-        ]
-        proc = subprocess.run(cmd, capture_output=True, text=True)
-        if proc.returncode != 0:
-            raise RuntimeError(
-                f"ffmpeg failed with code {proc.returncode}:\n"
-                f"STDOUT:\n{proc.stdout}\n\nSTDERR:\n{proc.stderr}"
-            )
+                # Slightly erode/dilate via blur to avoid pixel-noise edges
+                mask_img = Image.fromarray((mask_color * 255).astype(np.uint8))
+                mask_img = mask_img.filter(ImageFilter.GaussianBlur(radius=0.8))
+                mask_color = np.array(mask_img, dtype=np.float32) / 255.0
+
+                # Skip super tiny regions
+                if mask_color.sum() < 50:
+                    continue
+
+                # ---- Directional brush front for this color ----
+                ys, xs = np.where(mask_color > 0.2)
+                if ys.size == 0:
+                    continue
+
+                min_x, max_x = xs.min(), xs.max()
+                min_y, max_y = ys.min(), ys.max()
+
+                # Random stroke direction for this color (in radians)
+                theta = float(rng.uniform(0.0, 2.0 * np.pi))
+                dir_x, dir_y = float(np.cos(theta)), float(np.sin(theta))
+
+                # Project each pixel to a 1D coordinate along the stroke direction
+                proj = (xx - min_x) * dir_x + (yy - min_y) * dir_y
+                proj_region = proj[mask_color > 0.2]
+                p_min, p_max = proj_region.min(), proj_region.max()
+                proj_norm = (proj - p_min) / (p_max - p_min + 1e-6)  # 0→1 over region
+
+                # For this color, gradually reveal with a wavy brush front
+                for step in range(brush_steps_per_color):
+                    t = (step + 1) / brush_steps_per_color  # 0→1
+
+                    # Threshold that moves across the region, with noise-based waviness
+                    threshold = proj_norm + noise_map * 0.25
+                    reveal_mask = (mask_color > 0.1) & (threshold <= t)
+                    reveal_mask = reveal_mask.astype(np.float32)
+
+                    # Soften edge a bit
+                    reveal_img = Image.fromarray((reveal_mask * 255).astype(np.uint8))
+                    reveal_img = reveal_img.filter(ImageFilter.GaussianBlur(radius=1.4))
+                    reveal_mask = np.array(reveal_img, dtype=np.float32) / 255.0
+
+                    # Restrict strictly to this color region
+                    reveal_mask *= (mask_color > 0.05).astype(np.float32)
+
+                    # Expand to 3 channels
+                    reveal_3 = np.dstack([reveal_mask] * 3)
+
+                    # Blend this color from original img into current_frame
+                    current_frame = current_frame * (1.0 - reveal_3) + img_np * reveal_3
+
+                    # 🔴 NEW: re-impose black ink lines so they never get washed out
+                    current_frame = np.minimum(current_frame, line_np)
+
+                    current_frame = np.clip(current_frame, 0, 255)
+
+                    sink.write(current_frame.astype(np.uint8))
+
+            # Hold final fully-colored frame
+            sink.write_hold_end(np.array(img, dtype=np.uint8))
 
 
 # =========================
@@ -294,17 +554,19 @@ def _create_coloring_animation(
     duration_sec: float = 4.0,
     target_size: tuple[int, int] | None = None,
     bg_color=(255, 255, 255),
+    frame_sink: str = "pipe",
 ) -> None:
     """
     Create a 'coloring' animation:
       1) Start with a clean line-art version (no color)
       2) Sweep color from left to right using the original colored image
 
-    Writes an MP4 to `output_path` using ffmpeg.
+    Writes an MP4 to `output_path` using ffmpeg. With frame_sink="pipe"
+    (default) frames are streamed to the encoder; "png" keeps the old
+    write-PNGs-then-encode path for debugging.
     """
 
     from tempfile import TemporaryDirectory
-    import subprocess
 
     # Load base image
     img = Image.open(input_path).convert("RGB")
@@ -331,54 +593,36 @@ def _create_coloring_animation(
     hold_end_frames = int(fps * 0.7)     # hold full-color at the end
 
     with TemporaryDirectory() as tmpdir:
-        tmpdir_path = Path(tmpdir)
-
-        frame_idx = 0
-
-        # 1) Hold line-art only
-        for _ in range(hold_start_frames):
-            frame_path = tmpdir_path / f"frame_{frame_idx:04d}.png"
-            line_art.save(frame_path)
-            frame_idx += 1
-
-        # 2) Sweep color left→right
-        sweep_frames = max(5, total_frames - hold_start_frames - hold_end_frames)
-        for i in range(sweep_frames):
-            t = (i + 1) / sweep_frames  # 0→1
-            mask = Image.new("L", (w, h), 0)
-            draw = ImageDraw.Draw(mask)
-            sweep_x = int(w * t)
-            draw.rectangle([0, 0, sweep_x, h], fill=255)
-
-            frame = Image.composite(img, line_art, mask).convert("RGB")
-            frame_path = tmpdir_path / f"frame_{frame_idx:04d}.png"
-            frame.save(frame_path)
-            frame_idx += 1
-
-        # 3) Hold full-color at the end
-        for _ in range(hold_end_frames):
-            frame_path = tmpdir_path / f"frame_{frame_idx:04d}.png"
-            img.save(frame_path)
-            frame_idx += 1
-
-        # Build video using ffmpeg
-        cmd = [
-            "ffmpeg",
-            "-y",
-            "-framerate", str(fps),
-            "-i", str(tmpdir_path / "frame_%04d.png"),
-            "-c:v", "libx264",
-            "-pix_fmt", "yuv420p",
-            "-movflags", "+faststart",
-            str(output_path),
-        ]
-        proc = subprocess.run(cmd, capture_output=True, text=True)
+        sink = _open_frame_sink(
+            frame_sink,
+            output_path,
+            w,
+            h,
+            fps,
+            color_order="rgb",
+            hold_start_frames=hold_start_frames,
+            hold_end_frames=hold_end_frames,
+            frames_dir=tmpdir,
+        )
+        with sink:
+            # 1) Hold line-art only
+            sink.write_hold_start(np.asarray(line_art))
+
+            # 2) Sweep color left→right
+            sweep_frames = max(5, total_frames - hold_start_frames - hold_end_frames)
+            for i in range(sweep_frames):
+                t = (i + 1) / sweep_frames  # 0→1
+                mask = Image.new("L", (w, h), 0)
+                draw = ImageDraw.Draw(mask)
+                sweep_x = int(w * t)
+                draw.rectangle([0, 0, sweep_x, h], fill=255)
+
+                frame = Image.composite(img, line_art, mask).convert("RGB")
+                sink.write(np.asarray(frame))
+
+            # 3) Hold full-color at the end
+            sink.write_hold_end(np.asarray(img))
 
-        if proc.returncode != 0:
-            raise RuntimeError(
-                f"ffmpeg failed with code {proc.returncode}:\n"
-                f"STDOUT:\n{proc.stdout}\n\nSTDERR:\n{proc.stderr}"
-            )
 # =========================
 #  Mask Utilities
 # =========================
@@ -473,6 +717,203 @@ def generate_mask(
         return mask
 
 
+class RevealMaskEngine:
+    """
+    Cached, closed-form version of `generate_mask` for a fixed frame size.
+
+    Everything that does not depend on progress is computed once:
+      - wipe styles: a blurred 1-D column profile, broadcast over rows
+        (returned as a (1, w) view, so per-frame cost is O(w))
+      - radial_in  : smoothstep of `dist_norm`, looked up through a
+        quantized distance index (one gather per frame)
+      - noisy_brush: the noisy threshold field is blurred once; each frame is
+        a smoothstep band around progress, again via a lookup table
+
+    Masks are float32 in [0,1] and broadcast against (h, w) / (h, w, 1).
+    """
+
+    # Edge half-widths matching the slope of the old blurred hard edges:
+    # a Gaussian-blurred step has slope 1/(sigma*sqrt(2*pi)), smoothstep
+    # over [-k, k] has slope 0.75/k at its centre.
+    _SMOOTHSTEP_PER_SIGMA = 0.75 * np.sqrt(2.0 * np.pi)
+    _LUT_LEVELS = 4096
+
+    def __init__(
+        self,
+        h: int,
+        w: int,
+        dist_norm: np.ndarray | None = None,
+        noise_map: np.ndarray | None = None,
+    ):
+        self.h = h
+        self.w = w
+        self._dist_norm = dist_norm
+        self._noise_map = noise_map
+        self._wipe_base = np.linspace(0.0, 1.0, w, dtype=np.float32)[None, :]
+        self._radial = None
+        self._noisy = None
+
+    # ---- helpers ----
+
+    @staticmethod
+    def _smoothstep_down(values: np.ndarray, center: float, half_width: float) -> np.ndarray:
+        """1 below center-half_width, 0 above center+half_width, smooth between."""
+        t = np.clip((values - (center - half_width)) / (2.0 * half_width), 0.0, 1.0)
+        return (1.0 - t * t * (3.0 - 2.0 * t)).astype(np.float32)
+
+    def _quantize(self, field: np.ndarray):
+        lo = float(field.min())
+        hi = float(field.max())
+        span = max(hi - lo, 1e-6)
+        n = self._LUT_LEVELS
+        idx = np.rint((field - lo) * ((n - 1) / span)).astype(np.intp)
+        levels = (lo + np.arange(n, dtype=np.float32) * (span / (n - 1))).astype(np.float32)
+        return idx, levels
+
+    def _radial_state(self):
+        if self._radial is None:
+            dist_norm = self._dist_norm
+            if dist_norm is None:
+                _, _, dist_norm = _prepare_coord_grids(self.h, self.w)
+            # dist_norm is relative to the farthest corner; convert the old
+            # 6px blur into normalized units.
+            max_dist = 0.5 * float(np.hypot(self.w, self.h))
+            half_width = self._SMOOTHSTEP_PER_SIGMA * 6.0 / max(max_dist, 1.0)
+            idx, levels = self._quantize(dist_norm)
+            self._radial = (idx, levels, half_width)
+        return self._radial
+
+    def _noisy_state(self):
+        if self._noisy is None:
+            if self._noise_map is None:
+                raise ValueError("noise_map is required for 'noisy_brush' style.")
+            # Blurring the per-pixel binary reveal (sigma=5) averages the
+            # noise into a soft band of width ~std(noise * 0.25) around the
+            # front. Keep the low-frequency part of the noise as texture and
+            # turn the averaged part into the smoothstep band width.
+            noise_std = float(self._noise_map.std()) * 0.25
+            texture = cv2.GaussianBlur(
+                self._noise_map.astype(np.float32), ksize=(0, 0), sigmaX=5.0, sigmaY=5.0
+            )
+            field = self._wipe_base + texture * 0.25
+            half_width = self._SMOOTHSTEP_PER_SIGMA * max(noise_std, 1e-3)
+            idx, levels = self._quantize(field)
+            self._noisy = (idx, levels, half_width)
+        return self._noisy
+
+    def _wipe(self, p: float, sigma: float) -> np.ndarray:
+        row = (self._wipe_base <= p).astype(np.float32)
+        row = cv2.GaussianBlur(
+            row, ksize=(0, 0), sigmaX=sigma, sigmaY=sigma, borderType=cv2.BORDER_REFLECT_101
+        )
+        return np.clip(row, 0.0, 1.0)
+
+    # ---- public ----
+
+    def mask(self, style: str, progress: float) -> np.ndarray:
+        """
+        Mask for `style` at `progress` (0→1), same styles/easing as generate_mask.
+        Wipe masks come back as (1, w); the others as (h, w).
+        """
+        p = _easing(progress, "ease_in_out")
+
+        if style == "wipe_lr":
+            return self._wipe(p, sigma=4.0)
+
+        if style == "radial_in":
+            idx, levels, half_width = self._radial_state()
+            # The legacy blur can't spread past the centre / corners (dist_norm's
+            # extremes), so at p=0 nothing is revealed and at p=1 everything is.
+            # Within one band width of either end, slide the band out to match.
+            center = (
+                p
+                - half_width * min(max(1.0 - p / (2.0 * half_width), 0.0), 1.0)
+                + half_width * min(max(1.0 - (1.0 - p) / (2.0 * half_width), 0.0), 1.0)
+            )
+            lut = self._smoothstep_down(levels, center, half_width)
+            return np.take(lut, idx)
+
+        if style == "noisy_brush":
+            idx, levels, half_width = self._noisy_state()
+            lut = self._smoothstep_down(levels, p, half_width)
+            return np.take(lut, idx)
+
+        # Fallback: simple linear wipe
+        return self._wipe(p, sigma=3.0)
+
+
+def benchmark_mask_engine(
+    h: int = 1920,
+    w: int = 1080,
+    frames: int = 30,
+    styles: Tuple[str, ...] = ("wipe_lr", "radial_in", "noisy_brush"),
+) -> dict:
+    """
+    Time per-frame mask generation: legacy `generate_mask` vs RevealMaskEngine.
+    Returns {style: (legacy_ms, engine_ms)} and prints a small table.
+    """
+    import time
+
+    yy, xx, dist_norm = _prepare_coord_grids(h, w)
+    rng = np.random.default_rng(seed=42)
+    noise_map = rng.normal(loc=0.0, scale=0.8, size=(h, w)).astype(np.float32)
+    engine = RevealMaskEngine(h, w, dist_norm=dist_norm, noise_map=noise_map)
+
+    results = {}
+    print(f"[BENCH] mask generation at {w}x{h}, {frames} frames per style")
+    for style in styles:
+        nm = noise_map if style == "noisy_brush" else None
+        engine.mask(style, 0.5)  # build cached state outside the timing
+
+        t0 = time.perf_counter()
+        for i in range(frames):
+            generate_mask(style, i / max(1, frames - 1), h, w, yy, xx, dist_norm, nm)
+        legacy_ms = (time.perf_counter() - t0) * 1000.0 / frames
+
+        t0 = time.perf_counter()
+        for i in range(frames):
+            engine.mask(style, i / max(1, frames - 1))
+        engine_ms = (time.perf_counter() - t0) * 1000.0 / frames
+
+        results[style] = (legacy_ms, engine_ms)
+        print(
+            f"[BENCH] {style:<12} legacy {legacy_ms:8.2f} ms/frame   "
+            f"engine {engine_ms:8.3f} ms/frame   x{legacy_ms / max(engine_ms, 1e-9):.0f}"
+        )
+    return results
+
+
+def check_mask_engine(
+    h: int = 480,
+    w: int = 270,
+    progresses: Tuple[float, ...] = (0.0, 0.5, 1.0),
+    styles: Tuple[str, ...] = ("wipe_lr", "radial_in"),
+    tol: float = 0.1,
+) -> dict:
+    """
+    Compare RevealMaskEngine against the legacy `generate_mask`.
+    Returns {(style, progress): max abs difference}; raises AssertionError above `tol`.
+
+    The first/last frames are compared over the whole image. In between, a 3-sigma
+    border is skipped: the legacy blur mirrors the mask at the image edges, which
+    the closed form does not model.
+    """
+    yy, xx, dist_norm = _prepare_coord_grids(h, w)
+    engine = RevealMaskEngine(h, w, dist_norm=dist_norm)
+
+    results = {}
+    for style in styles:
+        for p in progresses:
+            legacy = generate_mask(style, p, h, w, yy, xx, dist_norm)
+            fast = np.broadcast_to(engine.mask(style, p), (h, w))
+            m = 0 if p in (0.0, 1.0) else 18
+            diff = float(np.abs(legacy - fast)[m:h - m, m:w - m].max())
+            results[(style, p)] = diff
+            print(f"[CHECK] {style:<12} p={p:<4} max |legacy - engine| = {diff:.4f}")
+            assert diff <= tol, f"{style} at p={p} differs from generate_mask by {diff:.3f}"
+    return results
+
+
 # =========================
 #  Main Animation Builder
 # =========================
@@ -485,6 +926,8 @@ def create_coloring_animation_frames(
     color_reveal_duration_sec: float = 3.0,
     hold_start_sec: float = 0.7,
     hold_end_sec: float = 1.0,
+    output_path: str | None = None,
+    frame_sink: str | None = None,
 ) -> int:
     """
     Create high-quality coloring animation frames from a fully colored page.
@@ -496,6 +939,11 @@ def create_coloring_animation_frames(
         4) Reveal original colors using chosen animation style
         5) Hold final colored frame (after)
 
+    Output:
+        - output_path=None: PNG frames in `frames_dir` (use frames_to_video)
+        - output_path set : frames stream straight into ffmpeg ("pipe");
+          pass frame_sink="png" to also keep the PNGs for debugging.
+
     Returns:
         Total number of frames created.
     """
@@ -510,8 +958,6 @@ def create_coloring_animation_frames(
     # Generate line-art "no-color" version
     line_art = make_line_art(img)
 
-    os.makedirs(frames_dir, exist_ok=True)
-
     # Convert timing to frame counts
     hold_start_frames = int(round(hold_start_sec * fps))
     hold_end_frames = int(round(hold_end_sec * fps))
@@ -531,47 +977,59 @@ def create_coloring_animation_frames(
     rng = np.random.default_rng(seed=42)
     noise_map = rng.normal(loc=0.0, scale=0.8, size=(h, w)).astype(np.float32)
 
+    # Progress-independent mask state is built once, not per frame
+    mask_engine = RevealMaskEngine(
+        h, w,
+        dist_norm=dist_norm,
+        noise_map=noise_map if style == "noisy_brush" else None,
+    )
+
     # Prepare float versions for blending
     line_art_f = line_art.astype(np.float32)
-    img_f = img.astype(np.float32)
-
-    frame_idx = 0
-
-    # 1) Hold pure line-art
-    for _ in range(hold_start_frames):
-        cv2.imwrite(os.path.join(frames_dir, f"frame_{frame_idx:04d}.png"), line_art)
-        frame_idx += 1
-
-    # 2) Reveal original colors progressively
-    for step in range(reveal_frames):
-        progress = step / max(1, reveal_frames - 1)  # 0 → 1
-
-        mask_2d = generate_mask(
-            style=style,
-            progress=progress,
-            h=h,
-            w=w,
-            yy=yy,
-            xx=xx,
-            dist_norm=dist_norm,
-            noise_map=noise_map if style == "noisy_brush" else None
-        )
+    color_delta_f = img.astype(np.float32) - line_art_f
 
-        # Expand to 3 channels
-        mask_3d = np.dstack([mask_2d] * 3).astype(np.float32)
+    if frame_sink is None:
+        frame_sink = "pipe" if output_path else "png"
+    if frame_sink == "pipe" and not output_path:
+        raise ValueError("output_path is required for the 'pipe' frame sink.")
 
-        frame = line_art_f * (1.0 - mask_3d) + img_f * mask_3d
-        frame = np.clip(frame, 0, 255).astype(np.uint8)
+    sink = _open_frame_sink(
+        frame_sink,
+        output_path,
+        w,
+        h,
+        fps,
+        color_order="bgr",
+        hold_start_frames=hold_start_frames,
+        hold_end_frames=hold_end_frames,
+        frames_dir=frames_dir,
+    )
+    with sink:
+        # 1) Hold pure line-art
+        sink.write_hold_start(line_art)
+
+        # 2) Reveal original colors progressively
+        for step in range(reveal_frames):
+            progress = step / max(1, reveal_frames - 1)  # 0 → 1
+
+            mask_2d = mask_engine.mask(style, progress)
+
+            # Broadcast over channels (and rows, for wipe masks)
+            mask_3d = mask_2d[..., None]
 
-        cv2.imwrite(os.path.join(frames_dir, f"frame_{frame_idx:04d}.png"), frame)
-        frame_idx += 1
+            frame = line_art_f + color_delta_f * mask_3d
+            frame = np.clip(frame, 0, 255).astype(np.uint8)
 
-    # 3) Hold final fully-colored frame
-    for _ in range(hold_end_frames):
-        cv2.imwrite(os.path.join(frames_dir, f"frame_{frame_idx:04d}.png"), img)
-        frame_idx += 1
+            sink.write(frame)
 
-    print(f"[INFO] Saved {frame_idx} frames to: {frames_dir}")
+        # 3) Hold final fully-colored frame
+        sink.write_hold_end(img)
+
+    frame_idx = sink.total_frames
+    if frame_sink == "png":
+        print(f"[INFO] Saved {frame_idx} frames to: {frames_dir}")
+    else:
+        print(f"[INFO] Streamed {frame_idx} frames to: {output_path}")
     return frame_idx
 
 
@@ -639,6 +1097,12 @@ def _letterbox_to_canvas(img: Image.Image,
 # =========================
 
 if __name__ == "__main__":
+    import sys
+
+    if "--bench-masks" in sys.argv:
+        benchmark_mask_engine(h=1920, w=1080, frames=30)
+        sys.exit(0)
+
     # Example usage - change input/output paths as needed
     INPUT_IMAGE = "input_colored_page.png"
     FRAMES_DIR = "frames_coloring_wipe"
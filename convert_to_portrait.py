@@ -1,7 +1,8 @@
 import subprocess
-import json
 import os
 
+import media_probe
+
 def convert_landscape_to_portrait(input_path, output_path, portrait_width=1080, portrait_height=1920,
                   max_duration=180, trim_to=176):
     """
@@ -18,22 +19,12 @@ def convert_landscape_to_portrait(input_path, output_path, portrait_width=1080,
     """
     try:
         # Step 1️⃣: Get video info (width, height, duration)
-        result = subprocess.run(
-            [
-                "ffprobe", "-v", "error",
-                "-select_streams", "v:0",
-                "-show_entries", "stream=width,height",
-                "-show_entries", "format=duration",
-                "-of", "json",
-                input_path
-            ],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
-        info = json.loads(result.stdout)
-        video_stream = info.get("streams", [{}])[0]
-        duration = float(info["format"]["duration"])
-        width = video_stream.get("width", 0)
-        height = video_stream.get("height", 0)
+        info = media_probe.probe(input_path)
+        if info.duration is None:
+            raise ValueError(f"ffprobe returned no duration for {input_path}")
+        duration = info.duration
+        width = info.width or 0
+        height = info.height or 0
 
         print(f"🎥 Video info: {width}x{height}, duration {duration:.2f}s")
 
@@ -0,0 +1,97 @@
+# encoding_profile.py — shared render profiles (final / draft) for the video pipelines
+#
+# assemble_videos, create_video_using_camera_frames (story_segments), make_kb_videos
+# and scene_builder each pick their own x264 settings and always render at full
+# resolution. They now also take a render profile and ask it for size, fps and
+# encoder settings:
+#
+#     prof = encoding_profile.get(render_profile)      # None / "final" / "draft" / EncodingProfile
+#     w, h = prof.size(1920, 1080)                     # draft: (854, 480)
+#     fps = prof.frame_rate(30)                        # draft: 15
+#     cmd += prof.x264_args("veryfast", 18)            # draft: -preset ultrafast -crf 30
+#
+# "final" overrides nothing: every pipeline keeps its own full-quality defaults.
+# The profile only changes how a plan is encoded, never the plan itself (clip
+# order, durations, segments), so a draft can be re-rendered as the final.
+#
+# Env overrides:
+#     RENDER_PROFILE        default profile when a request doesn't pick one (default: final)
+#     RENDER_DRAFT_HEIGHT   short side of draft renders in pixels (default: 480)
+#     RENDER_DRAFT_FPS      frame-rate cap of draft renders (default: 15)
+#     RENDER_DRAFT_PRESET   x264 preset of draft renders (default: ultrafast)
+#     RENDER_DRAFT_CRF      x264 CRF of draft renders (default: 30)
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+
+DEFAULT_PROFILE = os.getenv("RENDER_PROFILE", "final").strip().lower()
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    name: str
+    preset: str | None = None       # x264 preset override (None = pipeline default)
+    crf: int | None = None          # x264 CRF override (None = pipeline default)
+    max_height: int | None = None   # cap on the short side, aspect kept (None = full resolution)
+    max_fps: int | None = None      # frame-rate cap (None = pipeline fps)
+
+    @property
+    def is_draft(self) -> bool:
+        return any(v is not None for v in (self.preset, self.crf, self.max_height, self.max_fps))
+
+    def size(self, w: int, h: int) -> tuple[int, int]:
+        """(w, h) scaled down so the short side is at most max_height; both even."""
+        w, h = int(w), int(h)
+        short = min(w, h)
+        if not self.max_height or short <= self.max_height:
+            return w, h
+        s = self.max_height / short
+        return max(2, int(round(w * s / 2)) * 2), max(2, int(round(h * s / 2)) * 2)
+
+    def res(self, out_res: str, sep: str = "x") -> str:
+        """size() for "WxH" strings (scene_builder's out_res)."""
+        w, h = (int(v) for v in out_res.lower().split(sep))
+        w, h = self.size(w, h)
+        return f"{w}{sep}{h}"
+
+    def frame_rate(self, fps):
+        return min(fps, self.max_fps) if self.max_fps else fps
+
+    def x264(self, preset=None, crf=None) -> tuple:
+        """(preset, crf) with this profile's overrides applied to the pipeline defaults."""
+        return self.preset or preset, self.crf if self.crf is not None else crf
+
+    def x264_args(self, preset=None, crf=None) -> list[str]:
+        """-preset/-crf args for libx264; omitted where neither the pipeline nor the profile sets one."""
+        preset, crf = self.x264(preset, crf)
+        args = []
+        if preset:
+            args += ["-preset", str(preset)]
+        if crf is not None:
+            args += ["-crf", str(crf)]
+        return args
+
+
+PROFILES = {
+    "final": EncodingProfile("final"),
+    "draft": EncodingProfile(
+        "draft",
+        preset=os.getenv("RENDER_DRAFT_PRESET", "ultrafast"),
+        crf=int(os.getenv("RENDER_DRAFT_CRF", "30")),
+        max_height=int(os.getenv("RENDER_DRAFT_HEIGHT", "480")),
+        max_fps=int(os.getenv("RENDER_DRAFT_FPS", "15")),
+    ),
+}
+PROFILES["preview"] = PROFILES["draft"]
+
+
+def get(profile=None) -> EncodingProfile:
+    """Profile by name (None / "" -> RENDER_PROFILE); EncodingProfile instances pass through."""
+    if isinstance(profile, EncodingProfile):
+        return profile
+    name = (profile or DEFAULT_PROFILE).strip().lower()
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown render profile: {profile!r} (expected one of {sorted(PROFILES)})")
@@ -9,8 +9,7 @@ from datetime import datetime
 from playwright.sync_api import sync_playwright
 from playwright.sync_api import TimeoutError as PWTimeoutError
 from openpyxl import load_workbook
-import subprocess
-import json
+import media_probe
 
 # ================== CONFIG ==================
 
@@ -61,19 +60,13 @@ def focus_fb_composer(page, timeout=60000):
 
 
 def is_reel_eligible(video_path):
-    cmd = [
-        "ffprobe", "-v", "error",
-        "-select_streams", "v:0",
-        "-show_entries", "stream=width,height,duration",
-        "-of", "json",
-        video_path
-    ]
-    out = subprocess.check_output(cmd).decode()
-    data = json.loads(out)["streams"][0]
+    video = media_probe.probe(video_path).video
+    if video is None:
+        raise ValueError(f"No video stream in {video_path}")
 
-    width = data["width"]
-    height = data["height"]
-    duration = float(data.get("duration", 0))
+    width = video.width
+    height = video.height
+    duration = video.duration or 0.0
     size_mb = os.path.getsize(video_path) / (1024 * 1024)
 
     aspect = width / height
@@ -0,0 +1,115 @@
+# file_utils.py — filesystem helpers shared by the on-disk caches and ffmpeg callers
+#
+#   - evict_lru(dir, pattern, budget)   size-bounded, least-recently-used eviction: the
+#                                       policy of every cache folder under <repo>/cache
+#                                       (caches utime() an entry on each hit)
+#   - dir_usage(dir, pattern)           (entries, bytes) of a cache folder, for stats()
+#   - write_concat_list(paths, dest)    input list for ffmpeg's concat demuxer
+#   - concat_copy(paths, out)           join same-profile videos with it, video stream-copied
+#
+# Stdlib only (transcription_cache.py is also imported from whisperx_captions.py,
+# which runs in its own venv).
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+
+
+def _entries(directory, pattern):
+    """(mtime, size, path) of the files matching pattern, skipping in-flight *.tmp.* writes."""
+    out = []
+    directory = Path(directory)
+    if not directory.exists():
+        return out
+    for p in directory.glob(pattern):
+        if ".tmp." in p.name:
+            continue
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        out.append((st.st_mtime, st.st_size, p))
+    return out
+
+
+def evict_lru(directory, pattern, budget_bytes, keep=()) -> int:
+    """
+    Delete the least recently used files matching pattern until the folder fits in
+    budget_bytes, never deleting the paths in `keep` (entries in use). Returns how many
+    files were deleted.
+    """
+    entries = _entries(directory, pattern)
+    total = sum(size for _, size, _ in entries)
+    if total <= budget_bytes:
+        return 0
+    keep = {os.path.abspath(p) for p in keep}
+    evicted = 0
+    entries.sort()  # oldest use first
+    for _, size, p in entries:
+        if total <= budget_bytes:
+            break
+        if os.path.abspath(p) in keep:
+            continue
+        try:
+            p.unlink()
+            total -= size
+            evicted += 1
+        except OSError:
+            pass
+    return evicted
+
+
+def dir_usage(directory, pattern):
+    """(number of entries, total bytes) of the files matching pattern."""
+    entries = _entries(directory, pattern)
+    return len(entries), sum(size for _, size, _ in entries)
+
+
+def write_concat_list(paths, dest):
+    """
+    Write an ffmpeg concat-demuxer list of `paths` to dest (use with -f concat -safe 0).
+    Paths are made absolute with forward slashes; single quotes are escaped as '\\''.
+    """
+    with open(dest, "w", encoding="utf-8") as f:
+        for path in paths:
+            p = os.path.abspath(path).replace("\\", "/").replace("'", "'\\''")
+            f.write(f"file '{p}'\n")
+    return dest
+
+
+def concat_copy(paths, output_path, keep_audio=True, audio_path=None, duration=None):
+    """
+    Join videos that share one encoding profile with the concat demuxer, copying
+    the video stream. keep_audio carries the inputs' audio; audio_path replaces it
+    with one track, cut to `duration` when given. Raises RuntimeError with ffmpeg's
+    stderr on failure.
+
+    Audio is always re-encoded at the join: that is cheap, and stream-copied AAC
+    keeps every file's encoder priming samples, which add up to an audible drift
+    over hundreds of segments.
+    """
+    fd, list_path = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    try:
+        write_concat_list(paths, list_path)
+        cmd = ["ffmpeg", "-y", "-hide_banner", "-nostats", "-loglevel", "error",
+               "-f", "concat", "-safe", "0", "-i", list_path]
+        if audio_path:
+            cmd += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+            if duration:
+                cmd += ["-t", f"{duration:.3f}"]
+        elif keep_audio:
+            cmd += ["-map", "0:v:0", "-map", "0:a:0?"]
+        else:
+            cmd += ["-map", "0:v:0", "-an"]
+        cmd += ["-c:v", "copy"]
+        if audio_path or keep_audio:
+            cmd += ["-c:a", "aac", "-b:a", "192k"]
+        cmd += ["-movflags", "+faststart", str(output_path)]
+        print("▶ Concat (stream copy):", " ".join(cmd))
+        p = subprocess.run(cmd, capture_output=True, text=True)
+    finally:
+        os.remove(list_path)
+    if p.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat failed for {output_path}:\n{(p.stderr or '').strip()}")
+    return output_path
@@ -5,13 +5,13 @@ import sys
 import json
 from pathlib import Path
 import json
+import media_probe
 from bg_music_video import merge_video_with_bg_music_overwrite
 from coloring_animation import _create_coloring_animation_by_color
 from gemini_pool import GeminiPool  # same helper you use in get_seo_meta_data.py
 import random
 from openpyxl import Workbook, load_workbook
 from PIL import Image, ImageOps, ImageDraw, ImageFont, ImageFilter
-import subprocess
 from moviepy.editor import (
     ImageClip,
     TextClip,
@@ -197,37 +197,10 @@ def probe_video_info(video_path: Path) -> tuple[float | None, int | None, int |
     If ffprobe fails, returns (None, None, None).
     """
     try:
-        cmd = [
-            "ffprobe",
-            "-v", "error",
-            "-select_streams", "v:0",
-            "-show_entries", "stream=width,height:format=duration",
-            "-of", "json",
-            str(video_path),
-        ]
-        p = subprocess.run(cmd, capture_output=True, text=True)
-        if p.returncode != 0:
+        info = media_probe.try_probe(video_path)
+        if info is None:
             return (None, None, None)
-
-        data = json.loads(p.stdout or "{}")
-        duration = None
-        width = None
-        height = None
-
-        fmt = data.get("format", {}) or {}
-        if "duration" in fmt:
-            try:
-                duration = float(fmt["duration"])
-            except Exception:
-                duration = None
-
-        streams = data.get("streams", []) or []
-        if streams:
-            s0 = streams[0] or {}
-            width = int(s0.get("width")) if s0.get("width") else None
-            height = int(s0.get("height")) if s0.get("height") else None
-
-        return (duration, width, height)
+        return (info.duration, info.width or None, info.height or None)
     except Exception:
         return (None, None, None)
 
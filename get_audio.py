@@ -6,31 +6,17 @@ from google.cloud import texttospeech_v1beta1 as texttospeech
 from pydub import AudioSegment
 import re
 
+from file_utils import write_concat_list
+import tts_cache
+import tts_engines
+
 
-from google.api_core.timeout import ExponentialTimeout
 # NEW imports near the top of get_audio.py
 import os, random, time
-from functools import lru_cache
-from google.api_core import exceptions as gexceptions
-
-# Try to import Retry + if_exception_type in the modern way; provide fallbacks.
-try:
-    from google.api_core.retry import Retry, if_exception_type
-except Exception:  # older google-api-core
-    from google.api_core import retry as _retry
-    Retry = _retry.Retry
-    def if_exception_type(*exc_types):
-        def _pred(exc):
-            return isinstance(exc, exc_types)
-        return _pred
-
-# Timeout helper is not present in older versions; fall back to a constant.
-try:
-    from google.api_core.timeout import ExponentialTimeout
-    _HAS_EXP_TIMEOUT = True
-except Exception:
-    _HAS_EXP_TIMEOUT = False
-
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Define the maximum character limit for each TTS engine
 GOOGLE_MAX_CHARS = 3800
@@ -39,10 +25,9 @@ AMAZON_MAX_CHARS = 2000  # Approximate limit
 # Add near top:
 CHUNK_THROTTLE_SECONDS = (0.20, 0.60)  # 100–300ms random jitter between chunk calls
 
-@lru_cache(maxsize=1)
-def _get_tts_client():
-    from google.cloud import texttospeech_v1beta1 as texttospeech
-    return texttospeech.TextToSpeechClient()
+# Long text: chunks are synthesized concurrently, each retried on failure
+TTS_CHUNK_WORKERS = int(os.getenv("TTS_CHUNK_WORKERS", "4"))
+TTS_CHUNK_ATTEMPTS = int(os.getenv("TTS_CHUNK_ATTEMPTS", "3"))
 
 def _utf8_len(s: str) -> int:
     return len(s.encode("utf-8"))
@@ -81,60 +66,10 @@ def _split_sentence_by_words_utf8(s: str, max_bytes: int) -> list[str]:
     return chunks
 
 def synthesize_speech_google(text, output_file, language, gender, voice_name,
-                             speaking_rate=1.0, pitch=0.0):
-    from google.cloud import texttospeech_v1beta1 as texttospeech
-
-    # Optional fast auth sanity check so we don't confuse auth with 5xx
-    creds_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
-    if not creds_path or not os.path.exists(creds_path):
-        raise RuntimeError(f"Google credentials not found at {creds_path or '(unset)'}")
-
-    client = _get_tts_client()
-
-    is_ssml = "<break" in text or "<speak>" in text
-
-    if is_ssml:
-        if not text.strip().startswith("<speak>"):
-            text = f"<speak>{text}</speak>"
-        input_text = texttospeech.SynthesisInput(ssml=text)
-    else:
-        input_text = texttospeech.SynthesisInput(text=text)
-
-    # input_text = texttospeech.SynthesisInput(text=text)
-
-    
-    voice = texttospeech.VoiceSelectionParams(language_code=language, name=voice_name)
-    audio_config = texttospeech.AudioConfig(
-        audio_encoding=texttospeech.AudioEncoding.MP3,
-        speaking_rate=speaking_rate,
-        **({"pitch": pitch} if pitch else {})
-    )
-
-    # Works across api-core versions
-    retry = Retry(
-        predicate=if_exception_type(
-            gexceptions.ServiceUnavailable,   # 503 / UNAVAILABLE
-            gexceptions.DeadlineExceeded,     # 504
-            gexceptions.InternalServerError,  # 500
-            gexceptions.GoogleAPICallError    # broader net for 5xx mappings
-        ),
-        initial=1.0,
-        maximum=30.0,
-        multiplier=2.0,
-        deadline=120.0,   # overall retry budget for this request
-    )
-
-    timeout = ExponentialTimeout(initial=20.0, maximum=60.0, multiplier=1.5) if _HAS_EXP_TIMEOUT else 60.0
-
-    response = client.synthesize_speech(
-        request={"input": input_text, "voice": voice, "audio_config": audio_config},
-        retry=retry,
-        timeout=timeout,
-    )
-
-    with open(output_file, "wb") as f:
-        f.write(response.audio_content)
-    return output_file
+                             speaking_rate=1.0, pitch=0.0, credentials_path=None):
+    """Google TTS through the shared client for `credentials_path` (default: today's service account)."""
+    engine = tts_engines.get_engine("google", credentials_path or tts_engines.google_credentials_path())
+    return engine.synthesize(text, output_file, voice_name, speaking_rate=speaking_rate, pitch=pitch)
 
 
 # Working except for very long text
@@ -179,18 +114,45 @@ def split_text_into_sentences(text, language="english"):
     return [s.strip() for s in sentences if s.strip()]
 
 
-def merge_audio_files(file_paths, output_file):
-    """Merges multiple audio files into one."""
+def _merge_audio_files_reencode(file_paths, output_file):
     combined_audio = AudioSegment.empty()
     for file_path in file_paths:
         audio = AudioSegment.from_mp3(file_path)
         combined_audio += audio
     combined_audio.export(output_file, format="mp3")
+
+
+def merge_audio_files(file_paths, output_file):
+    """
+    Merges multiple MP3 files into one. The parts come from the same voice and
+    encoder settings, so the MP3 frames are joined as-is (concat demuxer,
+    stream copy) without a decode/re-encode; pydub is the fallback.
+    """
+    fd, list_path = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    try:
+        write_concat_list(file_paths, list_path)
+        cmd = [
+            "ffmpeg", "-y", "-hide_banner", "-nostats", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-map", "0:a", "-c", "copy", "-map_metadata", "-1", output_file,
+        ]
+        try:
+            p = subprocess.run(cmd, capture_output=True, text=True)
+            ok = p.returncode == 0 and os.path.exists(output_file) and os.path.getsize(output_file) > 0
+            err = (p.stderr or "").strip()
+        except FileNotFoundError as e:
+            ok, err = False, str(e)
+        if not ok:
+            print(f"[TTS] stream-copy merge failed, re-encoding with pydub: {err}")
+            _merge_audio_files_reencode(file_paths, output_file)
+    finally:
+        os.remove(list_path)
     for file_path in file_paths:
         os.remove(file_path)
     return output_file
 
-def get_audio_file(text, audio_file_name, tts_engine="google", language="english", gender="Male", type="neural", age_group="adult"):
+def get_audio_file(text, audio_file_name, tts_engine="google", language="english", gender="Male", type="neural", age_group="adult", use_cache=True):
     """
     Generate audio using TTS, handling large text by splitting and merging.
 
@@ -201,6 +163,7 @@ def get_audio_file(text, audio_file_name, tts_engine="google", language="english
         language (str): Language for TTS ('english' or 'hindi').
         gender (str): Gender of the voice ('Male' or 'Female').
         type (str): Voice type ('neural', 'journey', or 'generative').
+        use_cache (bool): Reuse audio synthesized earlier for the same voice/rate/pitch/text (tts_cache.py).
 
     Returns:
         str: Path to the generated audio file.
@@ -243,210 +206,143 @@ def get_audio_file(text, audio_file_name, tts_engine="google", language="english
         },
     }
 
-    # Initialize Amazon Polly
-    polly_client = boto3.client('polly', region_name='us-east-1')
-
-    today = datetime.datetime.now().day
-
-    # Choose credentials file based on whether the date is even or odd
-    if today % 2 == 0:
-        print("Even day, using 173")
-        credentials_file = "quantum-conduit-458602-k9-e1f713291583.json"
-    else:
-        print("Odd day, using mail2")
-        credentials_file = "notes-imgtotxt-7b07c59d85c6.json"
-
     if age_group not in [ "adult"]:
         language = language.__add__("-with-pitch") 
         
     speaking_rate, pitch = get_speaking_rate_and_pitch(age_group)
 
-    # Set Google Application Credentials using a relative path (one level up)
-    google_credentials_path = os.path.join(
-        os.path.dirname(__file__), os.path.pardir, "tts-secret", credentials_file
-    )
-    if os.path.exists(google_credentials_path):
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = google_credentials_path
-    else:
-        print(f"Warning: Google credentials file not found at {google_credentials_path}")
-
     try:
         voice_code = voice_configs[tts_engine][type][language][gender]
     except KeyError:
         raise ValueError("Invalid TTS configuration.")
 
+    cache_key = tts_cache.make_key(tts_engine, voice_code, speaking_rate, pitch, text, voice_type=type)
+    if use_cache and tts_cache.ENABLED and tts_cache.fetch(cache_key, audio_file_name):
+        print(f"[tts-cache] hit {cache_key[:12]} ({tts_engine}, {voice_code})")
+        return audio_file_name
+
     if tts_engine == "google":
+        # Passed to the client explicitly; the process environment is left alone
+        credentials = tts_engines.google_credentials_path()
+        if not os.path.exists(credentials):
+            print(f"Warning: Google credentials file not found at {credentials}")
+            credentials = None
+    else:
+        credentials = None
+    engine = tts_engines.get_engine(tts_engine, credentials)
+
+    generated = _synthesize_to_file(text, audio_file_name, engine, voice_code, speaking_rate, pitch, type, language)
+    if generated and use_cache and tts_cache.ENABLED:
+        tts_cache.put(cache_key, generated)
+        print(f"[tts-cache] stored {cache_key[:12]} ({tts_engine}, {voice_code})")
+    return generated
+
+
+def _synthesize_once(text, output_file, engine, voice_code, speaking_rate, pitch, type):
+    """One TTS request for text that fits the engine limit. Returns output_file."""
+    return engine.synthesize(text, output_file, voice_code, speaking_rate=speaking_rate, pitch=pitch, voice_type=type)
+
+
+def split_text_into_chunks(text, language, max_bytes):
+    """
+    Sentence-aligned chunks of at most max_bytes UTF-8 bytes each; a sentence
+    that is too big on its own is split by words.
+    """
+    # Normalize for sentence splitter: treat "english-with-pitch" as english rules
+    split_lang = "english" if str(language).lower().startswith("english") else "hindi"
+    sentences = split_text_into_sentences(text, split_lang)
+
+    chunks = []
+    current_chunk = ""
+    for s in sentences:
+        s = s.strip()
+        if not s:
+            continue
+        # This sentence alone may be too big: split by words into smaller pieces
+        pieces = _split_sentence_by_words_utf8(s, max_bytes) if _utf8_len(s) > max_bytes else [s]
+        for piece in pieces:
+            candidate = (current_chunk + " " + piece).strip() if current_chunk else piece
+            if _utf8_len(candidate) <= max_bytes:
+                current_chunk = candidate
+            else:
+                if current_chunk.strip():
+                    chunks.append(current_chunk.strip())
+                current_chunk = piece
+    if current_chunk.strip():
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+class _CallSpacer:
+    """Spaces out request starts across threads (random gap from CHUNK_THROTTLE_SECONDS)."""
+
+    def __init__(self, gap_range):
+        self.gap_range = gap_range
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + random.uniform(*self.gap_range)
+        if start > now:
+            time.sleep(start - now)
+
+
+def _synthesize_chunks(chunks, audio_file_name, engine, voice_code, speaking_rate, pitch, type):
+    """
+    Synthesize chunks concurrently (TTS_CHUNK_WORKERS threads, spaced-out request
+    starts, TTS_CHUNK_ATTEMPTS tries per chunk). Returns the part files in text order.
+    """
+    base = audio_file_name.rsplit('.', 1)[0]
+    part_files = [f"{base}_part_{i}.mp3" for i in range(len(chunks))]
+    spacer = _CallSpacer(CHUNK_THROTTLE_SECONDS)
+
+    def _one(i):
+        print(f"[TTS] chunk #{i} → {_utf8_len(chunks[i])} bytes")
+        for attempt in range(1, TTS_CHUNK_ATTEMPTS + 1):
+            spacer.wait()
+            try:
+                return _synthesize_once(chunks[i], part_files[i], engine, voice_code, speaking_rate, pitch, type)
+            except Exception as e:
+                if attempt == TTS_CHUNK_ATTEMPTS:
+                    raise
+                delay = min(30.0, 2 ** attempt) + random.uniform(0, 1)
+                print(f"[TTS] chunk #{i} attempt {attempt} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    workers = max(1, min(TTS_CHUNK_WORKERS, len(chunks)))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            # map() keeps text order and re-raises the first chunk failure
+            return list(ex.map(_one, range(len(chunks))))
+    except Exception:
+        for f in part_files:
+            if os.path.exists(f):
+                os.remove(f)
+        raise
+
+
+def _synthesize_to_file(text, audio_file_name, engine, voice_code, speaking_rate, pitch, type, language="english"):
+    """Call the TTS engine (splitting long text into chunks and merging). Returns the output path."""
+    if engine.name == "google":
         max_chars = GOOGLE_MAX_CHARS
-        tts_function = synthesize_speech_google
-    elif tts_engine == "amazon":
+    elif engine.name == "amazon":
         max_chars = AMAZON_MAX_CHARS
-        tts_function = polly_client.synthesize_speech
     else:
         raise ValueError("Unsupported TTS engine.")
 
     print(f"text size: {len(text.encode('utf-8'))} bytes")
 
     if len(text.encode('utf-8')) <= max_chars:
-        if tts_engine == "google":
-            return tts_function(
-                text=text,
-                output_file=audio_file_name,
-                language=f"{voice_code[:5]}",
-                gender=gender.upper(),
-                voice_name=voice_code,
-                speaking_rate=speaking_rate,
-                pitch=pitch
-            )
-        elif tts_engine == "amazon":
-            text_type = "ssml" if type == "neural" else "text"
-            text_content = f'<speak><prosody rate="90%">{text}</prosody></speak>' if text_type == "ssml" else text
-            response = tts_function(
-                TextType=text_type,
-                Text=text_content,
-                OutputFormat="mp3",
-                VoiceId=voice_code,
-                Engine=type
-            )
-            with open(audio_file_name, "wb") as file:
-                file.write(response['AudioStream'].read())
-            return audio_file_name
-    else:
-        # Normalize for sentence splitter: treat "english-with-pitch" as english rules
-        split_lang = "english" if str(language).lower().startswith("english") else "hindi"
-        sentences = split_text_into_sentences(text, split_lang)
-
-        audio_files = []
-        current_chunk = ""
-        chunk_index = 0
-        max_bytes = max_chars
-
-        def _flush_current_chunk():
-            nonlocal current_chunk, chunk_index
-            if not current_chunk.strip():
-                return
-            temp_audio_file = f"{audio_file_name.rsplit('.', 1)[0]}_part_{chunk_index}.mp3"
-
-            chunk_bytes = _utf8_len(current_chunk)
-            print(f"[TTS] chunk #{chunk_index} → {chunk_bytes} bytes")
-
-            if tts_engine == "google":
-                tts_function(
-                    text=current_chunk.strip(),
-                    output_file=temp_audio_file,
-                    language=f"{voice_code[:5]}",
-                    gender=gender.upper(),
-                    voice_name=voice_code,
-                    speaking_rate=speaking_rate,
-                    pitch=pitch
-                )
-            else:  # amazon
-                text_type = "ssml" if type == "neural" else "text"
-                text_content = f'<speak><prosody rate="90%">{current_chunk.strip()}</prosody></speak>' if text_type == "ssml" else current_chunk.strip()
-                response = polly_client.synthesize_speech(
-                    TextType=text_type,
-                    Text=text_content,
-                    OutputFormat="mp3",
-                    VoiceId=voice_code,
-                    Engine=type
-                )
-                with open(temp_audio_file, "wb") as file:
-                    file.write(response['AudioStream'].read())
-            audio_files.append(temp_audio_file)
-            current_chunk = ""
-            chunk_index += 1
-            # NEW: tiny throttle between calls to be nice to the API and avoid 502 bursts
-            time.sleep(random.uniform(*CHUNK_THROTTLE_SECONDS))
-
-
-        for s in sentences:
-            s = s.strip()
-            if not s:
-                continue
-            if _utf8_len(s) > max_bytes:
-                # This sentence alone is too big: split by words into smaller chunks
-                subchunks = _split_sentence_by_words_utf8(s, max_bytes)
-                for sub in subchunks:
-                    candidate = (current_chunk + " " + sub).strip() if current_chunk else sub
-                    if _utf8_len(candidate) <= max_bytes:
-                        current_chunk = candidate
-                    else:
-                        _flush_current_chunk()
-                        current_chunk = sub
-            else:
-                candidate = (current_chunk + " " + s).strip() if current_chunk else s
-                if _utf8_len(candidate) <= max_bytes:
-                    current_chunk = candidate
-                else:
-                    _flush_current_chunk()
-                    current_chunk = s
-
-        # flush the last chunk
-        _flush_current_chunk()
-
-        # for sentence in sentences:
-        #     if len((current_chunk + sentence + " ").encode('utf-8')) <= max_chars:  # +1 for potential space
-        #         current_chunk += (sentence + " ")
-        #     else:
-        #         temp_audio_file = f"{audio_file_name.rsplit('.', 1)[0]}_part_{chunk_index}.mp3"
-        #         if tts_engine == "google":
-        #             tts_function(
-        #                 text=current_chunk.strip(),
-        #                 output_file=temp_audio_file,
-        #                 language=f"{voice_code[:5]}",
-        #                 gender=gender.upper(),
-        #                 voice_name=voice_code,
-        #                 speaking_rate=speaking_rate,
-        #                 pitch=pitch
-        #             )
-        #         elif tts_engine == "amazon":
-        #             text_type = "ssml" if type == "neural" else "text"
-        #             text_content = f'<speak><prosody rate="90%">{current_chunk.strip()}</prosody></speak>' if text_type == "ssml" else current_chunk.strip()
-        #             response = tts_function(
-        #                 TextType=text_type,
-        #                 Text=text_content,
-        #                 OutputFormat="mp3",
-        #                 VoiceId=voice_code,
-        #                 Engine=type
-        #             )
-        #             with open(temp_audio_file, "wb") as file:
-        #                 file.write(response['AudioStream'].read())
-        #         audio_files.append(temp_audio_file)
-        #         current_chunk = sentence + " "
-        #         chunk_index += 1
-
-        # Process the last chunk
-        if current_chunk.strip():
-            temp_audio_file = f"{audio_file_name.rsplit('.', 1)[0]}_part_{chunk_index}.mp3"
-            if tts_engine == "google":
-                tts_function(
-                    text=current_chunk.strip(),
-                    output_file=temp_audio_file,
-                    language=f"{voice_code[:5]}",
-                    gender=gender.upper(),
-                    voice_name=voice_code,
-                    speaking_rate=speaking_rate,
-                    pitch=pitch
-                )
-            elif tts_engine == "amazon":
-                text_type = "ssml" if type == "neural" else "text"
-                text_content = f'<speak><prosody rate="90%">{current_chunk.strip()}</prosody></speak>' if text_type == "ssml" else current_chunk.strip()
-                response = tts_function(
-                    TextType=text_type,
-                    Text=text_content,
-                    OutputFormat="mp3",
-                    VoiceId=voice_code,
-                    Engine=type
-                )
-                with open(temp_audio_file, "wb") as file:
-                    file.write(response['AudioStream'].read())
-            audio_files.append(temp_audio_file)
-
-        if audio_files:
-            return merge_audio_files(audio_files, audio_file_name)
-        else:
-            return "" # Should not happen, but just in case
+        return _synthesize_once(text, audio_file_name, engine, voice_code, speaking_rate, pitch, type)
 
-    raise ValueError("Unsupported TTS engine.")
+    chunks = split_text_into_chunks(text, language, max_chars)
+    if not chunks:
+        return ""  # Should not happen, but just in case
+    audio_files = _synthesize_chunks(chunks, audio_file_name, engine, voice_code, speaking_rate, pitch, type)
+    return merge_audio_files(audio_files, audio_file_name)
 
 def get_speaking_rate_and_pitch(age_group):
     if age_group == "child":
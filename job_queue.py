@@ -0,0 +1,368 @@
+# job_queue.py — background jobs for long-running Flask routes
+#
+# Long ffmpeg routes used to run inside the request: the connection stayed
+# open for minutes and a closed tab lost the result. With @queue.job(kind)
+# the route snapshots its form, enqueues the work and returns 202 + job id:
+#
+#     jobs = JobQueue(app)
+#
+#     @app.post("/upscale")
+#     @jobs.job("upscale")
+#     def upscale_all_videos(): ...          # body unchanged, still reads request.form
+#
+#     GET /jobs/<id>  ->  status, progress, logs, outputs, result
+#
+# The view runs later on a bounded thread pool inside a request context rebuilt
+# from the snapshot, so its code (and its return value) is unchanged. Jobs
+# live in SQLite; anything queued or running when the server stopped is
+# re-queued at start-up with `resumed` set (views can skip finished work).
+# Add ?sync=1 to a route to run it inline as before.
+#
+# Creating the queue only registers routes: the DB, the worker pool and the
+# stdout/stderr tee are set up on first use (first submit, resume_pending or
+# /jobs request). Importing server.py therefore stays side-effect free in the
+# reloader parent and in spawn-mode pool workers.
+#
+# Env overrides:
+#     JOBS_DB            SQLite path (default: <repo>/data/jobs.sqlite)
+#     JOBS_MAX_WORKERS   concurrent jobs (default: 2)
+#     JOBS_MAX_ATTEMPTS  resume attempts before a job is marked interrupted (default: 3)
+from __future__ import annotations
+
+import functools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from flask import jsonify, request, url_for
+from werkzeug.datastructures import MultiDict
+
+BASE_DIR = Path(__file__).resolve().parent
+DB_PATH = Path(os.getenv("JOBS_DB", str(BASE_DIR / "data" / "jobs.sqlite")))
+MAX_WORKERS = int(os.getenv("JOBS_MAX_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+
+MAX_LOG_LINES = 500
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, INTERRUPTED = "queued", "running", "succeeded", "failed", "interrupted"
+FINISHED = (SUCCEEDED, FAILED, INTERRUPTED)
+
+
+# --------------------------
+# Per-thread job context
+# --------------------------
+_local = threading.local()
+
+
+class JobContext:
+    """What a running view can see/report about its own job."""
+
+    def __init__(self, queue: "JobQueue", job_id: str, resumed: bool):
+        self.queue = queue
+        self.job_id = job_id
+        self.resumed = resumed
+        self.logs: list[str] = []
+        self.outputs: list = []
+        self.progress = 0.0
+        self.message = ""
+        self._partial = ""
+        self._last_flush = 0.0
+
+    def log(self, line: str):
+        self.logs.append(line)
+        if len(self.logs) > MAX_LOG_LINES:
+            del self.logs[: len(self.logs) - MAX_LOG_LINES]
+        self.flush()
+
+    def write(self, text: str):
+        """stdout tee: split into lines, keep the trailing partial line for later."""
+        text = self._partial + text
+        *lines, self._partial = text.split("\n")
+        for line in lines:
+            if line.strip():
+                self.log(line.rstrip("\r"))
+
+    def flush(self, force: bool = False):
+        now = time.time()
+        if force or now - self._last_flush >= 1.0:
+            self._last_flush = now
+            self.queue._update(
+                self.job_id,
+                progress=self.progress, message=self.message,
+                logs=json.dumps(self.logs), outputs=json.dumps(self.outputs),
+            )
+
+
+class _Tee:
+    """Forwards to the real stream and, on job threads, into that job's log."""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        ctx = getattr(_local, "job", None)
+        if ctx is not None:
+            try:
+                ctx.write(text)
+            except Exception:
+                pass
+        return self._stream.write(text)
+
+    def flush(self):
+        return self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def current_job() -> JobContext | None:
+    return getattr(_local, "job", None)
+
+
+def is_resumed() -> bool:
+    """True when the current view is a job being re-run after a restart."""
+    ctx = current_job()
+    return bool(ctx and ctx.resumed)
+
+
+def report_progress(done, total=None, message: str = ""):
+    """progress as a fraction (or done/total). No-op outside a job."""
+    ctx = current_job()
+    if ctx is None:
+        return
+    frac = (done / total) if total else float(done)
+    ctx.progress = max(0.0, min(1.0, float(frac)))
+    if message:
+        ctx.message = message
+    ctx.flush()
+
+
+def add_output(item):
+    """Record a produced file/URL on the current job. No-op outside a job."""
+    ctx = current_job()
+    if ctx is not None:
+        ctx.outputs.append(str(item) if isinstance(item, Path) else item)
+        ctx.flush()
+
+
+# --------------------------
+# Queue
+# --------------------------
+class JobQueue:
+    def __init__(self, app=None, db_path=DB_PATH, max_workers=MAX_WORKERS):
+        self.db_path = Path(db_path)
+        self.max_workers = max(1, int(max_workers))
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pool = None
+        self._db = None
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def _start(self):
+        """Open the DB, start the pool and install the tee, once, on first use."""
+        if self._db is not None:
+            return
+        with self._start_lock:
+            if self._db is not None:
+                return
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL,"
+                " request TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+                " progress REAL NOT NULL DEFAULT 0, message TEXT NOT NULL DEFAULT '',"
+                " logs TEXT NOT NULL DEFAULT '[]', outputs TEXT NOT NULL DEFAULT '[]',"
+                " result TEXT, http_status INTEGER, error TEXT,"
+                " created_at REAL, started_at REAL, finished_at REAL)"
+            )
+            db.commit()
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            # print() / traceback.print_exc() from job threads also land in the job's log
+            if not isinstance(sys.stdout, _Tee):
+                sys.stdout = _Tee(sys.stdout)
+            if not isinstance(sys.stderr, _Tee):
+                sys.stderr = _Tee(sys.stderr)
+            self._db = db
+
+    def init_app(self, app):
+        self.app = app
+        app.add_url_rule("/jobs", "list_jobs", self._list_view, methods=["GET"])
+        app.add_url_rule("/jobs/<job_id>", "get_job", self._get_view, methods=["GET"])
+
+    # ---- storage ----
+    def _update(self, job_id: str, **fields):
+        self._start()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+    def _row(self, job_id: str):
+        self._start()
+        with self._lock:
+            return self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    @staticmethod
+    def _to_dict(row, with_logs: bool = True) -> dict:
+        d = {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "progress": round(row["progress"] or 0.0, 4),
+            "message": row["message"],
+            "outputs": json.loads(row["outputs"] or "[]"),
+            "attempts": row["attempts"],
+            "error": row["error"],
+            "http_status": row["http_status"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+        if row["result"] is not None:
+            d["result"] = json.loads(row["result"])
+        if with_logs:
+            d["logs"] = json.loads(row["logs"] or "[]")
+        return d
+
+    def get(self, job_id: str) -> dict | None:
+        row = self._row(job_id)
+        return self._to_dict(row) if row else None
+
+    def list(self, limit: int = 50) -> list[dict]:
+        self._start()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._to_dict(r, with_logs=False) for r in rows]
+
+    # ---- submit / run ----
+    def submit(self, kind: str, req: dict) -> str:
+        if kind not in self._handlers:
+            raise KeyError(f"No job handler registered for {kind!r}")
+        self._start()
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, status, request, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(req), time.time()),
+            )
+            self._db.commit()
+        self._pool.submit(self._run, job_id, False)
+        print(f"[jobs] queued {kind} job {job_id}")
+        return job_id
+
+    def _run(self, job_id: str, resumed: bool):
+        row = self._row(job_id)
+        if row is None or row["status"] in FINISHED:
+            return
+        kind = row["kind"]
+        req = json.loads(row["request"])
+        view = self._handlers[kind]
+        ctx = JobContext(self, job_id, resumed)
+        if resumed:
+            ctx.logs = json.loads(row["logs"] or "[]")
+            ctx.outputs = json.loads(row["outputs"] or "[]")
+            ctx.log(f"[jobs] resumed after restart (attempt {row['attempts'] + 1})")
+        self._update(job_id, status=RUNNING, attempts=row["attempts"] + 1,
+                     started_at=time.time(), error=None)
+
+        _local.job = ctx
+        status, result, http_status, error = FAILED, None, 500, None
+        try:
+            form = MultiDict([tuple(kv) for kv in req.get("form", [])])
+            with self.app.test_request_context(
+                req.get("path", "/"), method=req.get("method", "POST"),
+                data=form, query_string=req.get("query", ""),
+            ):
+                rv = view()
+                resp = self.app.make_response(rv)
+            http_status = resp.status_code
+            body = resp.get_data(as_text=True)
+            result = resp.get_json(silent=True) if resp.is_json else body
+            status = SUCCEEDED if http_status < 400 else FAILED
+            if status == FAILED:
+                error = (result.get("error") if isinstance(result, dict) else body) or f"HTTP {http_status}"
+        except Exception as e:
+            traceback.print_exc()
+            error = str(e)
+        finally:
+            _local.job = None
+            if ctx._partial.strip():
+                ctx.log(ctx._partial)
+            if status == SUCCEEDED:
+                ctx.progress = 1.0
+            ctx.flush(force=True)
+            self._update(job_id, status=status, result=json.dumps(result), http_status=http_status,
+                         error=error, finished_at=time.time())
+        print(f"[jobs] {kind} job {job_id} {status}")
+
+    def resume_pending(self) -> int:
+        """Re-queue jobs left queued/running by a previous process. Call once at start-up."""
+        self._start()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, kind, status, attempts FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING),
+            ).fetchall()
+        n = 0
+        for r in rows:
+            if r["kind"] not in self._handlers or r["attempts"] >= MAX_ATTEMPTS:
+                self._update(r["id"], status=INTERRUPTED, finished_at=time.time(),
+                             error="server restarted; not resumed")
+                continue
+            self._pool.submit(self._run, r["id"], r["status"] == RUNNING)
+            n += 1
+        if n:
+            print(f"[jobs] resumed {n} job(s) from {self.db_path}")
+        return n
+
+    # ---- Flask glue ----
+    def job(self, kind: str):
+        """Decorator: run this view as a background job, return 202 + job id."""
+        def deco(view):
+            self._handlers[kind] = view
+
+            @functools.wraps(view)
+            def enqueue(*args, **kwargs):
+                # Direct calls (other views, jobs calling jobs) and ?sync=1 run inline
+                if args or kwargs or current_job() is not None or request.args.get("sync") == "1":
+                    return view(*args, **kwargs)
+                job_id = self.submit(kind, {
+                    "path": request.path,
+                    "method": request.method,
+                    "query": request.query_string.decode("utf-8", "replace"),
+                    "form": list(request.form.items(multi=True)),
+                })
+                return jsonify({
+                    "ok": True,
+                    "job_id": job_id,
+                    "status": QUEUED,
+                    "status_url": url_for("get_job", job_id=job_id),
+                    "message": f"Queued {kind} job {job_id}",
+                }), 202
+            return enqueue
+        return deco
+
+    def _get_view(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return jsonify({"ok": False, "error": f"Unknown job {job_id}"}), 404
+        return jsonify(job)
+
+    def _list_view(self):
+        limit = int(request.args.get("limit", 50) or 50)
+        return jsonify({"jobs": self.list(limit)})
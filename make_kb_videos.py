@@ -3,7 +3,8 @@ import os, random
 from glob import glob
 from moviepy.editor import ImageClip, CompositeVideoClip, VideoFileClip, vfx
 import numpy as np
-import subprocess
+import media_probe
+import encoding_profile
 
 def cover_resize(clip, target_w, target_h):
     """Resize image to fully cover the target canvas (like CSS object-fit: cover)."""
@@ -256,26 +257,27 @@ def ken_burns_clip_DND(img_path, duration, size=(1920,1080),
 
 def _ffprobe_duration(path: str) -> float:
     """Return duration in seconds using ffprobe (format duration)."""
+    d = media_probe.duration(path)
+    if d is not None:
+        return d
+    # MoviePy fallback (slower but robust)
     try:
-        out = subprocess.check_output([
-            "ffprobe", "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
-            path
-        ], universal_newlines=True).strip()
-        return float(out)
+        return float(VideoFileClip(path).duration)
     except Exception:
-        # MoviePy fallback (slower but robust)
-        try:
-            return float(VideoFileClip(path).duration)
-        except Exception:
-            return 0.0
+        return 0.0
 
 def export_kb_videos(input_folder, out_folder,
                      per_image=10, output_size=(1920,1080),
-                     zoom_start=1.05, zoom_end=1.15, fps=30, only_select_images_without_video=False):
+                     zoom_start=1.05, zoom_end=1.15, fps=30, only_select_images_without_video=False,
+                     render_profile=None):
     os.makedirs(out_folder, exist_ok=True)
     print("Received export_kb_videos Arguments:", locals())
+
+    # Draft profile: smaller frames, lower fps, faster x264 (encoding_profile.py)
+    prof = encoding_profile.get(render_profile)
+    output_size = prof.size(*output_size)
+    fps = prof.frame_rate(fps)
+    preset, crf = prof.x264("veryfast", None)
     # clear_folder(out_folder)
 
     exts = ("*.jpg","*.jpeg","*.png","*.webp")
@@ -311,8 +313,11 @@ def export_kb_videos(input_folder, out_folder,
         #out_path = os.path.join(out_folder, f"{base}_{pan}.mp4")
         out_path = os.path.join(out_folder, f"{base}.mp4")
         if os.path.exists(out_path):
-            print(f"Skipping (exists): {out_path}")
-            continue
+            # A draft clip left from a preview is not good enough for a final render
+            if prof.is_draft or media_probe.resolution(out_path) == tuple(output_size):
+                print(f"Skipping (exists): {out_path}")
+                continue
+            print(f"Re-rendering (size differs from {output_size[0]}x{output_size[1]}): {out_path}")
 
         # Calculate a dynamic zoom based on duration to keep it interesting
         # e.g., if duration is 30s, zoom end is 1.25. If 10s, zoom end is 1.15
@@ -326,7 +331,8 @@ def export_kb_videos(input_folder, out_folder,
             codec="libx264",
             audio=False,
             threads=4,
-            preset="veryfast"
+            preset=preset,
+            ffmpeg_params=["-crf", str(crf)] if crf is not None else None,
         )
         clip.close()
 
@@ -6,6 +6,8 @@ import subprocess
 from dataclasses import dataclass
 from pathlib import Path
 
+import media_probe
+
 @dataclass
 class ExtractResult:
     ok: bool
@@ -31,20 +33,8 @@ def safe_join(base_dir: Path, urlish_path: str) -> Path:
     return p
 
 def ffprobe_duration(path: Path) -> float | None:
-    try:
-        out = subprocess.check_output(
-            [
-                "ffprobe", "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                str(path),
-            ],
-            stderr=subprocess.STDOUT,
-            text=True,
-        ).strip()
-        return round(float(out), 2)
-    except Exception:
-        return None
+    d = media_probe.duration(path)
+    return round(d, 2) if d is not None else None
 
 def _ffmpeg_cmd(in_path: Path, out_path: Path, fmt: str, track: int) -> list[str]:
     map_opt = f"a:{track}"
@@ -0,0 +1,154 @@
+# media_index.py — in-process index of the media library folders
+#
+# The browsing endpoints (_list_current / _list_all_folders in server.py and
+# quiz/routes.list_media) used to os.walk / listdir / stat / sort the asset
+# folders on every request. They now read listings from memory:
+#   - list_dir(path)    (subfolders, files) of one folder, sorted; rescanned only when
+#                       the folder's mtime changed (adding, removing or renaming an
+#                       entry bumps it), so an unchanged folder costs one stat()
+#   - folders(base)     every subfolder under base (what os.walk used to build),
+#                       revalidated at most every TREE_TTL seconds, and then only
+#                       the folders whose mtime changed are rescanned
+#   - json_response(data)  jsonify() with an ETag of the body; answers 304 when
+#                       the browser's If-None-Match still matches
+#
+# Folders modified in the last RACY_SEC seconds are listed but not cached: on
+# filesystems with coarse timestamps a second change in the same tick would not
+# move the mtime.
+#
+# Env overrides:
+#     MEDIA_INDEX_TREE_TTL   seconds a folder tree is served without re-checking (default: 2)
+#     MEDIA_INDEX            set to 0 to bypass the index (always rescan)
+import hashlib
+import json
+import os
+import threading
+import time
+
+TREE_TTL = float(os.getenv("MEDIA_INDEX_TREE_TTL", "2"))
+ENABLED = os.getenv("MEDIA_INDEX", "1") != "0"
+RACY_SEC = 2.0
+
+_lock = threading.Lock()
+_dirs = {}    # abs folder -> (mtime_ns, subfolder names, file names, symlinked subfolder names)
+_trees = {}   # abs base -> (checked_at, [rel folders])
+_stats = {"hits": 0, "rescans": 0, "tree_hits": 0, "tree_checks": 0}
+
+
+def _scan(path):
+    dirs, files, links = [], [], []
+    with os.scandir(path) as it:
+        for e in it:
+            try:
+                if e.is_dir():
+                    dirs.append(e.name)
+                    if e.is_symlink():
+                        links.append(e.name)
+                elif e.is_file():
+                    files.append(e.name)
+            except OSError:
+                continue
+    return tuple(sorted(dirs)), tuple(sorted(files)), frozenset(links)
+
+
+def _entry(path):
+    path = os.path.abspath(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        with _lock:
+            _dirs.pop(path, None)
+        return None
+    if ENABLED:
+        with _lock:
+            hit = _dirs.get(path)
+            if hit and hit[0] == mtime:
+                _stats["hits"] += 1
+                return hit
+    try:
+        dirs, files, links = _scan(path)
+    except OSError:
+        return None
+    entry = (mtime, dirs, files, links)
+    with _lock:
+        _stats["rescans"] += 1
+        if ENABLED and time.time_ns() - mtime > RACY_SEC * 1e9:
+            _dirs[path] = entry
+        else:
+            _dirs.pop(path, None)
+    return entry
+
+
+def list_dir(path):
+    """(subfolder names, file names) of `path`, both sorted; ((), ()) if it doesn't exist."""
+    entry = _entry(path)
+    if entry is None:
+        return (), ()
+    return entry[1], entry[2]
+
+
+def folders(base):
+    """All subfolders of base as sorted posix paths relative to it, including '' for base itself."""
+    base = os.path.abspath(base)
+    now = time.monotonic()
+    if ENABLED:
+        with _lock:
+            hit = _trees.get(base)
+            if hit and now - hit[0] < TREE_TTL:
+                _stats["tree_hits"] += 1
+                return list(hit[1])
+
+    out = [""]
+    stack = [("", base)]
+    while stack:
+        rel, path = stack.pop()
+        entry = _entry(path)
+        if entry is None:
+            continue
+        _, dirs, _, links = entry
+        for d in dirs:
+            sub = f"{rel}/{d}" if rel else d
+            if d in links:
+                continue  # like os.walk(followlinks=False): not descended into, not listed
+            out.append(sub)
+            stack.append((sub, os.path.join(path, d)))
+    out.sort()
+    with _lock:
+        _stats["tree_checks"] += 1
+        _trees[base] = (now, out)
+    return list(out)
+
+
+def invalidate(path=None):
+    """Forget cached listings under `path` (everything if None), e.g. right after writing files."""
+    with _lock:
+        if path is None:
+            _dirs.clear()
+            _trees.clear()
+            return
+        path = os.path.abspath(path)
+        for cache in (_dirs, _trees):
+            for p in [p for p in cache if p == path or p.startswith(path + os.sep) or path.startswith(p + os.sep)]:
+                cache.pop(p, None)
+
+
+def json_response(data):
+    """jsonify(data) with a strong ETag of the body; 304 Not Modified if the client already has it."""
+    from flask import jsonify, request
+
+    resp = jsonify(data)
+    body = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    resp.set_etag(hashlib.sha1(body.encode("utf-8")).hexdigest())
+    resp.headers["Cache-Control"] = "no-cache"  # always revalidate, but allow 304s
+    return resp.make_conditional(request)
+
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_stats)
+        out["folders_cached"] = len(_dirs)
+        out["trees_cached"] = len(_trees)
+    lookups = out["hits"] + out["rescans"]
+    out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else None
+    out["enabled"] = ENABLED
+    return out
@@ -0,0 +1,253 @@
+# media_job_store.py — SQLite job table behind multi_profile_media_agent
+#
+# The Excel sheet used to be the system of record: every finished row reopened,
+# patched and re-saved the whole workbook, and concurrent profiles fought over
+# the file lock. Now:
+#   - import_excel()  bulk-loads the sheet into SQLite at the start of a pass
+#   - claim()         atomically hands one row to one profile (across processes)
+#   - complete()      records the result in the DB (no Excel I/O)
+#   - export_excel()  writes all changed rows back in one open/save at the end
+#
+# Rows finished but not yet exported (crash, workbook open in Excel...) stay
+# marked dirty and are exported by the next run. Stdlib only: workbooks are
+# opened, saved and given missing headers with the agent's own helpers
+# (open_wb_with_retry, save_wb_with_retry, ensure_columns, colmap_from_headers),
+# passed in by the caller.
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+KINDS = ("image", "video")
+
+# Columns the agent reads/writes (kept in sync with ensure_columns in the agent)
+INPUT_COLUMNS = ["prompt", "video_cmd", "section_id", "image_name", "image_provider", "image_orientation"]
+RESULT_COLUMNS = ["account_id", "image_path", "video_path", "status", "account_id_1", "account_id_2"]
+
+# A claim older than this is treated as abandoned (crashed run) and can be re-claimed
+DEFAULT_CLAIM_TTL = 60 * 60
+
+
+def _cell_str(v) -> str:
+    return "" if v is None else str(v).strip()
+
+
+class MediaJobStore:
+    """
+    Job rows for one (workbook, sheet), stored in a WAL-mode SQLite file.
+    open_wb(path) / save_wb(wb, path) / ensure_columns(ws, headers) / colmap(ws)
+    are the agent's workbook helpers.
+    """
+
+    def __init__(self, db_path: str | Path, excel_path: str | Path, sheet_name: str, *,
+                 open_wb: Callable, save_wb: Callable, ensure_columns: Callable, colmap: Callable):
+        self._open_wb = open_wb
+        self._save_wb = save_wb
+        self._ensure_columns = ensure_columns
+        self._colmap = colmap
+        self.db_path = str(db_path)
+        self.excel_path = str(excel_path)
+        self.sheet_name = sheet_name
+        self.source = f"{os.path.abspath(self.excel_path)}::{sheet_name}"
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        cols = ", ".join(f"{c} TEXT NOT NULL DEFAULT ''" for c in INPUT_COLUMNS + RESULT_COLUMNS)
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS jobs (source TEXT NOT NULL, row INTEGER NOT NULL, {cols},"
+            " dirty INTEGER NOT NULL DEFAULT 0, updated_at REAL, PRIMARY KEY (source, row))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS claims (source TEXT NOT NULL, row INTEGER NOT NULL, kind TEXT NOT NULL,"
+            " owner TEXT NOT NULL, claimed_at REAL NOT NULL, PRIMARY KEY (source, row, kind))"
+        )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --------------------------
+    # Excel <-> DB
+    # --------------------------
+    def import_excel(self) -> int:
+        """
+        Bulk-load the sheet. Inputs always come from Excel; results come from
+        Excel too, except for dirty rows (finished but not exported yet) whose
+        prompt is unchanged. Returns the number of rows loaded.
+        """
+        wb = self._open_wb(self.excel_path)
+        try:
+            ws = wb[self.sheet_name]
+            h = self._colmap(ws)
+            all_cols = INPUT_COLUMNS + RESULT_COLUMNS
+            rows = []
+            for i, values in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+                rec = {c: (_cell_str(values[h[c] - 1]) if c in h and h[c] - 1 < len(values) else "")
+                       for c in all_cols}
+                rows.append((i, rec))
+        finally:
+            wb.close()
+
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                dirty = {
+                    r["row"]: r for r in db.execute(
+                        "SELECT * FROM jobs WHERE source = ? AND dirty = 1", (self.source,)
+                    )
+                }
+                db.execute("DELETE FROM jobs WHERE source = ? AND row > ?", (self.source, len(rows) + 1))
+                placeholders = ", ".join("?" for _ in range(len(all_cols) + 4))
+                for i, rec in rows:
+                    keep = dirty.get(i)
+                    is_dirty = 0
+                    if keep is not None and keep["prompt"] == rec["prompt"]:
+                        for c in RESULT_COLUMNS:
+                            rec[c] = keep[c]
+                        is_dirty = 1
+                    db.execute(
+                        f"INSERT OR REPLACE INTO jobs (source, row, {', '.join(all_cols)}, dirty, updated_at)"
+                        f" VALUES ({placeholders})",
+                        (self.source, i, *[rec[c] for c in all_cols], is_dirty, time.time()),
+                    )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def export_excel(self) -> int:
+        """Write every dirty row back in one workbook open/save. Returns rows written."""
+        with self._lock:
+            dirty = self._db.execute(
+                "SELECT * FROM jobs WHERE source = ? AND dirty = 1 ORDER BY row", (self.source,)
+            ).fetchall()
+        if not dirty:
+            return 0
+
+        wb = self._open_wb(self.excel_path)
+        try:
+            ws = wb[self.sheet_name]
+            self._ensure_columns(ws, RESULT_COLUMNS)
+            h = self._colmap(ws)
+            for r in dirty:
+                for c in RESULT_COLUMNS:
+                    ws.cell(r["row"], h[c]).value = r[c] or None
+            self._save_wb(wb, self.excel_path)
+        finally:
+            wb.close()
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            for r in dirty:
+                # Only clear rows that didn't change again while we were saving
+                self._db.execute(
+                    "UPDATE jobs SET dirty = 0 WHERE source = ? AND row = ? AND updated_at = ?",
+                    (self.source, r["row"], r["updated_at"]),
+                )
+            self._db.execute("COMMIT")
+        return len(dirty)
+
+    # --------------------------
+    # Queries
+    # --------------------------
+    @staticmethod
+    def _pending_sql(kind: str) -> str:
+        if kind == "image":
+            return "prompt != '' AND image_path = ''"
+        if kind == "video":
+            return "image_path != '' AND video_path = ''"
+        raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+
+    def pending(self, kind: str) -> List[sqlite3.Row]:
+        """Rows that still need `kind` ('image' or 'video'), in sheet order."""
+        with self._lock:
+            return self._db.execute(
+                f"SELECT * FROM jobs WHERE source = ? AND {self._pending_sql(kind)} ORDER BY row",
+                (self.source,),
+            ).fetchall()
+
+    def claim(self, kind: str, row: int, owner: str, ttl: float = DEFAULT_CLAIM_TTL) -> bool:
+        """
+        Atomically take `row` for `owner`. False if the row is no longer pending
+        or another live owner (any process) holds it. The owner must be unique
+        per process (see claim_job in the agent), not just the profile id.
+        """
+        now = time.time()
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                still_pending = db.execute(
+                    f"SELECT 1 FROM jobs WHERE source = ? AND row = ? AND {self._pending_sql(kind)}",
+                    (self.source, row),
+                ).fetchone()
+                held = db.execute(
+                    "SELECT owner, claimed_at FROM claims WHERE source = ? AND row = ? AND kind = ?",
+                    (self.source, row, kind),
+                ).fetchone()
+                if not still_pending or (held and held["owner"] != owner and now - held["claimed_at"] < ttl):
+                    db.execute("ROLLBACK")
+                    return False
+                db.execute(
+                    "INSERT OR REPLACE INTO claims (source, row, kind, owner, claimed_at) VALUES (?, ?, ?, ?, ?)",
+                    (self.source, row, kind, owner, now),
+                )
+                db.execute("COMMIT")
+                return True
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    def complete(self, kind: str, row: int, path: str, account_id_used: str, status: str = "ok") -> None:
+        """
+        Record a result and release the claim. Same column rules the Excel
+        writers had: path + status always; account_id_1/2 and a blank
+        account_id are only backfilled.
+        """
+        if kind == "image":
+            sets = ("image_path = ?, status = ?,"
+                    " account_id_1 = CASE WHEN account_id_1 = '' THEN ? ELSE account_id_1 END,"
+                    " account_id = CASE WHEN account_id = '' THEN ? ELSE account_id END")
+            args = (path, status, account_id_used, account_id_used)
+        elif kind == "video":
+            sets = ("video_path = ?, status = ?,"
+                    " account_id_2 = CASE WHEN account_id_2 = '' THEN ? ELSE account_id_2 END")
+            args = (path, status, account_id_used)
+        else:
+            raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute(
+                    f"UPDATE jobs SET {sets}, dirty = 1, updated_at = ? WHERE source = ? AND row = ?",
+                    (*args, time.time(), self.source, row),
+                )
+                db.execute(
+                    "DELETE FROM claims WHERE source = ? AND row = ? AND kind = ?",
+                    (self.source, row, kind),
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            q = lambda sql: self._db.execute(sql, (self.source,)).fetchone()[0]
+            return {
+                "rows": q("SELECT COUNT(*) FROM jobs WHERE source = ?"),
+                "pending_images": q(f"SELECT COUNT(*) FROM jobs WHERE source = ? AND {self._pending_sql('image')}"),
+                "pending_videos": q(f"SELECT COUNT(*) FROM jobs WHERE source = ? AND {self._pending_sql('video')}"),
+                "dirty": q("SELECT COUNT(*) FROM jobs WHERE source = ? AND dirty = 1"),
+                "claimed": q("SELECT COUNT(*) FROM claims WHERE source = ?"),
+            }
@@ -0,0 +1,377 @@
+# media_probe.py — one ffprobe per file, cached in memory and on disk
+#
+# Every helper that used to shell out to ffprobe for a single field
+# (duration, resolution, has-audio, codec info...) goes through probe():
+#   - one `ffprobe -show_streams -show_format` per file
+#   - result is a typed MediaInfo record
+#   - cached by (path, size, mtime) in memory and in a small SQLite store,
+#     so unchanged files are never probed twice, even across restarts; the
+#     in-memory cache keeps one entry per path, least-recently-used first out
+#   - probe_many() probes a batch concurrently
+#
+# Stdlib only (also used by whisperx_captions.py in its own venv).
+#
+# Env overrides:
+#     MEDIA_PROBE_CACHE   path of the SQLite store (default: <repo>/cache/ffprobe.sqlite)
+#     MEDIA_PROBE_WORKERS default concurrency for probe_many (default: 8)
+#     MEDIA_PROBE_MEM_MAX paths kept in the in-memory cache (default: 4096)
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_PATH = Path(os.getenv("MEDIA_PROBE_CACHE", str(BASE_DIR / "cache" / "ffprobe.sqlite")))
+DEFAULT_WORKERS = int(os.getenv("MEDIA_PROBE_WORKERS", "8"))
+MEM_MAX = int(os.getenv("MEDIA_PROBE_MEM_MAX", "4096"))
+
+# Bump when the stored fields change, so older rows are probed again
+_SCHEMA = 2
+
+
+class ProbeError(RuntimeError):
+    """ffprobe could not read the file (missing, corrupt, not media)."""
+
+    def __init__(self, message: str, output: str = ""):
+        super().__init__(message)
+        self.output = output
+
+
+def _to_float(v) -> float | None:
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return f if f == f and f not in (float("inf"), float("-inf")) else None
+
+
+def _to_int(v) -> int | None:
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _rate_to_float(rate: str | None) -> float:
+    """'30000/1001' -> 29.97, '30' -> 30.0, bad/empty -> 0.0"""
+    if not rate:
+        return 0.0
+    try:
+        if "/" in rate:
+            n, d = rate.split("/", 1)
+            return float(n) / float(d) if float(d) != 0 else 0.0
+        return float(rate)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+@dataclass(frozen=True)
+class StreamInfo:
+    index: int
+    codec_type: str
+    codec_name: str | None = None
+    width: int | None = None
+    height: int | None = None
+    pix_fmt: str | None = None
+    avg_frame_rate: str | None = None
+    r_frame_rate: str | None = None
+    sample_rate: int | None = None
+    channels: int | None = None
+    duration: float | None = None
+    profile: str | None = None      # codec profile, e.g. "High", "Constrained Baseline", "Main 10"
+    level: int | None = None        # codec level as ffprobe reports it (H.264: 40 = 4.0)
+
+    @property
+    def fps(self) -> float:
+        return _rate_to_float(self.avg_frame_rate) or _rate_to_float(self.r_frame_rate)
+
+    @staticmethod
+    def from_ffprobe(s: dict) -> "StreamInfo":
+        return StreamInfo(
+            index=_to_int(s.get("index")) or 0,
+            codec_type=s.get("codec_type") or "",
+            codec_name=s.get("codec_name"),
+            width=_to_int(s.get("width")),
+            height=_to_int(s.get("height")),
+            pix_fmt=s.get("pix_fmt"),
+            avg_frame_rate=s.get("avg_frame_rate"),
+            r_frame_rate=s.get("r_frame_rate"),
+            sample_rate=_to_int(s.get("sample_rate")),
+            channels=_to_int(s.get("channels")),
+            duration=_to_float(s.get("duration")),
+            profile=s.get("profile"),
+            level=_to_int(s.get("level")),
+        )
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    path: str
+    size: int
+    mtime_ns: int
+    duration: float | None          # container (format) duration
+    format_name: str | None
+    bit_rate: int | None
+    streams: tuple[StreamInfo, ...]
+
+    @property
+    def video(self) -> StreamInfo | None:
+        """First video stream (same as ffprobe -select_streams v:0)."""
+        return next((s for s in self.streams if s.codec_type == "video"), None)
+
+    @property
+    def audio(self) -> StreamInfo | None:
+        return next((s for s in self.streams if s.codec_type == "audio"), None)
+
+    @property
+    def has_video(self) -> bool:
+        return self.video is not None
+
+    @property
+    def has_audio(self) -> bool:
+        return self.audio is not None
+
+    @property
+    def width(self) -> int | None:
+        return self.video.width if self.video else None
+
+    @property
+    def height(self) -> int | None:
+        return self.video.height if self.video else None
+
+    @property
+    def fps(self) -> float:
+        return self.video.fps if self.video else 0.0
+
+    def video_stream_info(self) -> dict:
+        """Primary video stream as {codec_name, width, height, avg_frame_rate, pix_fmt, profile, level} ({} if none)."""
+        v = self.video
+        if v is None:
+            return {}
+        return {
+            "codec_name": v.codec_name,
+            "width": v.width,
+            "height": v.height,
+            "avg_frame_rate": v.avg_frame_rate,
+            "pix_fmt": v.pix_fmt,
+            "profile": v.profile,
+            "level": v.level,
+        }
+
+    @staticmethod
+    def from_ffprobe(path: str, size: int, mtime_ns: int, data: dict) -> "MediaInfo":
+        fmt = data.get("format") or {}
+        return MediaInfo(
+            path=path,
+            size=size,
+            mtime_ns=mtime_ns,
+            duration=_to_float(fmt.get("duration")),
+            format_name=fmt.get("format_name"),
+            bit_rate=_to_int(fmt.get("bit_rate")),
+            streams=tuple(StreamInfo.from_ffprobe(s) for s in data.get("streams") or []),
+        )
+
+
+# --------------------------
+# Cache (memory + SQLite)
+# --------------------------
+_mem: OrderedDict[str, MediaInfo] = OrderedDict()  # abs path -> last probe, most recently used last
+_mem_lock = threading.Lock()
+_db_lock = threading.Lock()
+_db: sqlite3.Connection | None = None
+_db_failed = False
+
+
+def _conn() -> sqlite3.Connection | None:
+    global _db, _db_failed
+    if _db is not None or _db_failed:
+        return _db
+    try:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(CACHE_PATH), timeout=10, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS probes ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, data TEXT)"
+        )
+        db.commit()
+        _db = db
+    except sqlite3.Error as e:
+        print(f"[probe] on-disk cache disabled: {e}")
+        _db_failed = True
+    return _db
+
+
+def _mem_get(path: str, size: int, mtime_ns: int) -> MediaInfo | None:
+    with _mem_lock:
+        info = _mem.get(path)
+        if info is None or info.size != size or info.mtime_ns != mtime_ns:
+            return None
+        _mem.move_to_end(path)
+        return info
+
+
+def _mem_put(info: MediaInfo) -> None:
+    with _mem_lock:
+        _mem[info.path] = info  # replaces the entry of an older version of the file
+        _mem.move_to_end(info.path)
+        while len(_mem) > max(1, MEM_MAX):
+            _mem.popitem(last=False)
+
+
+def _disk_get(path: str, size: int, mtime_ns: int) -> dict | None:
+    db = _conn()
+    if db is None:
+        return None
+    try:
+        with _db_lock:
+            row = db.execute(
+                "SELECT size, mtime_ns, data FROM probes WHERE path = ?", (path,)
+            ).fetchone()
+    except sqlite3.Error:
+        return None
+    if row and row[0] == size and row[1] == mtime_ns:
+        data = json.loads(row[2])
+        if data.get("schema") == _SCHEMA:
+            return data
+    return None
+
+
+def _disk_put(path: str, size: int, mtime_ns: int, data: dict) -> None:
+    db = _conn()
+    if db is None:
+        return
+    try:
+        with _db_lock:
+            db.execute(
+                "INSERT OR REPLACE INTO probes (path, size, mtime_ns, data) VALUES (?, ?, ?, ?)",
+                (path, size, mtime_ns, json.dumps(data)),
+            )
+            db.commit()
+    except sqlite3.Error as e:
+        print(f"[probe] cache write failed for {path}: {e}")
+
+
+def clear_cache(disk: bool = False) -> None:
+    with _mem_lock:
+        _mem.clear()
+    if disk:
+        db = _conn()
+        if db is not None:
+            with _db_lock:
+                db.execute("DELETE FROM probes")
+                db.commit()
+
+
+# --------------------------
+# Probing
+# --------------------------
+def _run_ffprobe(path: str) -> dict:
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_streams", "-show_format",
+        "-of", "json",
+        path,
+    ]
+    try:
+        p = subprocess.run(cmd, capture_output=True, text=True)
+    except FileNotFoundError as e:
+        raise ProbeError("ffprobe not found in PATH", str(e))
+    if p.returncode != 0:
+        raise ProbeError(f"ffprobe failed for {path}", (p.stderr or p.stdout or "").strip())
+    try:
+        return json.loads(p.stdout or "{}")
+    except json.JSONDecodeError as e:
+        raise ProbeError(f"ffprobe returned invalid JSON for {path}", p.stdout or "") from e
+
+
+def probe(path, use_cache: bool = True) -> MediaInfo:
+    """Probe `path` once (streams + format). Raises ProbeError on failure."""
+    p = os.path.abspath(str(path))
+    try:
+        st = os.stat(p)
+    except OSError as e:
+        raise ProbeError(f"File not found: {path}", str(e))
+    key = (p, st.st_size, st.st_mtime_ns)
+
+    if use_cache:
+        hit = _mem_get(*key)
+        if hit is not None:
+            return hit
+        data = _disk_get(*key)
+        if data is not None:
+            info = MediaInfo.from_ffprobe(p, st.st_size, st.st_mtime_ns, data)
+            _mem_put(info)
+            return info
+
+    data = _run_ffprobe(p)
+    # Keep only what MediaInfo reads, so the store stays small
+    slim = {
+        "schema": _SCHEMA,
+        "format": {k: (data.get("format") or {}).get(k) for k in ("duration", "format_name", "bit_rate")},
+        "streams": [
+            {k: s.get(k) for k in (
+                "index", "codec_type", "codec_name", "width", "height", "pix_fmt",
+                "avg_frame_rate", "r_frame_rate", "sample_rate", "channels", "duration",
+                "profile", "level",
+            )}
+            for s in data.get("streams") or []
+        ],
+    }
+    info = MediaInfo.from_ffprobe(p, st.st_size, st.st_mtime_ns, slim)
+    _mem_put(info)
+    _disk_put(p, st.st_size, st.st_mtime_ns, slim)
+    return info
+
+
+def try_probe(path) -> MediaInfo | None:
+    """probe() that returns None instead of raising."""
+    try:
+        return probe(path)
+    except ProbeError:
+        return None
+
+
+def probe_many(paths, max_workers: int | None = None) -> dict[str, MediaInfo | None]:
+    """
+    Probe many files concurrently. Returns {str(path): MediaInfo or None},
+    keyed by the paths exactly as passed in.
+    """
+    paths = [str(p) for p in paths]
+    unique = list(dict.fromkeys(paths))
+    if not unique:
+        return {}
+    workers = max(1, min(max_workers or DEFAULT_WORKERS, len(unique)))
+    if workers == 1:
+        return {p: try_probe(p) for p in unique}
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        results = list(ex.map(try_probe, unique))
+    return dict(zip(unique, results))
+
+
+# --------------------------
+# Convenience accessors
+# --------------------------
+def duration(path) -> float | None:
+    """Container duration in seconds, or None if unknown/unreadable."""
+    info = try_probe(path)
+    return info.duration if info else None
+
+
+def resolution(path) -> tuple[int, int] | None:
+    info = try_probe(path)
+    if info is None or not info.width or not info.height:
+        return None
+    return info.width, info.height
+
+
+def has_audio(path) -> bool:
+    info = try_probe(path)
+    return bool(info and info.has_audio)
@@ -68,6 +68,8 @@ from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
 import hashlib
 
+from media_job_store import MediaJobStore
+
 # from contentplanner_worker import db_report_image
 # =========================
 # GLOBAL CONFIG (edit here)
@@ -87,6 +89,9 @@ RUN_MODE = "videos"   # "images" or "videos"
 EXCEL_FILE  = r"media_jobs.xlsx"
 SHEET_NAME  = "Jobs"
 
+# SQLite job store (system of record during a run; Excel is synced at start/end of each pass)
+JOBS_DB     = r"media_jobs.sqlite"
+
 # default video rendering if video_cmd is blank
 DEFAULT_VIDEO_CMD = (
     'ffmpeg -y -loop 1 -i "{image}" -t 8 -r 30 -pix_fmt yuv420p "{out}"'
@@ -501,121 +506,75 @@ def safe_move_and_overwrite(src: Path, dest: Path):
         print(f"Error moving {src} to {dest}: {e}")
         raise
 
+_JOB_STORE: Optional[MediaJobStore] = None
+
+# Claims are held per process: two runs of the same profile must not share an owner
+_CLAIM_OWNER_SUFFIX = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def job_store() -> MediaJobStore:
+    global _JOB_STORE
+    if _JOB_STORE is None:
+        _JOB_STORE = MediaJobStore(
+            JOBS_DB, EXCEL_FILE, SHEET_NAME,
+            open_wb=open_wb_with_retry, save_wb=save_wb_with_retry,
+            ensure_columns=ensure_columns, colmap=colmap_from_headers,
+        )
+    return _JOB_STORE
+
+def export_jobs_to_excel() -> None:
+    """Flush finished rows to Excel in one save. On failure rows stay queued for the next run."""
+    try:
+        n = job_store().export_excel()
+        if n:
+            print(f"[jobs] Exported {n} row(s) to {EXCEL_FILE}")
+    except PermissionError:
+        print(f"[jobs] {EXCEL_FILE} is locked (open in Excel?) - results kept in {JOBS_DB}, will export next run")
+
 def read_jobs_from_excel_for_images() -> List[Dict]:
     """Rows needing image generation: prompt set AND image_path empty."""
-    wb = open_wb_with_retry(EXCEL_FILE)
-    ws = wb[SHEET_NAME]
-
-    # Ensure columns exist (adds audit columns if missing)
-    ensure_columns(ws, [
-        "prompt", "account_id", "image_path", "video_cmd", "video_path", "status",
-        ACCOUNT_ID1_COL, ACCOUNT_ID2_COL
-    ])
-    h = colmap_from_headers(ws)
+    store = job_store()
+    store.import_excel()
 
     rows = []
-    for i in range(2, ws.max_row + 1):
-        prompt = (ws.cell(i, h["prompt"]).value or "").strip()
-        img    = (ws.cell(i, h["image_path"]).value or "").strip()
-        acct   = (ws.cell(i, h["account_id"]).value or "").strip()
-        section_id = int(ws.cell(i, h.get("section_id")).value or 0) if "section_id" in h else 0
-        image_name = (ws.cell(i, h.get("image_name")).value or "").strip() if "image_name" in h else ""
-
-        # image_provider = (ws.cell(i, h.get("image_provider")).value or "").strip().lower()
-
-        col_idx = h.get("image_provider")
-        image_provider = (ws.cell(i, col_idx).value or "").strip().lower() if col_idx else ""
-        image_orientation = (ws.cell(i, h.get("image_orientation")).value or "").strip().lower()
-
-        if prompt and not img:
-            rows.append({
-                "row": i, 
-                "prompt": prompt, 
-                "account_id": acct, 
-                "section_id": section_id, 
-                "image_name": image_name,
-                "image_provider": image_provider,          # NEW
-                "image_orientation": image_orientation,    # NEW                
-                })
-    save_wb_with_retry(wb, EXCEL_FILE)  # in case we added headers
-    wb.close()
+    for r in store.pending("image"):
+        rows.append({
+            "row": r["row"],
+            "prompt": r["prompt"],
+            "account_id": r["account_id"],
+            "section_id": int(float(r["section_id"])) if r["section_id"] else 0,
+            "image_name": r["image_name"],
+            "image_provider": r["image_provider"].lower(),
+            "image_orientation": r["image_orientation"].lower(),
+            })
     return rows
 
 def read_jobs_from_excel_for_videos() -> List[Dict]:
     """Rows needing video generation: image_path set AND video_path empty."""
-    wb = open_wb_with_retry(EXCEL_FILE)
-    ws = wb[SHEET_NAME]
-
-    # Ensure columns exist
-    ensure_columns(ws, [
-        "prompt", "account_id", "image_path", "video_cmd", "video_path", "status",
-        ACCOUNT_ID1_COL, ACCOUNT_ID2_COL
-    ])
-    h = colmap_from_headers(ws)
+    store = job_store()
+    store.import_excel()
 
     rows = []
-    for i in range(2, ws.max_row + 1):
-        image_path = (ws.cell(i, h["image_path"]).value or "").strip()
-        vout  = (ws.cell(i, h["video_path"]).value or "").strip()
-        vcmd  = (ws.cell(i, h["video_cmd"]).value or "").strip()
-        acct       = (ws.cell(i, h["account_id"]).value or "").strip()
-
-        if image_path and not vout:
-            rows.append({
-                "row": i,
-                "account_id": acct,
-                "image_path": image_path,
-                "video_cmd": vcmd,  # we'll treat this as the Meta animation prompt
-            })
-    save_wb_with_retry(wb, EXCEL_FILE)
-    wb.close()
+    for r in store.pending("video"):
+        rows.append({
+            "row": r["row"],
+            "account_id": r["account_id"],
+            "image_path": r["image_path"],
+            "video_cmd": r["video_cmd"],  # we'll treat this as the Meta animation prompt
+        })
     return rows
 
-def write_image_result(row_idx: int, image_path: str, account_id_used: str, status: str = "ok"):
-    wb = open_wb_with_retry(EXCEL_FILE)
-    ws = wb[SHEET_NAME]
-
-    ensure_columns(ws, [
-        "prompt", "account_id", "image_path", "video_cmd", "video_path", "status",
-        ACCOUNT_ID1_COL, ACCOUNT_ID2_COL
-    ])
-    h = colmap_from_headers(ws)
-
-    # Write image path + status
-    ws.cell(row_idx, h["image_path"]).value = image_path
-    ws.cell(row_idx, h["status"]).value = status
-
-    # If account_id_1 is empty, record who actually generated the image
-    if ws.cell(row_idx, h[ACCOUNT_ID1_COL]).value in (None, ""):
-        ws.cell(row_idx, h[ACCOUNT_ID1_COL]).value = account_id_used
-
-    # Optional: if assignment account_id is blank, backfill with the one we used
-    if ws.cell(row_idx, h["account_id"]).value in (None, ""):
-        ws.cell(row_idx, h["account_id"]).value = account_id_used
+def claim_job(kind: str, row_idx: int, owner: str) -> bool:
+    """Take a row before working on it; False means another profile/process already has it."""
+    if job_store().claim(kind, row_idx, f"{owner}:{_CLAIM_OWNER_SUFFIX}"):
+        return True
+    print(f"[{owner}] Row {row_idx} already claimed or done - skipping")
+    return False
 
-    save_wb_with_retry(wb, EXCEL_FILE)
-    wb.close()
+def write_image_result(row_idx: int, image_path: str, account_id_used: str, status: str = "ok"):
+    job_store().complete("image", row_idx, image_path, account_id_used, status)
 
 def write_video_result(row_idx: int, video_path: str, account_id_used: str, status: str = "ok"):
-    wb = open_wb_with_retry(EXCEL_FILE)
-    ws = wb[SHEET_NAME]
-
-    ensure_columns(ws, [
-        "prompt", "account_id", "image_path", "video_cmd", "video_path", "status",
-        ACCOUNT_ID1_COL, ACCOUNT_ID2_COL
-    ])
-    h = colmap_from_headers(ws)
-
-    # Write video path + status
-    ws.cell(row_idx, h["video_path"]).value = video_path
-    ws.cell(row_idx, h["status"]).value = status
-
-    # If account_id_2 is empty, record who actually generated the video
-    if ws.cell(row_idx, h[ACCOUNT_ID2_COL]).value in (None, ""):
-        ws.cell(row_idx, h[ACCOUNT_ID2_COL]).value = account_id_used
-
-    save_wb_with_retry(wb, EXCEL_FILE)
-    wb.close()
+    job_store().complete("video", row_idx, video_path, account_id_used, status)
 
 # =========================
 # Site-specific automation
@@ -1669,6 +1628,8 @@ async def run_grokaccount_images(pw, account: Dict[str, str], jobs: List[Dict]):
         prompt  = job["prompt"]
         image_name = job.get("image_name","")
         section_id = job.get("section_id", 0)
+        if not claim_job("image", row_idx, account["id"]):
+            continue
         try:
             # img_path = await generate_image_google_ai(page, prompt, out_dir, image_name)
             img_path = await generate_image_router(
@@ -1736,6 +1697,8 @@ async def run_aistudio_account_images(pw, account: Dict[str, str], jobs: List[Di
         prompt  = job["prompt"]
         image_name = job.get("image_name","")
         section_id = job.get("section_id", 0)
+        if not claim_job("image", row_idx, account["id"]):
+            continue
         try:
             # img_path = await generate_image_google_ai(page, prompt, out_dir, image_name)
             img_path = await generate_image_router(
@@ -1799,6 +1762,8 @@ async def run_account_videos(pw, account: Dict[str, str], jobs: List[Dict]):
         row_idx = job["row"]
         prompt  = job["video_cmd"]
         imagePath = job["image_path"]
+        if not claim_job("video", row_idx, account["id"]):
+            continue
         try:
             vid_path = await generate_video_meta_ai(page, imagePath, prompt, out_dir, _get_site_url(account, "meta", fallback="https://www.meta.ai/media/?nr=1"))
             write_video_result(row_idx, str(Path(vid_path).resolve()), account_id_used=account["id"], status="ok")
@@ -1843,6 +1808,8 @@ def process_videos_from_excel():
                .replace("{image}", image)
                .replace("{out}", video_out))
 
+        if not claim_job("video", row_idx, VIDEO_ACCOUNT_ID):
+            continue
         try:
             run_shell(cmd)
             write_video_result(row_idx, str(Path(video_out).resolve()), account_id_used=VIDEO_ACCOUNT_ID, status="ok")
@@ -1850,6 +1817,7 @@ def process_videos_from_excel():
         except Exception as e:
             write_video_result(row_idx, "", account_id_used=VIDEO_ACCOUNT_ID, status=f"error: {e}")
             print(f"[videos] Row {row_idx} ERROR: {e}")
+    export_jobs_to_excel()
 
 # =========================
 # Coordinator
@@ -1902,15 +1870,18 @@ async def main_async_videos():
             if bucket:
                 jobs.append((acc, bucket))
 
-        async with async_playwright() as pw:
+        try:
+            async with async_playwright() as pw:
 
-            # Optional: run once to bootstrap logins for each profile (see BOOTSTRAP_LOGIN/BOOTSTRAP_SITES)
-            if BOOTSTRAP_LOGIN:
-                for acc in ACCOUNTS:
-                    await bootstrap_profile_logins(pw, acc)
+                # Optional: run once to bootstrap logins for each profile (see BOOTSTRAP_LOGIN/BOOTSTRAP_SITES)
+                if BOOTSTRAP_LOGIN:
+                    for acc in ACCOUNTS:
+                        await bootstrap_profile_logins(pw, acc)
 
 
-            await asyncio.gather(*[run_account_videos(pw, acc, bucket) for acc, bucket in jobs])
+                await asyncio.gather(*[run_account_videos(pw, acc, bucket) for acc, bucket in jobs])
+        finally:
+            export_jobs_to_excel()
 
         if not ENABLE_RETRY or attempt >= MAX_RETRY_ATTEMPTS:
             print("⛔ Video retries exhausted.")
@@ -1954,6 +1925,8 @@ async def run_chatgpt_images(pw, jobs: list[dict]):
     # await asyncio.sleep(505)
     for idx, job in enumerate(jobs, start=1):
         row_idx = job["row"]
+        if not claim_job("image", row_idx, account["id"]):
+            continue
 
         try:
             img_path = await generate_image_router(
@@ -2052,35 +2025,38 @@ async def main_async_images():
 
         #     await asyncio.gather(*[run_account_images(pw, acc, bucket) for acc, bucket in jobs])
 
-        async with async_playwright() as pw:
-
-            # Optional: run once to bootstrap logins for each profile (see BOOTSTRAP_LOGIN/BOOTSTRAP_SITES)
-            if BOOTSTRAP_LOGIN:
-                for acc in ACCOUNTS:
-                    await bootstrap_profile_logins(pw, acc)
-
-
-            tasks = []
-
-            # Google AI → parallel, multi-profile
-            if google_rows:
-                google_jobs = partition_rows_by_account(google_rows, ACCOUNTS)
-                tasks.extend(
-                    run_aistudio_account_images(pw, acc, bucket)
-                    for acc, bucket in google_jobs
-                )
-
-            if grok_rows:
-                grok_jobs = partition_rows_by_account(grok_rows, ACCOUNTS)
-                tasks.extend(
-                    run_grokaccount_images(pw, acc, bucket)
-                    for acc, bucket in grok_jobs
-                )
-            # ChatGPT Images → SINGLE profile, sequential
-            if chatgpt_rows:
-                tasks.append(run_chatgpt_images(pw, chatgpt_rows))
-
-            await asyncio.gather(*tasks)
+        try:
+            async with async_playwright() as pw:
+
+                # Optional: run once to bootstrap logins for each profile (see BOOTSTRAP_LOGIN/BOOTSTRAP_SITES)
+                if BOOTSTRAP_LOGIN:
+                    for acc in ACCOUNTS:
+                        await bootstrap_profile_logins(pw, acc)
+
+
+                tasks = []
+
+                # Google AI → parallel, multi-profile
+                if google_rows:
+                    google_jobs = partition_rows_by_account(google_rows, ACCOUNTS)
+                    tasks.extend(
+                        run_aistudio_account_images(pw, acc, bucket)
+                        for acc, bucket in google_jobs
+                    )
+
+                if grok_rows:
+                    grok_jobs = partition_rows_by_account(grok_rows, ACCOUNTS)
+                    tasks.extend(
+                        run_grokaccount_images(pw, acc, bucket)
+                        for acc, bucket in grok_jobs
+                    )
+                # ChatGPT Images → SINGLE profile, sequential
+                if chatgpt_rows:
+                    tasks.append(run_chatgpt_images(pw, chatgpt_rows))
+
+                await asyncio.gather(*tasks)
+        finally:
+            export_jobs_to_excel()
 
 
         if not ENABLE_RETRY or attempt >= MAX_RETRY_ATTEMPTS:
@@ -11,6 +11,8 @@ import  tempfile, os
 from flask import Blueprint, jsonify, send_file
 from werkzeug.utils import secure_filename
 
+import media_index
+
 try:
     import openpyxl  # pip install openpyxl
 except ImportError:
@@ -160,17 +162,14 @@ def list_media():
     music_dir = os.path.join(APP_ROOT, "static/music")
 
     def list_files(path, exts):
-        try:
-            out = []
-            for fn in os.listdir(path):
-                low = fn.lower()
-                if any(low.endswith(e) for e in exts):
-                    out.append(f"/quiz/static/{os.path.basename(path)}/{fn}")
-            return out
-        except FileNotFoundError:
-            return []
-
-    return jsonify({
+        out = []
+        for fn in media_index.list_dir(path)[1]:
+            low = fn.lower()
+            if any(low.endswith(e) for e in exts):
+                out.append(f"/quiz/static/{os.path.basename(path)}/{fn}")
+        return out
+
+    return media_index.json_response({
         "videos": list_files(bg_dir, [".mp4", ".webm", ".mov"]),
         "images": list_files(bg_dir, [".jpg", ".jpeg", ".png", ".webp"]),
         "music":  list_files(music_dir, [".mp3", ".wav"])
@@ -1,8 +1,14 @@
+import hashlib
 import json
+import os
+import sqlite3
 import subprocess
 from pathlib import Path
 from typing import Tuple
 
+import encoding_profile
+import media_probe
+
 def _parse_hex_color(color: str) -> Tuple[int, int, int]:
     s = color.strip().lower()
     if s.startswith("0x"):
@@ -16,6 +22,35 @@ def _parse_hex_color(color: str) -> Tuple[int, int, int]:
     b = int(s[4:6], 16)
     return r, g, b
 
+# ---------------------------------------------------------------
+# Chroma verdict cache: (file fingerprint, sampling params) -> green ratio
+# ---------------------------------------------------------------
+CHROMA_CACHE_PATH = Path(os.getenv(
+    "CHROMA_CACHE", str(Path(__file__).resolve().parent / "cache" / "chroma_detect.sqlite")
+))
+
+
+def _chroma_cache_conn():
+    try:
+        CHROMA_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(CHROMA_CACHE_PATH), timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS chroma (key TEXT PRIMARY KEY, ratio REAL NOT NULL)")
+        return db
+    except sqlite3.Error as e:
+        print(f"CHROMA_DETECT cache disabled: {e}")
+        return None
+
+
+def _chroma_cache_key(video: Path, params: dict) -> str | None:
+    try:
+        st = os.stat(video)
+    except OSError:
+        return None
+    raw = json.dumps([os.path.abspath(video), st.st_size, st.st_mtime_ns, params], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
 def detect_chroma_by_green_ratio(
     video: Path,
     chroma_hex: str = "0x00FF00",
@@ -28,11 +63,37 @@ def detect_chroma_by_green_ratio(
     sample_scale: tuple[int, int] = (160, 90),
     sample_window_s: float = 2.0,
     frames_per_window: int = 4,
+    use_cache: bool = True,
 ) -> tuple[bool, float]:
     """
     Heuristic detection: sample a few short windows and estimate how much of the frame is near #00FF00.
     Returns (has_chroma, green_ratio).
+
+    All windows come from one ffmpeg call (one input-seeked input per window, concatenated);
+    if that call fails or comes back short, the windows are retried one at a time.
+    The ratio is cached per (path, size, mtime, sampling params), so re-runs skip decoding;
+    ratio_threshold is applied after the cache, so changing it needs no re-detect.
     """
+    target_r, target_g, target_b = _parse_hex_color(chroma_hex)
+    w, h = sample_scale
+    max_frames = max(1, int(frames_per_window))
+
+    params = {
+        "hex": (target_r, target_g, target_b), "dist": dist_threshold, "min_g": min_g,
+        "max_r": max_r, "max_b": max_b, "scale": [w, h], "window": sample_window_s, "frames": max_frames,
+    }
+    key = _chroma_cache_key(video, params) if use_cache else None
+    db = _chroma_cache_conn() if key else None
+    if db is not None:
+        try:
+            row = db.execute("SELECT ratio FROM chroma WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            row = None
+        if row is not None:
+            db.close()
+            ratio = row[0]
+            return (ratio >= ratio_threshold), ratio
+
     try:
         dur = probe_duration(video)
     except Exception:
@@ -48,101 +109,104 @@ def detect_chroma_by_green_ratio(
         ]
         offsets = [min(o, max(0.0, dur - sample_window_s)) for o in offsets]
 
-    target_r, target_g, target_b = _parse_hex_color(chroma_hex)
-    w, h = sample_scale
-    max_frames = max(1, int(frames_per_window))
-
-    total_green = 0
-    total_px = 0
-
-    try:
-        import numpy as np  # optional fast path
-        have_np = True
-    except Exception:
-        have_np = False
-
-    for ss in offsets:
-        fps = max_frames / max(sample_window_s, 0.1)
-        cmd = [
-            "ffmpeg", "-v", "error",
-            "-ss", f"{ss:.3f}",
-            "-t", f"{sample_window_s:.3f}",
-            "-i", str(video),
-            "-vf", f"fps={fps:.6f},scale={w}:{h},format=rgb24",
-            "-frames:v", str(max_frames),
+    # One ffmpeg: each window is its own fast-seeked input, sampled to max_frames, then concatenated
+    fps = max_frames / max(sample_window_s, 0.1)
+    frame_size = w * h * 3
+
+    def _sample(windows):
+        cmd = ["ffmpeg", "-v", "error"]
+        for ss in windows:
+            cmd += ["-ss", f"{ss:.3f}", "-t", f"{sample_window_s:.3f}", "-i", str(video)]
+        chains = "".join(
+            f"[{i}:v]fps={fps:.6f},scale={w}:{h},format=rgb24,trim=end_frame={max_frames},setpts=PTS-STARTPTS[s{i}];"
+            for i in range(len(windows))
+        )
+        labels = "".join(f"[s{i}]" for i in range(len(windows)))
+        cmd += [
+            "-filter_complex", f"{chains}{labels}concat=n={len(windows)}:v=1:a=0[out]",
+            "-map", "[out]",
+            "-r", f"{fps:.6f}",   # sampled rate, so the muxer doesn't duplicate frames up to 25 fps
             "-pix_fmt", "rgb24",
             "-f", "rawvideo",
             "pipe:1",
         ]
         try:
-            raw = subprocess.check_output(cmd)
+            return subprocess.check_output(cmd)
         except Exception:
-            continue
+            return b""
 
-        frame_size = w * h * 3
-        n_frames = len(raw) // frame_size
-        if n_frames <= 0:
-            continue
+    raw = _sample(offsets)
+    if len(offsets) > 1 and len(raw) // frame_size < len(offsets) * max_frames:
+        # One bad window (seek near EOF, corrupt GOP) fails or starves the whole
+        # fused graph: sample the windows one by one and keep whatever decodes
+        single = b"".join(_sample([ss]) for ss in offsets)
+        if len(single) > len(raw):
+            raw = single
 
-        if have_np:
-            import numpy as np
-            arr = np.frombuffer(raw[: n_frames * frame_size], dtype=np.uint8)
+    n_frames = len(raw) // frame_size
+    total_green = 0
+    total_px = 0
 
-            # arr = arr.reshape((n_frames, h, w, 3)).astype(np.int16)  # R,G,B
-            # r = arr[..., 0]
-            # g = arr[..., 1]
-            # b = arr[..., 2]
-            # dist_sq = (r - target_r) ** 2 + (g - target_g) ** 2 + (b - target_b) ** 2
+    if n_frames > 0:
+        try:
+            import numpy as np  # optional fast path
+            have_np = True
+        except Exception:
+            have_np = False
 
-            arr = arr.reshape((n_frames, h, w, 3)).astype(np.int16)  # R,G,B
+        if have_np:
+            arr = np.frombuffer(raw[: n_frames * frame_size], dtype=np.uint8)
+            arr = arr.reshape((n_frames, h, w, 3))
             r = arr[..., 0].astype(np.int32)
             g = arr[..., 1].astype(np.int32)
             b = arr[..., 2].astype(np.int32)
             dr = r - target_r
             dg = g - target_g
-            db = b - target_b
-            dist_sq = dr*dr + dg*dg + db*db
+            db_ = b - target_b
+            dist_sq = dr*dr + dg*dg + db_*db_
 
             mask = (dist_sq <= (dist_threshold ** 2)) | ((g >= min_g) & (r <= max_r) & (b <= max_b))
-            total_green += int(mask.sum())
-            total_px += int(mask.size)
+            total_green = int(mask.sum())
+            total_px = int(mask.size)
         else:
-            green = 0
-            px = n_frames * w * h
             data = raw[: n_frames * frame_size]
             for i in range(0, len(data), 3):
                 rr = data[i]
                 gg = data[i + 1]
                 bb = data[i + 2]
                 if (abs(rr - target_r) + abs(gg - target_g) + abs(bb - target_b) <= dist_threshold) or (gg >= min_g and rr <= max_r and bb <= max_b):
-                    green += 1
-            total_green += green
-            total_px += px
+                    total_green += 1
+            total_px = n_frames * w * h
 
     if total_px == 0:
-        return False, 0.0
+        if db is not None:
+            db.close()
+        return False, 0.0   # unreadable: don't cache, retry next time
 
     ratio = total_green / total_px
+    if db is not None:
+        try:
+            with db:
+                db.execute("INSERT OR REPLACE INTO chroma (key, ratio) VALUES (?, ?)", (key, ratio))
+        except sqlite3.Error as e:
+            print(f"CHROMA_DETECT cache write failed: {e}")
+        db.close()
     return (ratio >= ratio_threshold), ratio
 
-
 def run(cmd: list[str]):
     print("RUN:", " ".join(cmd))
     subprocess.run(cmd, check=True)
 
 def probe_duration(path: Path) -> float:
-    # ffprobe duration
-    cmd = [
-        "ffprobe", "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        str(path)
-    ]
-    out = subprocess.check_output(cmd).decode("utf-8").strip()
-    return float(out)
+    # ffprobe duration (raises if unreadable / unknown)
+    d = media_probe.probe(path).duration
+    if d is None:
+        raise ValueError(f"ffprobe returned no duration for {path}")
+    return d
 
-def make_scene(asset: Path, duration: float, out_path: Path, out_res: str, fps: int = 30):
+def make_scene(asset: Path, duration: float, out_path: Path, out_res: str, fps: int = 30, profile=None):
     w, h = out_res.split("x")
+    x264 = encoding_profile.get(profile).x264_args()
 
     if asset.suffix.lower() in [".jpg", ".jpeg", ".png", ".webp"]:
         # image -> loop for duration
@@ -152,7 +216,7 @@ def make_scene(asset: Path, duration: float, out_path: Path, out_res: str, fps:
             "-t", f"{duration:.3f}",
             "-vf", f"scale={w}:{h}:force_original_aspect_ratio=increase,crop={w}:{h}",
             "-r", str(fps),
-            "-c:v", "libx264", "-pix_fmt", "yuv420p",
+            "-c:v", "libx264", *x264, "-pix_fmt", "yuv420p",
             str(out_path)
         ]
         run(cmd)
@@ -172,11 +236,30 @@ def make_scene(asset: Path, duration: float, out_path: Path, out_res: str, fps:
         "-t", f"{duration:.3f}",
         "-vf", vf,
         "-r", str(fps),
-        "-c:v", "libx264", "-pix_fmt", "yuv420p",
+        "-c:v", "libx264", *x264, "-pix_fmt", "yuv420p",
         str(out_path)
     ]
     run(cmd)
 
+def scene_source(asset: Path, duration: float, out_res: str, fps: int = 30) -> tuple[list[str], str]:
+    """
+    make_scene() as ffmpeg input args + a filter chain for that input, so the
+    background can be built inside another filter graph instead of encoded
+    to its own file. Images loop; videos hold their last frame (tpad clone).
+    """
+    w, h = out_res.split("x")
+    fit = f"scale={w}:{h}:force_original_aspect_ratio=increase,crop={w}:{h}"
+    if asset.suffix.lower() in [".jpg", ".jpeg", ".png", ".webp"]:
+        inputs = ["-loop", "1", "-framerate", str(fps), "-i", str(asset)]
+        chain = fit
+    else:
+        inputs = ["-i", str(asset)]
+        # pad by the full duration; trim below cuts it to length
+        chain = f"setpts=PTS-STARTPTS,{fit},tpad=stop_mode=clone:stop_duration={duration:.3f}"
+    # fps last: setpts would otherwise drop the frame rate and the output falls back to 25
+    chain += f",trim=duration={duration:.3f},setpts=PTS-STARTPTS,fps={fps},format=yuv420p"
+    return inputs, chain
+
 def concat_scenes(scene_paths: list[Path], out_path: Path):
     lst = out_path.parent / "scenes.txt"
     lst.write_text("\n".join([f"file '{p.as_posix()}'" for p in scene_paths]), encoding="utf-8")
@@ -184,34 +267,17 @@ def concat_scenes(scene_paths: list[Path], out_path: Path):
     run(cmd)
 
 def probe_resolution(path: Path) -> tuple[int, int]:
-    cmd = [
-        "ffprobe", "-v", "error",
-        "-select_streams", "v:0",
-        "-show_entries", "stream=width,height",
-        "-of", "csv=p=0:s=x",
-        str(path)
-    ]
-    out = subprocess.check_output(cmd).decode("utf-8").strip()
-    w, h = map(int, out.split("x"))
-    return w, h
+    info = media_probe.probe(path)
+    if not info.width or not info.height:
+        raise ValueError(f"No video stream in {path}")
+    return info.width, info.height
 
 def probe_has_audio(path: Path) -> bool:
     """
     Returns True if the file has at least one audio stream.
     (Avoids ffmpeg errors when applying -af but there is no audio.)
     """
-    cmd = [
-        "ffprobe", "-v", "error",
-        "-select_streams", "a",
-        "-show_entries", "stream=index",
-        "-of", "csv=p=0",
-        str(path),
-    ]
-    try:
-        out = subprocess.check_output(cmd).decode("utf-8").strip()
-        return bool(out)
-    except Exception:
-        return False
+    return media_probe.has_audio(path)
     
 def merge_with_heygen(
     background: Path,
@@ -223,13 +289,23 @@ def merge_with_heygen(
     auto_detect_chroma: bool = False,
     chroma_detect_hex: str = "0x00FF00",
     chroma_ratio_threshold: float = 0.12,
+    scene_out_res: str | None = None,
+    scene_fps: int = 30,
+    profile=None,
 ):
     """
+    Fused mode: with scene_out_res set, `background` is the raw scene asset (image or
+    video) and make_scene's scale/loop/hold runs inside this filter graph, so there is
+    one encode per clip and no intermediate __bg.mp4.
+
     Modes:
     - If chroma is used in HeyGen (has_key=True): key the green background and overlay HeyGen over a FULL-SCREEN background video/image.
         * Prefer `background` as the background; if it's missing, fall back to `office_img`.
         * No PiP is used in this mode.
     - If chroma is NOT used (has_key=False): keep HeyGen untouched and put `background` as PiP (scene-in-scene).
+
+    profile: encoding_profile name/object. A draft keeps the layout (composed at full
+    size) and only scales / retimes / fast-encodes the output.
     """
 
 
@@ -255,9 +331,23 @@ def merge_with_heygen(
         border_cfg = "white@0.9"
         office_img = "images/heygen_avtar_bg_landscape.png"
 
+    prof = encoding_profile.get(profile)
+    x264 = prof.x264_args("veryfast", 18)
+    out_args = []
+    if prof.is_draft:
+        dw, dh = prof.size(*(int(v) for v in res.split(":")))
+        out_args = ["-s", f"{dw}x{dh}", "-r", str(prof.frame_rate(scene_fps))]
+
     audio_filt = "loudnorm=I=-16:TP=-1.5:LRA=11,volume=1.2"
     heygen_has_audio = probe_has_audio(heygen)
 
+    # Background input: a ready-made scene file, or (fused) the raw asset + scene chain
+    if scene_out_res and background.exists():
+        bg_inputs, scene_chain = scene_source(background, probe_duration(heygen), scene_out_res, scene_fps)
+        bg_pre, bg_ref = f"[0:v]{scene_chain}[scene];", "[scene]"
+    else:
+        bg_inputs, bg_pre, bg_ref = ["-i", str(background)], "", "[0:v]"
+
     has_key = bool(chroma_key_hex)  # True when chroma is explicitly provided
 
     # Auto-detect chroma if requested (and if not explicitly provided)
@@ -284,7 +374,7 @@ def merge_with_heygen(
             "ffmpeg", "-y",
             "-i", str(heygen),
             "-map", "0:v:0",
-            "-c:v", "libx264", "-crf", "18", "-preset", "veryfast",
+            "-c:v", "libx264", *x264, *out_args,
         ]
         if heygen_has_audio:
             cmd += [
@@ -305,23 +395,24 @@ def merge_with_heygen(
     #   - If background is missing, fall back to office_img as background
     # -----------------------------------------------------------------
     if chroma_key_hex:
-        bg_path = background if background.exists() else Path(office_img)
         if not background.exists():
             print(f"CHROMA: background missing, using office_img as background: {office_img}")
+            bg_inputs = ["-i", office_img]
 
         filt = (
-            f"[0:v]scale={res.replace(':', 'x')}:force_original_aspect_ratio=increase,crop={res}[bg];"
+            bg_pre +
+            f"{bg_ref}scale={res.replace(':', 'x')}:force_original_aspect_ratio=increase,crop={res}[bg];"
             f"[1:v]colorkey={chroma_key_hex}:0.14:0.06,format=rgba,despill=green:0.8[fg];"
             f"[bg][fg]overlay=0:0:format=auto:eof_action=repeat[v]"
         )
 
         cmd = [
             "ffmpeg", "-y",
-            "-i", str(bg_path),
+            *bg_inputs,
             "-i", str(heygen),
             "-filter_complex", filt,
             "-map", "[v]",
-            "-c:v", "libx264", "-crf", "18", "-preset", "veryfast",
+            "-c:v", "libx264", *x264, *out_args,
         ]
         if heygen_has_audio:
             cmd += ["-map", "1:a?", "-af", audio_filt, "-c:a", "aac", "-b:a", "192k"]
@@ -335,17 +426,18 @@ def merge_with_heygen(
     # -----------------------------------------
     if scaled_layout:
         filt = (
-            f"[0:v]scale={content_w_pip}:-1,pad=iw+12:ih+12:6:6:{border_cfg}[pip];"
+            bg_pre +
+            f"{bg_ref}scale={content_w_pip}:-1,pad=iw+12:ih+12:6:6:{border_cfg}[pip];"
             f"[1:v]scale={res}:force_original_aspect_ratio=increase,crop={res}[base];"
             f"[base][pip]overlay={overlay_pos_pip}:format=auto[v]"
         )
         cmd = [
             "ffmpeg", "-y",
-            "-i", str(background),
+            *bg_inputs,
             "-i", str(heygen),
             "-filter_complex", filt,
             "-map", "[v]",
-            "-c:v", "libx264", "-crf", "18", "-preset", "veryfast",
+            "-c:v", "libx264", *x264, *out_args,
         ]
         if heygen_has_audio:
            cmd += ["-map", "1:a?", "-af", audio_filt, "-c:a", "aac", "-b:a", "192k"]
@@ -358,11 +450,11 @@ def merge_with_heygen(
     # Fallback (old behavior)
     cmd = [
         "ffmpeg", "-y",
-        "-i", str(background),
+        *bg_inputs,
         "-i", str(heygen),
-        "-filter_complex", "[0:v][1:v]overlay=0:0:format=auto[v]",
+        "-filter_complex", f"{bg_pre}{bg_ref}[1:v]overlay=0:0:format=auto[v]",
         "-map", "[v]",
-        "-c:v", "libx264", "-crf", "18", "-preset", "veryfast",
+        "-c:v", "libx264", *x264, *out_args,
     ]
     if heygen_has_audio:
         cmd += ["-map", "1:a?", "-af", audio_filt, "-c:a", "aac", "-b:a", "192k"]
@@ -462,7 +554,40 @@ def merge_with_heygen_working(background: Path, heygen: Path, out_path: Path, ch
     ]
     run(cmd)
 
-def render_background_and_merge(timeline_json_path: Path, base_dir: Path, heygen_path: Path, out_dir: Path, out_res: str, out_filename: str | None = None):
+def render_bulk_bg_row(heygen_path: str, bg_asset: str, out_res: str, bg_video: str, final_out: str,
+                       scaled_layout: bool = True, fused: bool = True) -> str:
+    """
+    One heygen_bulk_bg.xlsx row: background scene for the HeyGen duration, then
+    the chroma merge. Top-level with str args so a process pool can run it.
+
+    fused=True builds the scene inside the merge graph (single encode, bg_video
+    is never written); fused=False is the old two-encode path via bg_video.
+    """
+    heygen_path, bg_asset, bg_video, final_out = map(Path, (heygen_path, bg_asset, bg_video, final_out))
+    if not fused:
+        dur = probe_duration(heygen_path)
+        make_scene(asset=bg_asset, duration=dur, out_path=bg_video, out_res=out_res)
+    # captions + avatar remain exactly as HeyGen because we don't scale HeyGen layer
+    merge_with_heygen(
+        background=bg_asset if fused else bg_video,
+        heygen=heygen_path,
+        out_path=final_out,
+        chroma_key_hex=None,  # <-- let the script decide
+        scaled_layout=scaled_layout,
+        auto_detect_chroma=True,
+        chroma_detect_hex="0x00FF00",
+        chroma_ratio_threshold=0.12,
+        scene_out_res=out_res if fused else None,
+    )
+    return str(final_out)
+
+def render_background_and_merge(timeline_json_path: Path, base_dir: Path, heygen_path: Path, out_dir: Path, out_res: str, out_filename: str | None = None,
+                                render_profile=None):
+    # Draft: scenes at the draft size / fps with fast x264; the merge scales its output
+    prof = encoding_profile.get(render_profile)
+    scene_res = prof.res(out_res)
+    scene_fps = prof.frame_rate(30)
+
     tl = json.loads(timeline_json_path.read_text(encoding="utf-8"))
     blocks = tl.get("blocks", [])
     if not blocks:
@@ -483,7 +608,7 @@ def render_background_and_merge(timeline_json_path: Path, base_dir: Path, heygen
             raise FileNotFoundError(f"Missing asset: {asset}")
 
         out_scene = work_dir / f"scene_{i:03d}.mp4"
-        make_scene(asset=asset, duration=dur, out_path=out_scene, out_res=out_res)
+        make_scene(asset=asset, duration=dur, out_path=out_scene, out_res=scene_res, fps=scene_fps, profile=prof)
         scenes.append(out_scene)
 
     background = out_dir / "background.mp4"
@@ -507,5 +632,7 @@ def render_background_and_merge(timeline_json_path: Path, base_dir: Path, heygen
         out_path=final_out,
         chroma_key_hex=chroma_key,
         auto_detect_chroma=True,
+        scene_fps=scene_fps,
+        profile=prof,
     )
     return final_out
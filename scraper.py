@@ -12,6 +12,11 @@ from add_avatar import create_avatar_video
 from audio_video_processor import create_video, resize_and_crop_image
 from caption_generator import add_captions, extract_audio, prepare_file_for_adding_captions_n_headings_thru_html
 from effects import create_camera_movement_clip
+from camera_ffmpeg import render_camera_movement
+from story_segments import render_story
+import encoding_profile
+import media_probe
+from PIL import Image
 from settings import sizes, background_music_options, font_settings
 from tkinter import messagebox
 import re
@@ -35,6 +40,12 @@ word_timestamps = []
 # Fetch word timestamps from the Flask server
 import requests
 
+# Story renderer: "ffmpeg" renders each image/video segment natively on a process
+# pool and stream-copies them together (story_segments.py); "moviepy" is the
+# original single write_videofile path, kept for parity checks and used for avatars
+# (there, image camera movements still go through camera_ffmpeg unless "moviepy")
+CAMERA_BACKEND = os.getenv("CAMERA_BACKEND", "ffmpeg").lower()
+
 
 def clear_folders(notebooklm="no"):
     shutil.rmtree("audios", ignore_errors=True)
@@ -81,7 +92,8 @@ def is_server_running(script_name="server.py"):
     return False
 
 def scrape_and_process(urls, excel_var, selected_size, selected_music, max_words, fontsize, y_pos, caption_style, 
-                       selected_voice, language, gender, tts_engine, skip_puppeteer, skip_captions, pitch_age_group, disable_subscribe, notebooklm="no"):
+                       selected_voice, language, gender, tts_engine, skip_puppeteer, skip_captions, pitch_age_group, disable_subscribe, notebooklm="no",
+                       render_profile=None):
 
     print("scrape_and_process - Received scrape_and_process Arguments:", locals())
 
@@ -148,7 +160,7 @@ def scrape_and_process(urls, excel_var, selected_size, selected_music, max_words
                         shorts_html = metadata.get("shorts_html", "")
 
                         start = time.time()
-                        create_video_using_camera_frames(section_elements, "composed_video.mp4", language, gender, tts_engine, target_size,base_file_name,avatar,pitch_age_group, notebooklm, title)
+                        create_video_using_camera_frames(section_elements, "composed_video.mp4", language, gender, tts_engine, target_size,base_file_name,avatar,pitch_age_group, notebooklm, title, render_profile=render_profile)
                         print(f"[{time.strftime('%H:%M:%S')}] Step create_video_using_camera_frames completed in {time.time() - start:.2f} seconds")
                         start = time.time()
 
@@ -317,7 +329,7 @@ def scrape_and_process(urls, excel_var, selected_size, selected_music, max_words
                 results = elements
                 
                 start = time.time() 
-                create_video_using_camera_frames(results, "composed_video.mp4", language, gender, tts_engine, target_size,base_file_name,avatar="", pitch_age_group=pitch_age_group, notebooklm=notebooklm, title=title)
+                create_video_using_camera_frames(results, "composed_video.mp4", language, gender, tts_engine, target_size,base_file_name,avatar="", pitch_age_group=pitch_age_group, notebooklm=notebooklm, title=title, render_profile=render_profile)
                 print(f"[{time.strftime('%H:%M:%S')}] Step create_video_using_camera_frames completed in {time.time() - start:.2f} seconds")
                 start = time.time()                
                 output_file = "composed_video.mp4"
@@ -451,20 +463,256 @@ def scrape_and_process(urls, excel_var, selected_size, selected_music, max_words
             df.to_excel(input_excel_file, index=False)
 
 
-def create_video_using_camera_frames(elements, output_path, language="english", gender="Female", tts_engine="google", target_resolution = (1920, 1080),base_file_name="output_video", avatar="", pitch_age_group="adult", notebooklm="no", title="title_to_match_audio"):
+def text_element_audio(element, language, gender, tts_engine, pitch_age_group, title):
+    """
+    Narration for a text element: the story's pre-made ready_audio/<title>.wav/.mp3
+    if present, otherwise TTS of the element text. Returns an audio path or None.
+    """
+    READY_AUDIO_DIR = "ready_audio"
+    base_audio_name = title
+    mp3_path = os.path.join(READY_AUDIO_DIR, f"{base_audio_name}.mp3")
+    wav_path = os.path.join(READY_AUDIO_DIR, f"{base_audio_name}.wav")
+
+    if os.path.exists(wav_path):
+        # Use wav directly
+        print(f"Using pre-existing WAV audio: {wav_path}")
+        return wav_path
+
+    if os.path.exists(mp3_path):
+        # Convert MP3 to WAV and use it
+        print(f"Converting MP3 to WAV: {mp3_path}")
+        sound = AudioSegment.from_mp3(mp3_path)
+        converted_wav = NamedTemporaryFile(delete=False, suffix=".wav").name
+        sound.export(converted_wav, format="wav")
+        return converted_wav
+
+    tts_audio_path = NamedTemporaryFile(delete=False, suffix=".mp3").name
+    generated_audio = None
+
+    if tts_engine == "google":
+        if (language == "english-india"):
+            languageType = "neural"
+        else:
+            languageType = "journey"
+
+        generated_audio = get_audio_file(element["text"], tts_audio_path,"google",language,gender, languageType, pitch_age_group)
+    elif tts_engine == "amazon":
+        generated_audio = get_audio_file(element["text"], tts_audio_path,"amazon",language,gender, "generative")
+
+    return tts_audio_path if generated_audio else None
+
+
+def effect_element_audio(element):
+    """Sound effect of an audio element, trimmed/looped to its duration and volume-adjusted. Returns an mp3 path."""
+    # Add sound effect
+    local_audio_path = download_file(element["audio"]["src"])
+    sound_effect = AudioSegment.from_file(local_audio_path)
+
+    # Trim or extend the sound effect to match duration
+    duration_ms = int(float(element["audio"]["duration"]) * 1000)
+    if len(sound_effect) > duration_ms:
+        sound_effect = sound_effect[:duration_ms]
+    else:
+        sound_effect = sound_effect * (duration_ms // len(sound_effect) + 1)
+        sound_effect = sound_effect[:duration_ms]
+
+    # Adjust volume
+    volume_adjustment = int(element["audio"]["volume"]) - 100
+
+    # Clamp excessive decreases
+    if volume_adjustment < -45:
+        volume_adjustment = -45
+
+    # Clamp excessive increases
+    if volume_adjustment > 100:
+        volume_adjustment = 100
+
+    # Apply adjustment with threshold check
+    if sound_effect.dBFS + volume_adjustment < -50:
+        volume_adjustment = -50 - sound_effect.dBFS
+
+    sound_effect = sound_effect + volume_adjustment
+
+    #DND- Normalize (optional)
+    #target_dBFS = -20.0
+    #sound_effect = sound_effect.apply_gain(target_dBFS - sound_effect.dBFS)
+
+    # Save to temp file
+    effect_audio_path = NamedTemporaryFile(delete=False, suffix=".mp3").name
+    sound_effect.export(effect_audio_path, format="mp3")
+
+    # Clean up the downloaded file
+    os.remove(local_audio_path)
+    return effect_audio_path
+
+
+def camera_frames_in_pixels(element, actual_width):
+    """Start/end camera rectangles of an image element, from page CSS px to image pixels."""
+    styled_width = 400  # Example styled width from the webpage
+    scale_x = actual_width / styled_width
+
+    def to_pixels(frame):
+        return {
+            k: int(float(v[:-2]) * scale_x) if isinstance(v, str) and v.endswith("px") else int(float(v) * scale_x)
+            for k, v in frame.items()
+        }
+
+    if element["camera_movement"]:
+        return to_pixels(element["camera_movement"]["start_frame"]), to_pixels(element["camera_movement"]["end_frame"])
+    start_frame = to_pixels(element["camera_frame"])
+    return start_frame, start_frame
+
+
+def story_uses_avatar(elements, avatar=""):
+    return avatar != "" or any(e.get("avatar_flag") == "y" for e in elements if e["type"] in ("image", "video"))
+
+
+def _take_audio(parts, seconds):
+    """Split [[path, offset, duration], ...] into the first `seconds` and the rest."""
+    taken, rest, left = [], [], seconds
+    for path, offset, dur in parts:
+        if left <= 1e-6:
+            rest.append([path, offset, dur])
+        elif dur <= left:
+            taken.append([path, offset, dur])
+            left -= dur
+        else:
+            taken.append([path, offset, left])
+            rest.append([path, offset + left, dur - left])
+            left = 0
+    return taken, rest
+
+
+def plan_story_segments(elements, language="english", gender="Female", tts_engine="google", target_resolution=(1920, 1080),
+                        pitch_age_group="adult", notebooklm="no", title="title_to_match_audio", fps=24):
+    """
+    Segment specs (see story_segments.py) for the ffmpeg renderer, with the same
+    timing rules as the MoviePy loop in create_video_using_camera_frames: text and
+    sound-effect audio accumulates until the next image/video element, which plays
+    over it; audio left over after a (non-looping) video carries on to the next one.
+    """
+    width, height = target_resolution
+    silent = notebooklm == "yes"
+    specs = []
+    pending = []  # [[audio path, offset, duration], ...] not yet placed under a picture
+
+    for idx, element in enumerate(elements):
+        print(f"Planning element {idx}: {element}")
+
+        if element["type"] == "text":
+            try:
+                if notebooklm == "no":
+                    narration_path = text_element_audio(element, language, gender, tts_engine, pitch_age_group, title)
+                    narration_duration = media_probe.duration(narration_path) if narration_path else None
+                    if narration_duration:
+                        pending.append([narration_path, 0.0, narration_duration])
+            except Exception as e:
+                print(f"Error processing text: {e}")
+
+        elif element["type"] == "audio":
+            try:
+                effect_path = effect_element_audio(element)
+                effect_duration = media_probe.duration(effect_path)
+                if effect_duration:
+                    pending.append([effect_path, 0.0, effect_duration])
+            except Exception as e:
+                print(f"Error processing audio: {e}")
+
+        elif element["type"] == "video":
+            try:
+                local_video_flag = element.get("local_video_flag", "n")  # Default is 'n'
+                if local_video_flag == 'y':
+                    video_path = element["video"]  # Treat it as local file path
+                else:
+                    video_path = download_file(element["video"])
+
+                clip_duration = media_probe.duration(video_path) or 0.0
+                target_duration = sum(p[2] for p in pending)
+                vid_duration = element.get("vid_duration")
+                if vid_duration:
+                    try:
+                        target_duration = max(target_duration, float(vid_duration))
+                    except ValueError:
+                        print(f"Warning: Unable to convert vid_duration ('{vid_duration}') to float. Skipping.")
+
+                loop = (local_video_flag == 'y' or element.get("loop_video", "n") == 'y') and clip_duration < target_duration
+                duration = target_duration if loop else min(clip_duration, target_duration)
+                segment_audio, pending = _take_audio(pending, duration)
+                specs.append({
+                    "kind": "video", "source": video_path, "duration": duration, "loop": loop,
+                    "audio": segment_audio, "silent": silent, "width": width, "height": height, "fps": fps,
+                    "element": idx,
+                })
+            except Exception as e:
+                print(f"Error processing video: {e}")
+                traceback.print_exc()
+
+        elif element["type"] == "image":
+            try:
+                if notebooklm == "no" and not pending:
+                    print("No audio clips available. Skipping image processing.")
+                    continue
+
+                image_path = element["image"]
+                if image_path.startswith("http://") or image_path.startswith("https://"):
+                    image_path = download_file(image_path, "temp_images")
+                with Image.open(image_path) as im:
+                    actual_width = im.size[0]
+
+                duration = sum(p[2] for p in pending) if pending else 3
+                img_duration = element["img_duration"]
+                if img_duration:
+                    try:
+                        duration = max(duration, float(img_duration))
+                    except ValueError:
+                        print(f"Warning: Unable to convert img_duration ('{img_duration}') to float. Skipping.")
+
+                img_animation = element["img_animation"]
+                if img_animation is None:
+                    img_animation = 'Zoom In'
+
+                start_frame, end_frame = camera_frames_in_pixels(element, actual_width)
+                segment_audio, _ = _take_audio(pending, duration)
+                pending = []  # audio beyond the image is dropped, as in the MoviePy path
+                specs.append({
+                    "kind": "image", "source": image_path, "duration": duration,
+                    "start_frame": start_frame, "end_frame": end_frame,
+                    "img_animation": img_animation, "movement_percentage": 70,
+                    "audio": segment_audio, "silent": silent, "width": width, "height": height, "fps": fps,
+                    "element": idx,
+                })
+            except Exception as e:
+                print(f"Error processing image: {e}")
+                traceback.print_exc()
+
+    return specs
+
+
+def create_video_using_camera_frames(elements, output_path, language="english", gender="Female", tts_engine="google", target_resolution = (1920, 1080),base_file_name="output_video", avatar="", pitch_age_group="adult", notebooklm="no", title="title_to_match_audio", render_profile=None):
     """
     Creates a video using the scrapped elements.
 
     Args:
         elements (list[dict]): Scrapped elements containing text, audio, and image data.
         output_path (str): Path to save the final video.
+        render_profile (str): "final" / "draft" (encoding_profile.py); None -> RENDER_PROFILE.
     """
 
     print("Received create_video_using_camera_frames Arguments:", locals())
 
+    if CAMERA_BACKEND == "ffmpeg" and not story_uses_avatar(elements, avatar):
+        specs = plan_story_segments(elements, language, gender, tts_engine, target_resolution, pitch_age_group, notebooklm, title)
+        story_audio = "audio.wav" if notebooklm == "yes" and os.path.exists("audio.wav") else None
+        try:
+            render_story(specs, output_path, audio_path=story_audio, profile=render_profile)
+            return
+        except Exception as e:
+            print(f"ffmpeg story render failed, falling back to MoviePy: {e}")
+            traceback.print_exc()
+
     video_clips = []
     audio_clips = []
-    READY_AUDIO_DIR = "ready_audio"
+    segment_paths = []  # ffmpeg camera renders, removed once the final video is written
     #last_image_clip = None
     #target_resolution = (1920, 1080)  # Define the desired full frame resolution
 
@@ -483,90 +731,17 @@ def create_video_using_camera_frames(elements, output_path, language="english",
         if element["type"] == "text":
             try:
                 if notebooklm == "no":
-
-                    base_audio_name = title
-                    mp3_path = os.path.join(READY_AUDIO_DIR, f"{base_audio_name}.mp3")
-                    wav_path = os.path.join(READY_AUDIO_DIR, f"{base_audio_name}.wav")
-
-                    if os.path.exists(wav_path):
-                        # Use wav directly
-                        print(f"Using pre-existing WAV audio: {wav_path}")
-                        tts_audio = AudioFileClip(wav_path)
-                        audio_clips.append(tts_audio)
-
-                    elif os.path.exists(mp3_path):
-                        # Convert MP3 to WAV and use it
-                        print(f"Converting MP3 to WAV: {mp3_path}")
-                        sound = AudioSegment.from_mp3(mp3_path)
-                        converted_wav = NamedTemporaryFile(delete=False, suffix=".wav").name
-                        sound.export(converted_wav, format="wav")
-                        tts_audio = AudioFileClip(converted_wav)
-                        audio_clips.append(tts_audio)
-                    else:
-
-                        tts_audio_path = NamedTemporaryFile(delete=False, suffix=".mp3").name
-                        
-
-                        if tts_engine == "google":
-                            if (language == "english-india"):
-                                languageType = "neural"
-                            else:
-                                languageType = "journey"
-
-                            generated_audio = get_audio_file(element["text"], tts_audio_path,"google",language,gender, languageType, pitch_age_group)
-                        elif tts_engine == "amazon":
-                            generated_audio = get_audio_file(element["text"], tts_audio_path,"amazon",language,gender, "generative")
-                        
-                        if generated_audio:
-                            tts_audio = AudioFileClip(tts_audio_path)
-                            audio_clips.append(tts_audio)
+                    narration_path = text_element_audio(element, language, gender, tts_engine, pitch_age_group, title)
+                    if narration_path:
+                        audio_clips.append(AudioFileClip(narration_path))
 
             except Exception as e:
                 print(f"Error processing text: {e}")
 
         elif element["type"] == "audio":
             try:
-                # Add sound effect
-                local_audio_path = download_file(element["audio"]["src"])
-                sound_effect = AudioSegment.from_file(local_audio_path)
-
-                # Trim or extend the sound effect to match duration
-                duration_ms = int(float(element["audio"]["duration"]) * 1000)
-                if len(sound_effect) > duration_ms:
-                    sound_effect = sound_effect[:duration_ms]
-                else:
-                    sound_effect = sound_effect * (duration_ms // len(sound_effect) + 1)
-                    sound_effect = sound_effect[:duration_ms]
-
-                # Adjust volume
-                volume_adjustment = int(element["audio"]["volume"]) - 100
-
-                # Clamp excessive decreases
-                if volume_adjustment < -45:
-                    volume_adjustment = -45
-
-                # Clamp excessive increases
-                if volume_adjustment > 100:
-                    volume_adjustment = 100
-
-                # Apply adjustment with threshold check
-                if sound_effect.dBFS + volume_adjustment < -50:
-                    volume_adjustment = -50 - sound_effect.dBFS
-
-                sound_effect = sound_effect + volume_adjustment
-
-                #DND- Normalize (optional)
-                #target_dBFS = -20.0
-                #sound_effect = sound_effect.apply_gain(target_dBFS - sound_effect.dBFS)
-
-                # Save to temp file and load as AudioFileClip
-                effect_audio_path = NamedTemporaryFile(delete=False, suffix=".mp3").name
-                sound_effect.export(effect_audio_path, format="mp3")
-                effect_audio_clip = AudioFileClip(effect_audio_path)
+                effect_audio_clip = AudioFileClip(effect_element_audio(element))
                 audio_clips.append(effect_audio_clip)
-
-                # Clean up the downloaded file
-                os.remove(local_audio_path)
             except Exception as e:
                 print(f"Error processing audio: {e}")
 
@@ -681,27 +856,9 @@ def create_video_using_camera_frames(elements, output_path, language="english",
                 print(f"Error getting image dimensions: {e}. Falling back to landscape.")
                 actual_width, actual_height = 1920, 1080  # Fallback to default
 
-            styled_width = 400  # Example styled width from the webpage
-            scale_x = actual_width / styled_width
-
             duration = sum([clip.duration for clip in audio_clips]) if audio_clips else 3
 
-            if element["camera_movement"]:
-
-                start_frame = {
-                    k: int(float(v[:-2]) * scale_x) if isinstance(v, str) and v.endswith("px") else int(float(v) * scale_x)
-                    for k, v in element["camera_movement"]["start_frame"].items()
-                }
-                end_frame = {
-                    k: int(float(v[:-2]) * scale_x) if isinstance(v, str) and v.endswith("px") else int(float(v) * scale_x)
-                    for k, v in element["camera_movement"]["end_frame"].items()
-                }
-            else:
-                start_frame = {
-                    k: int(float(v[:-2]) * scale_x) if isinstance(v, str) and v.endswith("px") else int(float(v) * scale_x)
-                    for k, v in element["camera_frame"].items()
-                }
-                end_frame = start_frame
+            start_frame, end_frame = camera_frames_in_pixels(element, actual_width)
 
             # DND - Working Code
             #output_file_name = f"output_{element_id}.mp4"
@@ -733,19 +890,47 @@ def create_video_using_camera_frames(elements, output_path, language="english",
             if img_animation is None:  # Only set a default if img_animation is None
                 img_animation = 'Zoom In'
 
-            video_clip = create_camera_movement_clip(
-                element['image'], 
-                start_frame, 
-                end_frame, 
-                duration = duration,
-                fps=24,
-                movement_percentage=70,
-                img_animation = img_animation,
-                target_resolution = target_resolution
-            )
-
-            # Resize the image-based video clip to the target resolution
-            video_clip = resize(video_clip, newsize=target_resolution)
+            video_clip = None
+            if CAMERA_BACKEND == "ffmpeg":
+                # Render the movement natively, already at target_resolution
+                try:
+                    segment_path = NamedTemporaryFile(delete=False, suffix=".mp4").name
+                    segment_paths.append(segment_path)
+                    render_camera_movement(
+                        element['image'],
+                        start_frame,
+                        end_frame,
+                        segment_path,
+                        duration = duration,
+                        fps=24,
+                        movement_percentage=70,
+                        img_animation = img_animation,
+                        target_resolution = target_resolution
+                    )
+                    video_clip = VideoFileClip(segment_path)
+                except Exception as e:
+                    print(f"ffmpeg camera movement failed, falling back to MoviePy: {e}")
+                    video_clip = None
+                    segment_paths.remove(segment_path)
+                    try:
+                        os.remove(segment_path)
+                    except OSError:
+                        pass
+
+            if video_clip is None:
+                video_clip = create_camera_movement_clip(
+                    element['image'], 
+                    start_frame, 
+                    end_frame, 
+                    duration = duration,
+                    fps=24,
+                    movement_percentage=70,
+                    img_animation = img_animation,
+                    target_resolution = target_resolution
+                )
+
+                # Resize the image-based video clip to the target resolution
+                video_clip = resize(video_clip, newsize=target_resolution)
 
             # Ensure all elements in audio_clips are AudioFileClip objects
             # audio_clips_loaded = [
@@ -780,6 +965,7 @@ def create_video_using_camera_frames(elements, output_path, language="english",
                 if avatar == "":
                     avatar = gender
                 video_with_audio  = create_avatar_video(temp_output_path, avatar)
+                video_clip.close()  # written out above; release its (temp segment) reader
             
             video_clips.append(video_with_audio)
 
@@ -815,11 +1001,18 @@ def create_video_using_camera_frames(elements, output_path, language="english",
     # else:
     #     print("Warning: No audio found in video clips. Final video will be silent.")
 
-    final_video.write_videofile(output_path, fps=24)
+    # Avatar (MoviePy) path: the draft profile only lowers fps / x264 preset here
+    prof = encoding_profile.get(render_profile)
+    final_video.write_videofile(output_path, fps=prof.frame_rate(24), preset=prof.x264("medium")[0])
 
     # Cleanup resources
     for clip in video_clips:
         clip.close()
+    for path in segment_paths:
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Could not remove temp segment {path}: {e}")
 
 def download_file(url, temp_dir="temp_audio"):
     """
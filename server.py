@@ -1,7 +1,7 @@
 import shutil
 from time import time
 from flask import Flask, request, jsonify, render_template, send_from_directory, abort, url_for
-import subprocess, json, math
+import subprocess, json
 from flask_cors import CORS
 import os
 import traceback
@@ -10,11 +10,17 @@ import contentplanner_worker as cpw
 import openpyxl  # to print detailed error info
 from build_coloring_app_manifest import build_coloring_manifest
 from caption_generator import prepare_captions_file_for_notebooklm_audio
+from whisper_registry import warm_up_whisper_models
+import bg_proxy
+import media_index
+import media_probe
+import tts_cache
+from job_queue import JobQueue, add_output, is_resumed, report_progress
 from facebook_uploader import upload_facebook_videos
 from get_audio import get_audio_file
 from instagram_uploader import upload_instagram_posts
 from pinterest_uploader import upload_pins
-from scene_builder import render_background_and_merge
+from scene_builder import render_background_and_merge, render_bulk_bg_row
 from scraper import scrape_and_process  # Ensure this exists
 from settings import background_music_options, font_settings, tts_engine, voices, sizes
 from tiktok_uploader import upload_tiktok_videos
@@ -39,10 +45,11 @@ import sys
 from pdf2image import convert_from_path
 import glob
 import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from coloring_animation import _create_coloring_animation, _create_coloring_animation_by_color
 from sketch_core import build_sketch_from_pil
 from PIL import Image
-from scene_builder import probe_duration, make_scene, merge_with_heygen
+from scene_builder import probe_duration
 from assemble_from_videos import assemble_videos, assemble_videos_by_titles_if_present
 
 from media_audio import (
@@ -64,6 +71,7 @@ def _ensure_ffmpeg():
 app = Flask(__name__, template_folder='templates')
 app.register_blueprint(quiz_bp)  # all quiz endpoints live under /api/quiz
 CORS(app)
+jobs = JobQueue(app)  # background jobs for long ffmpeg routes, polled via /jobs/<id>
 
 # Always resolve relative to this file (server.py)
 BASE_DIR = Path(__file__).resolve().parent
@@ -237,6 +245,7 @@ def _resolve_path(p: str) -> Path:
     return pp if pp.is_absolute() else (BASE_DIR / pp).resolve()
 
 @app.post("/render_bulk_bg")
+@jobs.job("render_bulk_bg")
 def render_bulk_bg(orientation="", scale_bg="yes", copy_as_is=True):
     """
     Reads BASE_DIR/heygen_bulk_bg.xlsx with columns:
@@ -246,7 +255,12 @@ def render_bulk_bg(orientation="", scale_bg="yes", copy_as_is=True):
     For each row:
       1) Create background video matching HeyGen duration
       2) Chroma-key merge (keeps HeyGen captions + avatar bubble untouched/unaltered)
-      3) Output filename defaults to ORIGINAL HeyGen filename (same name) in OUT_DIR
+      3) Output filename defaults to ORIGINAL HeyGen filename (same name) in OUT_DIR;
+         later rows reusing a HeyGen file name get a __r<row> suffix
+
+    Rows are rendered on a process pool (BULK_BG_WORKERS, default cpu_count // 4) and
+    status cells are saved every BULK_BG_COMMIT_EVERY rows (default 5) and at the end.
+    Rows whose status is already "success" are skipped, so a re-run resumes.
     """
     try:
         excel_path = (BASE_DIR / "heygen_bulk_bg.xlsx").resolve()
@@ -290,12 +304,43 @@ def render_bulk_bg(orientation="", scale_bg="yes", copy_as_is=True):
             status_col = headers["status"]
 
 
+        # Status cells are committed in batches instead of a full workbook save per row
+        commit_every = max(1, int(os.getenv("BULK_BG_COMMIT_EVERY", "5")))
+        pending_status = {}
+
+        def set_status(row, value, force=False):
+            pending_status[row] = value
+            if force or len(pending_status) >= commit_every:
+                commit_status()
+
+        def commit_status():
+            if not pending_status:
+                return
+            for row, value in pending_status.items():
+                ws.cell(row=row, column=status_col).value = value
+            wb.save(excel_path)
+            pending_status.clear()
+
+        # Rows run in parallel, so each needs its own output file
+        used_outputs = set()
+
+        def output_for(r, heygen_path):
+            out = (OUT_DIR / f"{heygen_path.stem}{heygen_path.suffix}").resolve()
+            if out in used_outputs:
+                out = (OUT_DIR / f"{heygen_path.stem}__r{r}{heygen_path.suffix}").resolve()
+            used_outputs.add(out)
+            return out
+
+        # Pass 1 (cheap, in order): skip/validate/copy rows, collect renders
         results = []
+        tasks = []   # (row, heygen_path, bg_asset, bg_video, final_out)
         for r in range(2, ws.max_row + 1):
             heygen_raw = ws.cell(r, headers["heygen_video"]).value
             bg_raw = ws.cell(r, headers["bg"]).value
 
             status_val = ws.cell(r, status_col).value
+            if heygen_raw and str(status_val or "").strip().lower() in ("success", "success (copied as is)"):
+                output_for(r, _resolve_path(str(heygen_raw)))  # keep its name taken, as in the earlier run
             if status_val and str(status_val).strip().lower() == "success":
                 results.append({
                     "row": r,
@@ -321,23 +366,19 @@ def render_bulk_bg(orientation="", scale_bg="yes", copy_as_is=True):
 
             if not heygen_path.exists():
                 results.append({"row": r, "ok": False, "error": f"HeyGen not found: {heygen_path}"})
-                ws.cell(row=r, column=status_col).value = "HeyGen video not found"
-                wb.save(excel_path)   # ✅ save immediately (important)
+                set_status(r, "HeyGen video not found")
                 continue
 
             if not bg_raw:
                 if not copy_as_is:
                     results.append({"row": r, "ok": False, "error": f"BG not found: {bg_raw}"})
-                    ws.cell(row=r, column=status_col).value = "BG asset not found"
-                    wb.save(excel_path)   # ✅ save immediately (important)
+                    set_status(r, "BG asset not found")
                     continue
                 else:
-                    bg_asset = None
-                    # copy HeyGen as is 
-                    final_out = (OUT_DIR / f"{heygen_path.stem}{heygen_path.suffix}").resolve()
+                    # copy HeyGen as is
+                    final_out = output_for(r, heygen_path)
                     shutil.copy2(heygen_path, final_out)
-                    ws.cell(row=r, column=status_col).value = "success (copied as is)"
-                    wb.save(excel_path)   # ✅ save immediately (important)
+                    set_status(r, "success (copied as is)")
                     continue
 
             bg_asset = _resolve_path(str(bg_raw))
@@ -347,57 +388,61 @@ def render_bulk_bg(orientation="", scale_bg="yes", copy_as_is=True):
                 if png_fallback.exists():
                     bg_asset = png_fallback  # use the png instead
 
-
             if not bg_asset.exists():
                 results.append({"row": r, "ok": False, "error": f"BG not found: {bg_asset}"})
-                ws.cell(row=r, column=status_col).value = "BG asset not found"
-                wb.save(excel_path)   # ✅ save immediately (important)
+                set_status(r, "BG asset not found")
                 continue
 
-            # 1) duration = HeyGen duration
-            dur = probe_duration(heygen_path)
-
-            # 2) build one full background clip (image loops / video holds last frame)
-            # If work_dir exists then clean it up first
-
-            work_dir = (OUT_DIR / "bulk_work").resolve()
-            # if work_dir.exists():
-            #     shutil.rmtree(work_dir)
-
-            work_dir.mkdir(exist_ok=True)
-
-
-
-            bg_video = work_dir / f"{_safe_name(heygen_path.stem)}__bg.mp4"
-
-            make_scene(asset=bg_asset, duration=dur, out_path=bg_video, out_res=out_res)
-
-            # 3) output file name = same as original HeyGen file name, but written under OUT_DIR
-            final_out = (OUT_DIR / f"{heygen_path.stem}{heygen_path.suffix}").resolve()
-
-            # merge: captions + avatar remain exactly as HeyGen because we don't scale HeyGen layer
-
-            merge_with_heygen(
-                background=bg_video,
-                heygen=heygen_path,
-                out_path=final_out,
-                chroma_key_hex=None,  # <-- let the script decide
-                scaled_layout=(scale_bg.lower() != "no"),
-                auto_detect_chroma=True,
-                chroma_detect_hex="0x00FF00",
-                chroma_ratio_threshold=0.12,
-            )
-
-            ws.cell(row=r, column=status_col).value = "success"
-            wb.save(excel_path)   # ✅ save immediately (important)
-
-            results.append({
-                "row": r,
-                "ok": True,
-                "heygen": str(heygen_path),
-                "bg": str(bg_asset),
-                "output": str(final_out)
-            })
+            work_dir.mkdir(parents=True, exist_ok=True)  # only written by the non-fused path
+            # row number keeps parallel renders of same-named clips apart
+            bg_video = work_dir / f"{_safe_name(heygen_path.stem)}__r{r}__bg.mp4"
+
+            # output file name = same as original HeyGen file name, but written under OUT_DIR
+            final_out = output_for(r, heygen_path)
+            tasks.append((r, heygen_path, bg_asset, bg_video, final_out))
+
+        # Pass 2: background + chroma merge per row on a bounded process pool
+        workers = int(os.getenv("BULK_BG_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // 4)
+        workers = max(1, min(workers, len(tasks) or 1))
+        # Fused: background scene built inside the merge graph (one encode, no __bg.mp4)
+        fused = os.getenv("BULK_BG_FUSED", "1") != "0"
+        print(f"[bulk_bg] {len(tasks)} row(s) to render with {workers} worker(s)")
+        t_start = time()
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(
+                        render_bulk_bg_row,
+                        str(heygen_path), str(bg_asset), out_res, str(bg_video), str(final_out),
+                        scale_bg.lower() != "no",
+                        fused,
+                    ): (r, heygen_path, bg_asset, final_out)
+                    for r, heygen_path, bg_asset, bg_video, final_out in tasks
+                }
+                for done, fut in enumerate(as_completed(futures), start=1):
+                    r, heygen_path, bg_asset, final_out = futures[fut]
+                    try:
+                        fut.result()
+                    except Exception as e:
+                        print(f"[bulk_bg] row {r} failed: {e}")
+                        results.append({"row": r, "ok": False, "error": str(e)})
+                        set_status(r, f"error: {e}")
+                    else:
+                        results.append({
+                            "row": r,
+                            "ok": True,
+                            "heygen": str(heygen_path),
+                            "bg": str(bg_asset),
+                            "output": str(final_out)
+                        })
+                        set_status(r, "success")
+                        add_output(final_out)
+                    report_progress(done, len(tasks), f"row {r}")
+        finally:
+            # checkpoint whatever finished, even if the batch is interrupted
+            commit_status()
+        print(f"[bulk_bg] rendered {len(tasks)} row(s) in {time() - t_start:.1f}s")
+        results.sort(key=lambda x: x["row"])
 
         wb.close()
         # return jsonify({"ok": True, "count": len(results), "results": results})
@@ -442,6 +487,7 @@ def render():
             out_dir=OUT_DIR,
             out_res=out_res,
             out_filename=f"{orig_name}{orig_ext}",   # ✅ NEW
+            render_profile=request.form.get("render_profile"),
         )
         return jsonify({"output": str(output_path)})
     except Exception as e:
@@ -507,6 +553,7 @@ def api_coloring_animation():
       - duration: optional, default 4.0 seconds
       - canvas_preset: "none" | "shorts" | "pinterest" | "custom"
       - canvas_width, canvas_height: used when canvas_preset == "custom"
+      - frame_sink: optional, "pipe" (default) or "png" (debug: encode via PNG frames)
 
     Returns JSON:
       {
@@ -574,7 +621,9 @@ def api_coloring_animation():
     out_name = unique_name.rsplit(".", 1)[0] + "_anim.mp4"
     output_path = out_dir / out_name
     mode = (form.get("mode") or "sweep").lower()
-
+    frame_sink = (form.get("frame_sink") or "pipe").lower()
+    if frame_sink not in ("pipe", "png"):
+        return jsonify({"ok": False, "error": "Invalid frame_sink"}), 400
 
     try:
         if mode == "by_color":
@@ -588,6 +637,7 @@ def api_coloring_animation():
                 hold_end_sec=1.2,
                 target_size=target_size,
                 bg_color=(255, 255, 255),
+                frame_sink=frame_sink,
             )
         else:
             _create_coloring_animation(
@@ -597,6 +647,7 @@ def api_coloring_animation():
                 duration_sec=duration,
                 target_size=target_size,
                 bg_color=(255, 255, 255),
+                frame_sink=frame_sink,
             )
     except Exception as e:
         traceback.print_exc()
@@ -937,6 +988,7 @@ def create_videos():
 
 # ---- ADD this route (server.py) ----
 @app.post("/upscale")
+@jobs.job("upscale")
 def upscale_all_videos():
     """
     Batch-only: loop over all videos in 'edit_vid_input/' and upscale each one.
@@ -985,25 +1037,25 @@ def upscale_all_videos():
         filter_str = ",".join(vf)
 
         def has_audio_stream(path: Path) -> bool:
-            try:
-                # returns 0 if at least one audio stream is present
-                subprocess.check_call(
-                    ["ffprobe", "-v", "error", "-select_streams", "a",
-                     "-show_entries", "stream=index",
-                     "-of", "csv=p=0", str(path)],
-                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-                )
-                return True
-            except subprocess.CalledProcessError:
-                return False
+            return media_probe.has_audio(path)
 
         results, errors = [], []
 
-        for src in inputs:
+        for i, src in enumerate(inputs):
+            report_progress(i, len(inputs), src.name)
             try:
                 dst_name = f"{src.stem}_upscaled_{width}w.mp4"
                 dst_path = out_dir / dst_name
 
+                # Resumed job: keep outputs a previous run already finished
+                if is_resumed() and dst_path.exists() and media_probe.try_probe(dst_path):
+                    results.append({
+                        "input":  str(src.relative_to(base_dir)),
+                        "output": f"/video/edit_vid_output/{dst_name}",
+                        "kept_audio": keep_audio_req and has_audio_stream(src)
+                    })
+                    continue
+
                 include_audio = keep_audio_req and has_audio_stream(src)
 
                 cmd = [
@@ -1026,6 +1078,7 @@ def upscale_all_videos():
                     "output": f"/video/edit_vid_output/{dst_name}",
                     "kept_audio": include_audio
                 })
+                add_output(f"/video/edit_vid_output/{dst_name}")
             except subprocess.CalledProcessError as e:
                 errors.append({
                     "input": str(src.relative_to(base_dir)),
@@ -1271,6 +1324,16 @@ def ai_keys():
     """Quick peek at rotation state (helpful in logs/dashboards)."""
     return jsonify({"ok": True, "stats": gemini_pool.stats()})
 
+@app.get("/tts/cache/stats")
+def tts_cache_stats():
+    """Hit/miss counters and size of the TTS audio cache (tts_cache.py)."""
+    return jsonify({"ok": True, "stats": tts_cache.stats()})
+
+@app.get("/media_index/stats")
+def media_index_stats():
+    """Hit/rescan counters of the folder-listing index (media_index.py)."""
+    return jsonify({"ok": True, "stats": media_index.stats()})
+
 @app.get("/ai/models")
 def ai_models():
     try:
@@ -1489,19 +1552,10 @@ def _duration_via_wave(p: Path):
 
 def _duration_via_ffprobe(p: Path):
     """Fallback: use ffprobe for any codec/container."""
-    cmd = [
-        "ffprobe", "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        str(p)
-    ]
-    out = subprocess.check_output(cmd, stderr=subprocess.STDOUT, text=True).strip()
-    # ffprobe prints a float in seconds (can be "N/A")
-    if not out or out.upper() == "N/A":
+    # duration is None when ffprobe reports "N/A" or a non-finite value
+    dur = media_probe.probe(p).duration
+    if dur is None:
         raise ValueError("ffprobe returned no duration")
-    dur = float(out)
-    if not math.isfinite(dur):
-        raise ValueError("Non-finite duration from ffprobe")
     return dur
 
 @app.route("/api/audio-duration")
@@ -1518,7 +1572,7 @@ def audio_duration():
             seconds = _duration_via_ffprobe(p)
 
         return jsonify({"seconds": round(seconds, 2), "path": str(p)})
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, media_probe.ProbeError) as e:
         return jsonify({
             "error": "ffprobe failed",
             "detail": e.output
@@ -1577,29 +1631,49 @@ def _safe_join(base: Path, sub: str) -> Path:
         abort(400, "Invalid folder")
     return p
 
-def _list_current(base_url: str, base_dir: Path, rel_folder: str, exts: set[str]):
+def _list_current(base_url: str, base_dir: Path, rel_folder: str, exts: set[str], with_previews: bool = False):
     """
     Return files in the current folder and immediate subfolders.
     - base_url: '/thumbnail_images' or '/background_videos'
     - base_dir: BASE_DIR/'thumbnail_images' or 'background_videos'
     - rel_folder: '' or 'krishna/diwali'
+    - with_previews: also return "previews" {file url: proxy/poster/sprite urls} for
+      videos whose bg_proxy previews are ready, and queue the rest in the background
     """
     cur = _safe_join(base_dir, rel_folder)
     if not cur.exists():
         return {"cwd": rel_folder, "folders": [], "files": []}
 
+    # listing comes from media_index (rescanned only when the folder changed)
+    subdirs, names = media_index.list_dir(cur)
+
     # immediate subfolders
     folders = []
-    for d in sorted([p for p in cur.iterdir() if p.is_dir()]):
-        rel = (Path(rel_folder) / d.name).as_posix()
+    for name in subdirs:
+        rel = (Path(rel_folder) / name).as_posix()
         folders.append(rel)
 
     # files in current folder only
     files = []
-    for f in sorted([p for p in cur.iterdir() if p.is_file()]):
-        if f.suffix.lower() in exts:
-            rel_file = (Path(rel_folder) / f.name).as_posix()
+    rel_files = []
+    for name in names:
+        if os.path.splitext(name)[1].lower() in exts:
+            rel_file = (Path(rel_folder) / name).as_posix()
             files.append(f"{base_url}/{rel_file}")
+            rel_files.append(rel_file)
+
+    previews = {}
+    if with_previews:
+        for url, rel_file in zip(files, rel_files):
+            pv = bg_proxy.previews(base_dir, rel_file)
+            if pv:
+                for k in ("proxy", "poster", "sprite"):
+                    if pv.get(k):
+                        pv[k] = f"/background_proxies/{pv[k]}?v={pv['v']}"
+                previews[url] = pv
+        queued = bg_proxy.schedule(base_dir, rel_files)
+        if queued:
+            print(f"[BgProxy] queued {queued} videos in '{rel_folder or '/'}'")
 
     # build breadcrumb segments for UI
     crumbs = []
@@ -1607,17 +1681,14 @@ def _list_current(base_url: str, base_dir: Path, rel_folder: str, exts: set[str]
     for part in Path(rel_folder).parts:
         accum.append(part)
         crumbs.append({"name": part, "path": "/".join(accum)})
-    return {"cwd": rel_folder, "folders": folders, "files": files, "breadcrumbs": crumbs}
+    out = {"cwd": rel_folder, "folders": folders, "files": files, "breadcrumbs": crumbs}
+    if with_previews:
+        out["previews"] = previews
+    return out
 
 def _list_all_folders(base_dir: Path):
     """Return ALL subfolders (including root '') for the folder dropdown."""
-    out = [""]
-    for d, subdirs, _ in os.walk(base_dir):
-        rel = os.path.relpath(d, base_dir)
-        if rel == ".":
-            continue
-        out.append(rel.replace("\\", "/"))
-    return sorted(out)
+    return media_index.folders(base_dir)
 
 # --- STATIC file serving (so subpaths are accessible from <img>/<video> tags) ---
 @app.route('/thumbnail_images/<path:filename>')
@@ -1632,6 +1703,10 @@ def serve_reg_image(filename):
 def serve_bg_video(filename):
     return send_from_directory(BASE_DIR / 'background_videos', filename)
 
+@app.route('/background_proxies/<path:filename>')
+def serve_bg_proxy(filename):
+    return send_from_directory(bg_proxy.CACHE_DIR, filename, max_age=86400)
+
 @app.route('/quiz/downloads/<path:filename>')
 def serve_quiz_downloads(filename):
     return send_from_directory(BASE_DIR / 'downloads', filename)
@@ -1650,6 +1725,7 @@ def trigger_heygen_bulk_shorts():
 
 
 @app.post('/add_heygen_backgrounds')
+@jobs.job("add_heygen_backgrounds")
 def add_heygen_backgrounds():
     """Add HeyGen backgrounds to the system."""
     try:
@@ -1676,21 +1752,35 @@ def trigger_heygen_downloads():
         return jsonify({"ok": False, "error": str(e)}), 500
 
 # --- BROWSING APIs ---
+BG_VIDEO_EXTS = {'.mp4', '.mov', '.mkv', '.webm'}
+
 @app.get('/list_thumbnail_images')
 def list_thumbnail_images():
     folder = request.args.get('folder', '').strip('/')
     base = BASE_DIR / 'thumbnail_images'
     data = _list_current('/thumbnail_images', base, folder, {'.png', '.jpg', '.jpeg', '.webp'})
     data["all_folders"] = _list_all_folders(base)
-    return jsonify(data)
+    return media_index.json_response(data)
 
 @app.get('/list_background_videos')
 def list_background_videos():
     folder = request.args.get('folder', '').strip('/')
     base = BASE_DIR / 'background_videos'
-    data = _list_current('/background_videos', base, folder, {'.mp4', '.mov', '.mkv', '.webm'})
+    data = _list_current('/background_videos', base, folder, BG_VIDEO_EXTS, with_previews=True)
     data["all_folders"] = _list_all_folders(base)
-    return jsonify(data)
+    return media_index.json_response(data)
+
+@app.post('/build_background_proxies')
+@jobs.job("build_background_proxies")
+def build_background_proxies():
+    """Build previews for the whole background library now and drop previews of deleted videos."""
+    try:
+        result = bg_proxy.sweep(BASE_DIR / 'background_videos', BG_VIDEO_EXTS)
+        return jsonify({"ok": True, **result})
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"ok": False, "error": str(e)}), 500
 
 @app.post("/populate_media_jobs")
 def populate_media_jobs():
@@ -2441,7 +2531,8 @@ def process():
 
         scrape_and_process(urls, excel, size, music, max_words, fontsize, y_pos,
                            style, voice, language, gender, tts,
-                           skip_puppeteer, skip_captions, pitch, disable_subscribe, notebooklm)
+                           skip_puppeteer, skip_captions, pitch, disable_subscribe, notebooklm,
+                           render_profile=request.form.get('render_profile'))
 
         # return "✅ Processing started!"
         return "✅ Processing completed successfully!", 200
@@ -2646,7 +2737,13 @@ def run_obs_recorder():
         traceback.print_exc() 
         return f"❌ Error: {str(e)}", 500
     
+def _batch_progress(done, total, result):
+    report_progress(done, total, result["file"])
+    if result["ok"]:
+        add_output(os.path.join("edit_vid_output", result["file"]))
+
 @app.route('/editvideos', methods=['POST'])
+@jobs.job("editvideos")
 def run_video_editor():
     try:
         print("Processing request...run edit videos")
@@ -2677,7 +2774,7 @@ def run_video_editor():
         if watermarkposition == "none":
             add_watermark = False
 
-        batch_process(
+        results = batch_process(
             input_folder="edit_vid_input",
             output_folder="edit_vid_output",
             bg_music_folder="god_bg",
@@ -2690,14 +2787,20 @@ def run_video_editor():
             add_watermark=add_watermark,
             watermark_path="logo.png",
             watermark_position=watermarkposition,
-            watermark_scale=0.15
+            watermark_scale=0.15,
+            clear_output=not is_resumed(),
+            progress_cb=_batch_progress
         )
+        failed = [r["file"] for r in results if not r["ok"]]
+        if failed:
+            return f"⚠️ Processed {len(results) - len(failed)} of {len(results)} videos. Failed: {', '.join(failed)}", 200
         return "✅ Videos Processed successfully!", 200
     except Exception as e:
         traceback.print_exc() 
         return f"❌ Error: {str(e)}", 500    
 
 @app.route('/sunotovideogenerator', methods=['POST'])
+@jobs.job("sunotovideogenerator")
 def run_sunotovideogenerator():
     try:
         print("*** Processing request sunotovideogenerator: Enlarging clip")
@@ -2716,7 +2819,7 @@ def run_sunotovideogenerator():
         add_watermark = False
         watermarkposition = 'bottom-left'
 
-        batch_process(
+        results = batch_process(
             input_folder="edit_vid_input",
             output_folder="edit_vid_output",
             bg_music_folder="god_bg",
@@ -2729,8 +2832,13 @@ def run_sunotovideogenerator():
             add_watermark=add_watermark,
             watermark_path="logo.png",
             watermark_position=watermarkposition,
-            watermark_scale=0.15
+            watermark_scale=0.15,
+            clear_output=not is_resumed(),
+            progress_cb=_batch_progress
         )
+        failed = [r["file"] for r in results if not r["ok"]]
+        if failed:
+            print(f"⚠️ sunotovideogenerator: enlarging failed for {', '.join(failed)}")
         print("✅ Processing request sunotovideogenerator: Enlarging completed successfully")
         # copy files from edit_vid_output to edit_vid_input for next step
         import shutil
@@ -2744,7 +2852,8 @@ def run_sunotovideogenerator():
             output_path="edit_vid_output/composed_video.mp4",
             fps=30,
             shuffle=True,                                   # different order each run
-            prefer_ffmpeg_concat=True                       # auto-uses concat if safe; else MoviePy
+            prefer_ffmpeg_concat=True,                       # auto-uses concat if safe; else MoviePy
+            render_profile=request.form.get('render_profile'),
         )
 
         print("✅ Processing request sunotovideogenerator: Assembling completed successfully")
@@ -2774,6 +2883,7 @@ def run_sunotovideogenerator():
         #place copy of composed_video.mp4 from edit_vid_output to root folder as composed_video.mp4. Replace if exists
 
         shutil.copy("edit_vid_output/composed_video.mp4", "composed_video.mp4")
+        add_output("edit_vid_output/composed_video.mp4")
 
         # Also place copy of composed_video.mp4 from edit_vid_output to edit_vid_output/out_{size}.mp4. Replace if exists
         shutil.copy("edit_vid_output/composed_video.mp4", f"edit_vid_output/out_{size}.mp4")
@@ -2819,7 +2929,8 @@ def run_sunonimagetovideogenerator():
             out_folder="edit_vid_output",    # where to save KB clips
             per_image=int(duration),            # seconds per image
             output_size=video_size,
-            zoom_start=1.0, zoom_end=1.05
+            zoom_start=1.0, zoom_end=1.05,
+            render_profile=request.form.get('render_profile'),
         )
         print("✅ Processing request sunonimagetovideogenerator: Creating clips completed successfully")
         # copy files from edit_vid_output to edit_vid_input for next step
@@ -2835,7 +2946,8 @@ def run_sunonimagetovideogenerator():
             output_path="edit_vid_output/composed_video.mp4",
             fps=30,
             shuffle=True,                                   # different order each run
-            prefer_ffmpeg_concat=True                       # auto-uses concat if safe; else MoviePy
+            prefer_ffmpeg_concat=True,                       # auto-uses concat if safe; else MoviePy
+            render_profile=request.form.get('render_profile'),
         )
 
         print("✅ Processing request sunonimagetovideogenerator: Assembling completed successfully")
@@ -2954,7 +3066,8 @@ def make_kb_video():
             out_folder=output_folder,    # where to save KB clips
             per_image=int(duration),            # seconds per image
             output_size=video_size,
-            zoom_start=1.0, zoom_end=1.05
+            zoom_start=1.0, zoom_end=1.05,
+            render_profile=request.form.get('render_profile'),
         )
         return "✅ Ken Burns videos created successfully!", 200
     except Exception as e:
@@ -2973,6 +3086,7 @@ def _files_with_ext(folder: str, exts: set[str]) -> list[str]:
     ]
 
 @app.route('/assembleclipstomakevideosong', methods=['POST'])
+@jobs.job("assembleclipstomakevideosong")
 def assemble_clips_to_make_video_song():    
     try:
         print("Processing request...asseleclipstomakevideosong")
@@ -3048,6 +3162,8 @@ def assemble_clips_to_make_video_song():
         )
 
         if group_outputs:
+            for out in group_outputs:
+                add_output(out)
             return jsonify({
                 "ok": True,
                 "mode": "story_groups",
@@ -3074,8 +3190,10 @@ def assemble_clips_to_make_video_song():
             add_titles=add_titles,
             title_sec=title_sec,
             add_transitions=add_transitions,
-            transition_sec=transition_sec
+            transition_sec=transition_sec,
+            render_profile=request.form.get('render_profile'),
         )
+        add_output(output_video_path)
         if copyforcaption == 'no':
             return "✅ Video song assembled successfully!", 200
         
@@ -3430,4 +3548,12 @@ if __name__ == '__main__':
     #     autosave_every=3,
     # )   
     #  
+
+    # Preload Whisper models listed in WHISPER_WARMUP_MODELS (e.g. "base,large-v3").
+    # With the debug reloader only the serving child process should load them.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warm_up_whisper_models()
+        # Re-queue background jobs interrupted by the last shutdown
+        jobs.resume_pending()
+
     app.run(debug=True, host='0.0.0.0', port=5000)  # Use host='
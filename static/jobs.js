@@ -0,0 +1,41 @@
+// jobs.js — wait for background jobs started by long routes
+//
+// Long routes answer 202 {job_id, status_url} and run in the background.
+// awaitJob(response) polls /jobs/<id> until the job finishes and returns a
+// Response built from the job's original result, so callers keep using
+// res.ok / res.json() / res.text() exactly as before.
+//
+//     const res = await awaitJob(await fetch('/upscale', { method: 'POST', body: fd }));
+//
+// onProgress(job) is called on every poll (status, progress 0..1, message, logs).
+async function awaitJob(response, onProgress = null, intervalMs = 2000) {
+    if (response.status !== 202) return response;
+
+    let queued;
+    try {
+        queued = await response.clone().json();
+    } catch (_) {
+        return response;
+    }
+    if (!queued || !queued.job_id) return response;
+
+    const url = queued.status_url || `/jobs/${queued.job_id}`;
+    while (true) {
+        await new Promise(r => setTimeout(r, intervalMs));
+        let job;
+        try {
+            job = await (await fetch(url)).json();
+        } catch (_) {
+            continue; // server restarting: the job is persisted, keep polling
+        }
+        if (onProgress) onProgress(job);
+        if (['succeeded', 'failed', 'interrupted'].includes(job.status)) {
+            const result = job.result ?? { ok: false, error: job.error || job.status };
+            const isText = typeof result === 'string';
+            return new Response(isText ? result : JSON.stringify(result), {
+                status: job.http_status || (job.status === 'succeeded' ? 200 : 500),
+                headers: { 'Content-Type': isText ? 'text/plain; charset=utf-8' : 'application/json' },
+            });
+        }
+    }
+}
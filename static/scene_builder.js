@@ -310,7 +310,7 @@ bulkRun.addEventListener("click", async () => {
   const fd = new FormData();
   fd.append("outRes", outRes.value);
 
-  const res = await fetch("/render_bulk_bg", { method: "POST", body: fd });
+  const res = await awaitJob(await fetch("/render_bulk_bg", { method: "POST", body: fd }));
   const j = await res.json();
 
   if (!res.ok || j.ok === false) return alert(j.error || "Bulk run failed");
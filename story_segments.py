@@ -0,0 +1,331 @@
+# story_segments.py — segment-parallel rendering for scraped story videos
+#
+# create_video_using_camera_frames used to collect one MoviePy clip per element
+# and write the whole story with a single write_videofile: one core, every frame
+# through Python. Now the scraper plans one segment per image/video element
+# (the picture plus the narration slices that play over it), and this module:
+#   - renders each segment to its own H.264/AAC file with ffmpeg, on a process pool
+#   - caches segments by content (picture bytes, audio bytes, timings, movement,
+#     resolution), so a re-run after a text tweak only re-renders what changed
+#   - joins the segments with file_utils.concat_copy, copying the video stream
+#
+# All segments share one encoding profile, which is what makes the stream copy
+# valid.
+#
+# A draft render profile (encoding_profile.py) shrinks/retimes the same segment
+# plan and is cached separately from the final render.
+#
+# Env overrides:
+#     STORY_SEGMENT_WORKERS       render processes (default: cpu_count // 4, min 1)
+#     STORY_SEGMENT_CACHE_DIR     (default: <repo>/cache/story_segments)
+#     STORY_SEGMENT_CACHE_MAX_MB  (default: 4000)
+import hashlib
+import json
+import math
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from PIL import Image
+
+import encoding_profile
+from file_utils import concat_copy, evict_lru
+from camera_ffmpeg import X264_CRF, X264_PRESET, camera_movement_filter
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = Path(os.getenv("STORY_SEGMENT_CACHE_DIR", str(BASE_DIR / "cache" / "story_segments")))
+MAX_CACHE_MB = float(os.getenv("STORY_SEGMENT_CACHE_MAX_MB", "4000"))
+
+AUDIO_RATE = 44100
+
+# Bump when the rendering below changes, so old cached segments are not reused
+_RENDER_VERSION = 1
+
+
+def default_workers():
+    return int(os.getenv("STORY_SEGMENT_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // 4)
+
+
+def frame_count(duration, fps):
+    return max(1, math.ceil(float(duration) * fps - 1e-6))
+
+
+# --------------------------
+# Segment specs
+# --------------------------
+# A segment is a plain dict (picklable, JSON-able):
+#   kind        "image" | "video"
+#   source      local image / video path
+#   duration    seconds of picture
+#   audio       [[path, offset, duration], ...] played back to back (may be empty)
+#   width, height, fps
+#   image only: start_frame, end_frame, img_animation, movement_percentage
+#   video only: loop (repeat the clip to fill `duration`)
+#   silent      True -> no audio stream at all (notebooklm: one audio track for the story)
+#   preset, crf optional x264 overrides (render profile), default CAMERA_FFMPEG_PRESET / _CRF
+#   element     optional index of the scraped element, for logs (not part of the key)
+
+_file_digests = {}  # (abs path, size, mtime_ns) -> sha256
+
+
+def _file_digest(path):
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    cached = _file_digests.get(memo_key)
+    if cached:
+        return cached
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _file_digests[memo_key] = digest
+    return digest
+
+
+def segment_key(spec):
+    """Content key of a segment: file paths are replaced by their sha256."""
+    payload = dict(spec)
+    payload["source"] = _file_digest(spec["source"])
+    payload["audio"] = [[_file_digest(p), round(float(off), 4), round(float(dur), 4)]
+                        for p, off, dur in spec.get("audio") or []]
+    payload["duration"] = round(float(spec["duration"]), 4)
+    payload["version"] = _RENDER_VERSION
+    payload["encode"] = [spec.get("preset") or X264_PRESET, str(spec.get("crf") or X264_CRF)]
+    payload.pop("preset", None)
+    payload.pop("crf", None)
+    payload.pop("element", None)
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# --------------------------
+# Rendering (runs in worker processes)
+# --------------------------
+def _audio_args(spec, first_input, seconds):
+    """(input args, filter lines) producing [a]: the audio slices, padded/trimmed to `seconds`."""
+    parts = spec.get("audio") or []
+    args, chains = [], []
+    if not parts:
+        args += ["-f", "lavfi", "-i", f"anullsrc=r={AUDIO_RATE}:cl=stereo"]
+        parts_out = f"[{first_input}:a]"
+    else:
+        labels = []
+        for i, (path, offset, dur) in enumerate(parts):
+            idx = first_input + i
+            args += ["-ss", f"{float(offset):.3f}", "-t", f"{float(dur):.3f}", "-i", path]
+            chains.append(f"[{idx}:a]aresample={AUDIO_RATE},aformat=sample_fmts=fltp:channel_layouts=stereo[a{i}]")
+            labels.append(f"[a{i}]")
+        chains.append(f"{''.join(labels)}concat=n={len(labels)}:v=0:a=1[acat]")
+        parts_out = "[acat]"
+    chains.append(f"{parts_out}apad,atrim=0:{seconds:.6f},asetpts=PTS-STARTPTS[a]")
+    return args, chains
+
+
+def render_segment(spec, output_path, threads=0):
+    """Render one segment spec to `output_path`. Raises RuntimeError with ffmpeg's stderr."""
+    w, h, fps = int(spec["width"]), int(spec["height"]), int(spec["fps"])
+    frames = frame_count(spec["duration"], fps)
+    seconds = frames / fps
+
+    if spec["kind"] == "image":
+        with Image.open(spec["source"]) as im:
+            image_size = im.size
+        vf = camera_movement_filter(
+            image_size, spec["start_frame"], spec["end_frame"], spec["duration"], fps,
+            spec.get("movement_percentage", 70), spec.get("img_animation", "Zoom In"), (w, h),
+        )
+        inputs = ["-loop", "1", "-framerate", str(fps), "-i", spec["source"]]
+        chains = [f"[0:v]{vf},setsar=1,format=yuv420p[v]"]
+    elif spec["kind"] == "video":
+        inputs = (["-stream_loop", "-1"] if spec.get("loop") else []) + ["-i", spec["source"]]
+        # Stretch to the frame like MoviePy's resize(newsize=...); clone the last
+        # frame if rounding leaves the clip a frame short
+        chains = [f"[0:v]setpts=PTS-STARTPTS,scale={w}:{h},setsar=1,fps={fps},"
+                  f"tpad=stop_mode=clone:stop_duration=1,trim=end_frame={frames},format=yuv420p[v]"]
+    else:
+        raise ValueError(f"Unknown segment kind: {spec['kind']!r}")
+
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-nostats", "-loglevel", "error", *inputs]
+    maps = ["-map", "[v]"]
+    if not spec.get("silent"):
+        a_args, a_chains = _audio_args(spec, 1, seconds)
+        cmd += a_args
+        chains += a_chains
+        maps += ["-map", "[a]"]
+
+    cmd += [
+        "-filter_complex", ";".join(chains), *maps,
+        "-frames:v", str(frames), "-r", str(fps),
+        "-c:v", "libx264", "-preset", spec.get("preset") or X264_PRESET, "-crf", str(spec.get("crf") or X264_CRF),
+        "-pix_fmt", "yuv420p",
+        "-threads", str(threads),
+    ]
+    if not spec.get("silent"):
+        cmd += ["-c:a", "aac", "-b:a", "192k", "-ar", str(AUDIO_RATE), "-ac", "2"]
+    cmd += ["-movflags", "+faststart", output_path]
+
+    p = subprocess.run(cmd, capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(f"ffmpeg segment render failed ({spec['kind']} {spec['source']}):\n{(p.stderr or '').strip()}")
+    return output_path
+
+
+def _render_cached(spec, key, threads):
+    """Worker entry point: render into the cache under `key` (atomic rename)."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    final = CACHE_DIR / f"{key}.mp4"
+    tmp = CACHE_DIR / f"{key}.{os.getpid()}.tmp.mp4"
+    t0 = time.time()
+    try:
+        render_segment(spec, str(tmp), threads)
+        os.replace(tmp, final)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return str(final), time.time() - t0
+
+
+def _describe(spec):
+    return f"element {spec.get('element', '?')}, {spec['kind']} {spec['source']}"
+
+
+def _render_moviepy_fallback(spec, key):
+    """
+    Image segment whose ffmpeg camera render failed: build the movement with
+    effects.create_camera_movement_clip (the MoviePy path), then encode it as a
+    video segment so it keeps the story's H.264/AAC profile.
+    """
+    from effects import create_camera_movement_clip
+    from moviepy.video.fx.resize import resize
+
+    w, h, fps = int(spec["width"]), int(spec["height"]), int(spec["fps"])
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    movement = CACHE_DIR / f"{key}.{os.getpid()}.tmp.movement.mp4"
+    clip = create_camera_movement_clip(
+        spec["source"], spec["start_frame"], spec["end_frame"],
+        duration=float(spec["duration"]), fps=fps,
+        movement_percentage=spec.get("movement_percentage", 70),
+        img_animation=spec.get("img_animation", "Zoom In"),
+        target_resolution=(w, h),
+    )
+    try:
+        clip = resize(clip, newsize=(w, h))
+        clip.write_videofile(str(movement), fps=fps, codec="libx264", audio=False,
+                             preset="ultrafast", ffmpeg_params=["-crf", "12"], logger=None)
+        return _render_cached(dict(spec, kind="video", source=str(movement), loop=False), key, 0)
+    finally:
+        clip.close()
+        if movement.exists():
+            movement.unlink()
+
+
+# --------------------------
+# Cache
+# --------------------------
+def _cache_get(key):
+    path = CACHE_DIR / f"{key}.mp4"
+    if not path.exists():
+        return None
+    try:
+        os.utime(path, None)  # mark as recently used for LRU eviction
+    except OSError:
+        pass
+    return str(path)
+
+
+def _evict(keep=()):
+    evict_lru(CACHE_DIR, "*.mp4", int(MAX_CACHE_MB * 1024 * 1024), keep=keep)
+
+
+# --------------------------
+# Story
+# --------------------------
+def concat_segments(segment_paths, output_path, audio_path=None, duration=None):
+    """
+    Join same-profile segments (file_utils.concat_copy: video stream copy).
+    audio_path replaces the segments' audio with one track for the whole story.
+    """
+    return concat_copy(segment_paths, output_path, audio_path=audio_path, duration=duration)
+
+
+def apply_profile(spec, profile):
+    """Spec rendered with an encoding_profile: smaller frame, capped fps, x264 overrides."""
+    prof = encoding_profile.get(profile)
+    if not prof.is_draft:
+        return spec
+    w, h = prof.size(spec["width"], spec["height"])
+    preset, crf = prof.x264(X264_PRESET, X264_CRF)
+    return dict(spec, width=w, height=h, fps=prof.frame_rate(int(spec["fps"])), preset=preset, crf=crf)
+
+
+def render_story(specs, output_path, audio_path=None, workers=None, profile=None):
+    """
+    Render every segment (cache first, misses on a process pool) and join them
+    into `output_path`. `profile` is an encoding_profile name/object (None ->
+    RENDER_PROFILE). Returns {"segments", "cached", "rendered", "seconds"}.
+
+    An image segment whose ffmpeg render fails is redone with the MoviePy camera
+    movement; any other failure raises RuntimeError naming the element.
+    """
+    t0 = time.time()
+    specs = [apply_profile(s, profile) for s in specs if float(s["duration"]) > 0]
+    if not specs:
+        raise ValueError("No segments to render")
+
+    keys = [segment_key(s) for s in specs]
+    paths = [_cache_get(k) for k in keys]
+    misses = {}
+    for i, k in enumerate(keys):
+        if paths[i] is None:
+            misses.setdefault(k, []).append(i)  # identical segments render once
+    print(f"[story] {len(specs)} segments: {len(specs) - sum(len(v) for v in misses.values())} cached, "
+          f"{len(misses)} to render")
+
+    if misses:
+        workers = max(1, min(workers or default_workers(), len(misses)))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_render_cached, specs[idx[0]], k, threads): k for k, idx in misses.items()}
+            done = 0
+            failed = {}
+            for fut in as_completed(futures):
+                k = futures[fut]
+                try:
+                    path, secs = fut.result()
+                except Exception as e:
+                    failed[k] = e
+                    continue
+                done += 1
+                for i in misses[k]:
+                    paths[i] = path
+                print(f"[story] segment {misses[k][0] + 1}/{len(specs)} rendered in {secs:.1f}s ({done}/{len(misses)})")
+
+        for k, err in failed.items():
+            spec = specs[misses[k][0]]
+            print(f"[story] segment {misses[k][0] + 1}/{len(specs)} ({_describe(spec)}) failed: {err}")
+            if spec["kind"] != "image":
+                raise RuntimeError(f"Story segment failed ({_describe(spec)}): {err}") from err
+            print("[story] falling back to MoviePy for its camera movement")
+            try:
+                path, secs = _render_moviepy_fallback(spec, k)
+            except Exception as e:
+                raise RuntimeError(f"Story segment failed ({_describe(spec)}), MoviePy fallback too: {e}") from e
+            for i in misses[k]:
+                paths[i] = path
+            print(f"[story] segment {misses[k][0] + 1}/{len(specs)} rendered with MoviePy in {secs:.1f}s")
+
+    duration = sum(frame_count(s["duration"], int(s["fps"])) / int(s["fps"]) for s in specs)
+    concat_segments(paths, output_path, audio_path=audio_path, duration=duration)
+    _evict(keep=paths)
+
+    stats = {
+        "segments": len(specs),
+        "cached": len(specs) - sum(len(v) for v in misses.values()),
+        "rendered": len(misses),
+        "seconds": round(time.time() - t0, 2),
+    }
+    print(f"[story] wrote {output_path} ({stats})")
+    return stats
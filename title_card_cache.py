@@ -0,0 +1,113 @@
+# title_card_cache.py — persistent cache of rendered "Next: ..." title cards
+#
+# assemble_videos (breathing_mode == "title_card") used to re-encode every card
+# into __tmp_titlecards and delete the folder afterwards, so re-assembling the
+# same playlist rendered identical cards again. Cards are now stored by
+# Key = sha256(title text, size, fps, duration, font file, colors, box, fade)
+# and referenced in place by the concat; misses are rendered by the caller and
+# moved in atomically. Evicted least-recently-used once the folder exceeds its
+# size budget (file_utils.evict_lru), never while a card is in use.
+#
+# Env overrides:
+#     TITLE_CARD_CACHE_DIR      (default: <repo>/cache/title_cards)
+#     TITLE_CARD_CACHE_MAX_MB   (default: 500)
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from file_utils import dir_usage, evict_lru
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = Path(os.getenv("TITLE_CARD_CACHE_DIR", str(BASE_DIR / "cache" / "title_cards")))
+MAX_CACHE_MB = float(os.getenv("TITLE_CARD_CACHE_MAX_MB", "500"))
+
+# Bump when _make_title_card_ffmpeg's output changes, so old cards are not reused
+_RENDER_VERSION = 1
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+
+def _font_fingerprint(fontfile):
+    """Font path plus size/mtime, so replacing the font file invalidates its cards."""
+    if not fontfile:
+        return None
+    try:
+        st = os.stat(fontfile)
+        return [os.path.abspath(fontfile), st.st_size, st.st_mtime_ns]
+    except OSError:
+        return [fontfile]
+
+
+def make_key(title, w, h, fps, dur, fontfile=None, bg="#101010", fontsize=64,
+             fontcolor="white", box_alpha=0.35, box_border=40, fade_sec=0.25) -> str:
+    payload = {
+        "title": title,
+        "size": [int(w), int(h)],
+        "fps": fps,
+        "dur": round(float(dur), 4),
+        "font": _font_fingerprint(fontfile),
+        "fontsize": int(fontsize),
+        "colors": [bg, fontcolor],
+        "box": [round(float(box_alpha), 4), int(box_border)],
+        "fade": round(float(fade_sec), 4),
+        "version": _RENDER_VERSION,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def entry_path(key: str) -> Path:
+    return CACHE_DIR / f"{key}.mp4"
+
+
+def temp_path(key: str) -> Path:
+    """Where a miss should be rendered before commit() moves it into place."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    return CACHE_DIR / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp.mp4"
+
+
+def get(key: str):
+    """Path of the cached card for `key`, or None. Counts a hit or a miss."""
+    path = entry_path(key)
+    if not path.exists() or path.stat().st_size == 0:
+        with _lock:
+            _stats["misses"] += 1
+        return None
+    try:
+        os.utime(path, None)  # mark as recently used for LRU eviction
+    except OSError:
+        pass
+    with _lock:
+        _stats["hits"] += 1
+    return str(path)
+
+
+def commit(key: str, tmp) -> str:
+    """Move a freshly rendered card from temp_path(key) into the cache."""
+    path = entry_path(key)
+    os.replace(tmp, path)
+    with _lock:
+        _stats["writes"] += 1
+    return str(path)
+
+
+def evict(keep=()):
+    """Trim the cache to its budget, never deleting the paths in `keep` (cards in use)."""
+    evicted = evict_lru(CACHE_DIR, "*.mp4", int(MAX_CACHE_MB * 1024 * 1024), keep=keep)
+    with _lock:
+        _stats["evictions"] += evicted
+
+
+def stats() -> dict:
+    entries, size = dir_usage(CACHE_DIR, "*.mp4")
+    with _lock:
+        out = dict(_stats)
+    lookups = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else None
+    out["entries"] = entries
+    out["size_mb"] = round(size / (1024 * 1024), 2)
+    out["max_mb"] = MAX_CACHE_MB
+    return out
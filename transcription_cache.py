@@ -0,0 +1,149 @@
+# transcription_cache.py — on-disk cache of Whisper / WhisperX transcripts
+#
+# Key = sha256(audio bytes) + model + language + decoding options, so re-running
+# captioning on the same audio (e.g. only matching/styling changed) skips
+# inference entirely. Entries are the segment/word JSON, one file per key,
+# evicted least-recently-used once the folder exceeds its size budget.
+#
+# Stdlib only: also imported by whisperx_captions.py, which runs in its own venv.
+#
+# Env overrides:
+#     TRANSCRIPT_CACHE_DIR      (default: <repo>/cache/transcripts)
+#     TRANSCRIPT_CACHE_MAX_MB   (default: 500)
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from file_utils import dir_usage, evict_lru
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = Path(os.getenv("TRANSCRIPT_CACHE_DIR", str(BASE_DIR / "cache" / "transcripts")))
+MAX_CACHE_MB = float(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "500"))
+
+# Options that only change console output, not the transcript
+_IGNORED_OPTIONS = {"verbose"}
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+_hash_memo = {}  # (abs path, size, mtime_ns) -> sha256
+
+
+def audio_fingerprint(path) -> str:
+    """sha256 of the file contents (memoized per path/size/mtime within the process)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    cached = _hash_memo.get(memo_key)
+    if cached:
+        return cached
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _hash_memo[memo_key] = digest
+    return digest
+
+
+def make_key(audio_path, model, language=None, options=None, engine="whisper") -> str:
+    opts = {k: v for k, v in (options or {}).items() if k not in _IGNORED_OPTIONS}
+    payload = {
+        "engine": engine,
+        "audio": audio_fingerprint(audio_path),
+        "model": model,
+        "language": language,
+        "options": opts,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str) -> Path:
+    return CACHE_DIR / f"{key}.json"
+
+
+def get(key: str):
+    """Cached transcript dict, or None. Counts a hit or a miss."""
+    path = _entry_path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        with _lock:
+            _stats["misses"] += 1
+        return None
+    try:
+        os.utime(path, None)  # mark as recently used for LRU eviction
+    except OSError:
+        pass
+    with _lock:
+        _stats["hits"] += 1
+    return data
+
+
+def put(key: str, data: dict) -> Path:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _entry_path(key)
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    with _lock:
+        _stats["writes"] += 1
+    _evict()
+    return path
+
+
+def _evict():
+    evicted = evict_lru(CACHE_DIR, "*.json", int(MAX_CACHE_MB * 1024 * 1024))
+    with _lock:
+        _stats["evictions"] += evicted
+
+
+def stats() -> dict:
+    entries, size = dir_usage(CACHE_DIR, "*.json")
+    with _lock:
+        out = dict(_stats)
+    out["entries"] = entries
+    out["size_mb"] = round(size / (1024 * 1024), 2)
+    out["max_mb"] = MAX_CACHE_MB
+    return out
+
+
+def _slim_whisper_result(result: dict) -> dict:
+    """Keep what caption code reads: text, language, segments with words."""
+    segments = []
+    for seg in result.get("segments", []):
+        segments.append({
+            "start": seg.get("start"),
+            "end": seg.get("end"),
+            "text": seg.get("text", ""),
+            "words": [
+                {k: w.get(k) for k in ("word", "start", "end", "probability") if k in w}
+                for w in seg.get("words", []) or []
+            ],
+        })
+    return {
+        "text": result.get("text", ""),
+        "language": result.get("language"),
+        "segments": segments,
+    }
+
+
+def cached_transcribe(audio_path, model_name, language, options, transcribe):
+    """
+    Return the transcript for `audio_path`, from cache when possible.
+
+    `transcribe()` is only called on a miss (so the model is never loaded on
+    a hit) and must return a whisper-style result dict.
+    """
+    key = make_key(audio_path, model_name, language, options)
+    data = get(key)
+    if data is not None:
+        print(f"[transcript-cache] hit {key[:12]} ({model_name}, {language})")
+        return data
+    print(f"[transcript-cache] miss {key[:12]} ({model_name}, {language})")
+    data = _slim_whisper_result(transcribe())
+    put(key, data)
+    return data
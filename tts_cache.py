@@ -0,0 +1,103 @@
+# tts_cache.py — content-addressed cache of synthesized TTS audio
+#
+# Key = sha256(engine, voice, voice type, speaking rate, pitch, text/SSML), so
+# re-rendering a story whose narration didn't change (images-only edits, retries,
+# re-runs of a batch) copies yesterday's MP3 instead of calling Google / Polly.
+# One file per key, evicted least-recently-used once the folder exceeds its
+# size budget (file_utils.evict_lru).
+#
+# Entries are copied out, not hard-linked: callers overwrite their output paths
+# in place (open(..., "wb")), which would truncate a linked cache entry.
+#
+# Env overrides:
+#     TTS_CACHE_DIR      (default: <repo>/cache/tts)
+#     TTS_CACHE_MAX_MB   (default: 1000)
+#     TTS_CACHE          set to 0 to bypass the cache
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from file_utils import dir_usage, evict_lru
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = Path(os.getenv("TTS_CACHE_DIR", str(BASE_DIR / "cache" / "tts")))
+MAX_CACHE_MB = float(os.getenv("TTS_CACHE_MAX_MB", "1000"))
+ENABLED = os.getenv("TTS_CACHE", "1") != "0"
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "bytes_served": 0}
+
+
+def make_key(engine, voice, speaking_rate, pitch, text, voice_type=None, audio_format="mp3") -> str:
+    payload = {
+        "engine": engine,
+        "voice": voice,
+        "voice_type": voice_type,
+        "speaking_rate": round(float(speaking_rate), 4),
+        "pitch": round(float(pitch), 4),
+        "text": text,
+        "format": audio_format,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str) -> Path:
+    return CACHE_DIR / f"{key}.mp3"
+
+
+def fetch(key: str, dest) -> bool:
+    """Copy the cached audio for `key` to `dest`. True on a hit; counts a hit or a miss."""
+    path = _entry_path(key)
+    try:
+        shutil.copyfile(path, dest)
+        size = path.stat().st_size
+    except FileNotFoundError:
+        with _lock:
+            _stats["misses"] += 1
+        return False
+    try:
+        os.utime(path, None)  # mark as recently used for LRU eviction
+    except OSError:
+        pass
+    with _lock:
+        _stats["hits"] += 1
+        _stats["bytes_served"] += size
+    return True
+
+
+def put(key: str, src):
+    """Store a copy of the synthesized file `src` under `key`."""
+    if not src or not os.path.exists(src) or os.path.getsize(src) == 0:
+        return None
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _entry_path(key)
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, path)
+    with _lock:
+        _stats["writes"] += 1
+    _evict()
+    return path
+
+
+def _evict():
+    evicted = evict_lru(CACHE_DIR, "*.mp3", int(MAX_CACHE_MB * 1024 * 1024))
+    with _lock:
+        _stats["evictions"] += evicted
+
+
+def stats() -> dict:
+    entries, size = dir_usage(CACHE_DIR, "*.mp3")
+    with _lock:
+        out = dict(_stats)
+    lookups = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else None
+    out["enabled"] = ENABLED
+    out["entries"] = entries
+    out["size_mb"] = round(size / (1024 * 1024), 2)
+    out["max_mb"] = MAX_CACHE_MB
+    return out
@@ -0,0 +1,205 @@
+# tts_engines.py — long-lived TTS clients with explicit credentials
+#
+# get_audio_file used to build a new boto3 Polly client on every call, re-derive
+# the Google credentials file and publish it through
+# os.environ["GOOGLE_APPLICATION_CREDENTIALS"] (racy once calls run on threads),
+# while the cached Google client silently kept whichever credentials it was
+# first created with. Now:
+#   - google_credentials_path()       the even/odd-day service account, resolved explicitly
+#   - get_engine(name, credentials)   one engine per (engine, credentials): the client is
+#                                     created once, is thread-safe and lives for the process
+#   - engine.synthesize(...)          one request, bounded by a per-engine semaphore
+#
+# Cloud SDKs are imported lazily so the module loads without them.
+#
+# Env overrides:
+#     TTS_GOOGLE_CONCURRENCY   simultaneous Google requests (default: 4)
+#     TTS_AMAZON_CONCURRENCY   simultaneous Polly requests (default: 4)
+#     TTS_POLLY_REGION         (default: us-east-1)
+import datetime
+import os
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TTS_SECRET_DIR = os.path.join(BASE_DIR, os.path.pardir, "tts-secret")
+
+# Service accounts alternate by day of month to spread quota
+GOOGLE_CREDENTIALS_EVEN_DAY = "quantum-conduit-458602-k9-e1f713291583.json"
+GOOGLE_CREDENTIALS_ODD_DAY = "notes-imgtotxt-7b07c59d85c6.json"
+
+CONCURRENCY = {
+    "google": int(os.getenv("TTS_GOOGLE_CONCURRENCY", "4")),
+    "amazon": int(os.getenv("TTS_AMAZON_CONCURRENCY", "4")),
+}
+POLLY_REGION = os.getenv("TTS_POLLY_REGION", "us-east-1")
+
+
+def google_credentials_path(day=None):
+    """Service-account file for today (even day -> 173, odd day -> mail2)."""
+    day = datetime.datetime.now().day if day is None else day
+    if day % 2 == 0:
+        print("Even day, using 173")
+        credentials_file = GOOGLE_CREDENTIALS_EVEN_DAY
+    else:
+        print("Odd day, using mail2")
+        credentials_file = GOOGLE_CREDENTIALS_ODD_DAY
+    return os.path.normpath(os.path.join(TTS_SECRET_DIR, credentials_file))
+
+
+class TTSEngine:
+    """One engine + credentials. synthesize() is safe to call from many threads."""
+
+    name = ""
+
+    def __init__(self, credentials=None):
+        self.credentials = credentials
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, CONCURRENCY.get(self.name, 4)))
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._make_client()
+        return self._client
+
+    def _make_client(self):
+        raise NotImplementedError
+
+    def synthesize(self, text, output_file, voice_name, speaking_rate=1.0, pitch=0.0, voice_type=None):
+        """Synthesize `text` (plain or SSML) to an MP3 at output_file. Returns output_file."""
+        with self._slots:
+            audio = self._synthesize(text, voice_name, speaking_rate, pitch, voice_type)
+        with open(output_file, "wb") as f:
+            f.write(audio)
+        return output_file
+
+    def _synthesize(self, text, voice_name, speaking_rate, pitch, voice_type) -> bytes:
+        raise NotImplementedError
+
+
+class GoogleTTSEngine(TTSEngine):
+    """Google Cloud TTS; credentials = service-account JSON path (None -> application default)."""
+
+    name = "google"
+
+    def _make_client(self):
+        from google.cloud import texttospeech_v1beta1 as texttospeech
+
+        if self.credentials:
+            # Optional fast auth sanity check so we don't confuse auth with 5xx
+            if not os.path.exists(self.credentials):
+                raise RuntimeError(f"Google credentials not found at {self.credentials}")
+            return texttospeech.TextToSpeechClient.from_service_account_file(self.credentials)
+        return texttospeech.TextToSpeechClient()
+
+    def _synthesize(self, text, voice_name, speaking_rate, pitch, voice_type):
+        from google.cloud import texttospeech_v1beta1 as texttospeech
+
+        is_ssml = "<break" in text or "<speak>" in text
+        if is_ssml:
+            if not text.strip().startswith("<speak>"):
+                text = f"<speak>{text}</speak>"
+            input_text = texttospeech.SynthesisInput(ssml=text)
+        else:
+            input_text = texttospeech.SynthesisInput(text=text)
+
+        voice = texttospeech.VoiceSelectionParams(language_code=voice_name[:5], name=voice_name)
+        audio_config = texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding.MP3,
+            speaking_rate=speaking_rate,
+            **({"pitch": pitch} if pitch else {})
+        )
+        response = self.client.synthesize_speech(
+            request={"input": input_text, "voice": voice, "audio_config": audio_config},
+            retry=_google_retry(),
+            timeout=_google_timeout(),
+        )
+        return response.audio_content
+
+
+class PollyTTSEngine(TTSEngine):
+    """Amazon Polly; credentials = AWS profile name (None -> default credential chain)."""
+
+    name = "amazon"
+
+    def _make_client(self):
+        import boto3
+
+        # Sessions are not thread-safe, clients are: build one client from a private session
+        session = boto3.session.Session(profile_name=self.credentials) if self.credentials else boto3.session.Session()
+        return session.client("polly", region_name=POLLY_REGION)
+
+    def _synthesize(self, text, voice_name, speaking_rate, pitch, voice_type):
+        voice_type = voice_type or "neural"
+        text_type = "ssml" if voice_type == "neural" else "text"
+        text_content = f'<speak><prosody rate="90%">{text}</prosody></speak>' if text_type == "ssml" else text
+        response = self.client.synthesize_speech(
+            TextType=text_type,
+            Text=text_content,
+            OutputFormat="mp3",
+            VoiceId=voice_name,
+            Engine=voice_type
+        )
+        return response['AudioStream'].read()
+
+
+ENGINES = {"google": GoogleTTSEngine, "amazon": PollyTTSEngine}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(name, credentials=None) -> TTSEngine:
+    """Shared engine for (name, credentials), created on first use."""
+    if name not in ENGINES:
+        raise ValueError("Unsupported TTS engine.")
+    key = (name, credentials)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = ENGINES[name](credentials)
+    return engine
+
+
+# --------------------------
+# Google retry / timeout (work across google-api-core versions)
+# --------------------------
+def _google_retry():
+    from google.api_core import exceptions as gexceptions
+
+    # Try to import Retry + if_exception_type in the modern way; provide fallbacks.
+    try:
+        from google.api_core.retry import Retry, if_exception_type
+    except Exception:  # older google-api-core
+        from google.api_core import retry as _retry
+        Retry = _retry.Retry
+
+        def if_exception_type(*exc_types):
+            def _pred(exc):
+                return isinstance(exc, exc_types)
+            return _pred
+
+    return Retry(
+        predicate=if_exception_type(
+            gexceptions.ServiceUnavailable,   # 503 / UNAVAILABLE
+            gexceptions.DeadlineExceeded,     # 504
+            gexceptions.InternalServerError,  # 500
+            gexceptions.GoogleAPICallError    # broader net for 5xx mappings
+        ),
+        initial=1.0,
+        maximum=30.0,
+        multiplier=2.0,
+        deadline=120.0,   # overall retry budget for this request
+    )
+
+
+def _google_timeout():
+    # Timeout helper is not present in older versions; fall back to a constant.
+    try:
+        from google.api_core.timeout import ExponentialTimeout
+    except Exception:
+        return 60.0
+    return ExponentialTimeout(initial=20.0, maximum=60.0, multiplier=1.5)
@@ -1,6 +1,10 @@
 import os
 import subprocess
 import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import media_probe
 
 def get_random_music(bg_music_folder):
     music_files = [
@@ -32,17 +36,15 @@ def process_video(
     add_watermark=False,
     watermark_path="logo.png",
     watermark_position="bottom-right",
-    watermark_scale=0.2
+    watermark_scale=0.2,
+    ffmpeg_threads=None,
+    quiet=False
 ):
     # Probe size
-    probe_cmd = [
-        'ffprobe', '-v', 'error',
-        '-select_streams', 'v:0',
-        '-show_entries', 'stream=width,height',
-        '-of', 'csv=s=x:p=0', input_path
-    ]
-    result = subprocess.run(probe_cmd, capture_output=True, text=True, check=True)
-    width, height = map(int, result.stdout.strip().split('x'))
+    info = media_probe.probe(input_path)
+    width, height = info.width, info.height
+    if not width or not height:
+        raise ValueError(f"No video stream in {input_path}")
 
     # Orientation
     orientation = ("portrait" if height > width else "landscape") if target_orientation == "auto" else target_orientation
@@ -123,6 +125,10 @@ def process_video(
         '-shortest',
         '-c:v', 'libx264',
         '-preset', 'fast',
+    ]
+    if ffmpeg_threads:
+        ffmpeg_cmd += ['-threads', str(int(ffmpeg_threads))]
+    ffmpeg_cmd += [
         '-movflags', '+faststart',
         output_path
     ]
@@ -130,7 +136,14 @@ def process_video(
     # If you need to debug:
     # ffmpeg_cmd += ['-loglevel', 'debug']
 
-    subprocess.run(ffmpeg_cmd, check=True)
+    if quiet:
+        # Parallel batch: keep ffmpeg's progress off the console, surface stderr on failure
+        ffmpeg_cmd[1:1] = ['-hide_banner', '-nostats', '-loglevel', 'error']
+        p = subprocess.run(ffmpeg_cmd, capture_output=True, text=True)
+        if p.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed for {os.path.basename(input_path)}:\n{p.stderr[-2000:]}")
+    else:
+        subprocess.run(ffmpeg_cmd, check=True)
     print(f"✅ {orientation.upper()} Processed: {os.path.basename(output_path)}")
 
 #DND - working except when slow_down is False
@@ -150,14 +163,10 @@ def process_video_DND(
     watermark_scale=0.2
 ):
     # Get video size
-    probe_cmd = [
-        'ffprobe', '-v', 'error',
-        '-select_streams', 'v:0',
-        '-show_entries', 'stream=width,height',
-        '-of', 'csv=s=x:p=0', input_path
-    ]
-    result = subprocess.run(probe_cmd, capture_output=True, text=True)
-    width, height = map(int, result.stdout.strip().split('x'))
+    info = media_probe.probe(input_path)
+    width, height = info.width, info.height
+    if not width or not height:
+        raise ValueError(f"No video stream in {input_path}")
 
     # Detect orientation
     orientation = (
@@ -236,6 +245,20 @@ def process_video_DND(
     subprocess.run(ffmpeg_cmd)
     print(f"✅ {orientation.upper()} Processed: {os.path.basename(output_path)}")
 
+def _default_workers(n_files):
+    env = os.getenv("VIDEO_EDITOR_WORKERS")
+    if env:
+        return max(1, int(env))
+    # libx264 scales well up to ~4 threads on short clips; fill the box with encodes beyond that
+    return max(1, min(n_files, (os.cpu_count() or 1) // 4))
+
+def _verify_output(output_path):
+    """Output exists, has a video stream and a positive duration."""
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return False
+    info = media_probe.try_probe(output_path)
+    return bool(info and info.has_video and (info.duration or 0) > 0)
+
 def batch_process(
     input_folder='input',
     output_folder='output',
@@ -249,16 +272,43 @@ def batch_process(
     add_watermark=False,
     watermark_path="logo.png",
     watermark_position="bottom-right",
-    watermark_scale=0.2
+    watermark_scale=0.2,
+    workers=None,
+    clear_output=True,
+    progress_cb=None
 ):
-    print("Received batch_process Arguments:", locals())
-    clear_folder(output_folder)
-    for filename in os.listdir(input_folder):
-        if filename.lower().endswith(".mp4"):
-            input_path = os.path.join(input_folder, filename)
-            output_path = os.path.join(output_folder, f"{filename}")
-            bg_music = get_random_music(bg_music_folder) if add_music else None
+    """
+    Process every .mp4 in input_folder with up to `workers` concurrent encodes
+    (default: VIDEO_EDITOR_WORKERS or cpu_count // 4). ffmpeg -threads is split
+    between workers. A failed file is reported and the batch carries on; an input
+    is only deleted once its output has been verified.
+
+    progress_cb(done, total, result) is called after each file. Pass
+    clear_output=False to keep outputs from an interrupted earlier run.
 
+    Returns a list of {"file", "ok", "seconds", "error"} dicts, one per input.
+    """
+    print("Received batch_process Arguments:", locals())
+    if clear_output:
+        clear_folder(output_folder)
+    else:
+        os.makedirs(output_folder, exist_ok=True)
+
+    filenames = sorted(f for f in os.listdir(input_folder) if f.lower().endswith(".mp4"))
+    if not filenames:
+        print("⚠️ No .mp4 files to process")
+        return []
+
+    workers = max(1, min(len(filenames), workers or _default_workers(len(filenames))))
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers) if workers > 1 else None
+    print(f"🎬 Processing {len(filenames)} videos with {workers} worker(s)"
+          + (f", {threads_per_worker} ffmpeg threads each" if threads_per_worker else ""))
+
+    def _one(filename, bg_music):
+        input_path = os.path.join(input_folder, filename)
+        output_path = os.path.join(output_folder, f"{filename}")
+        t0 = time.time()
+        try:
             process_video(
                 input_path=input_path,
                 output_path=output_path,
@@ -272,9 +322,41 @@ def batch_process(
                 add_watermark=add_watermark,
                 watermark_path=watermark_path,
                 watermark_position=watermark_position,
-                watermark_scale=watermark_scale
+                watermark_scale=watermark_scale,
+                ffmpeg_threads=threads_per_worker,
+                quiet=workers > 1
             )
-            os.remove(input_path)
+            if not _verify_output(output_path):
+                raise RuntimeError("output missing or unreadable after encode")
+        except Exception as e:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            return {"file": filename, "ok": False, "seconds": round(time.time() - t0, 2), "error": str(e)}
+        os.remove(input_path)
+        return {"file": filename, "ok": True, "seconds": round(time.time() - t0, 2), "error": None}
+
+    # Pick music up front so the random choice doesn't depend on thread scheduling
+    jobs = [(f, get_random_music(bg_music_folder) if add_music else None) for f in filenames]
+
+    t_batch = time.time()
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = [ex.submit(_one, f, music) for f, music in jobs]
+        for fut in as_completed(futures):
+            r = fut.result()
+            results.append(r)
+            if progress_cb:
+                progress_cb(len(results), len(filenames), r)
+            if r["ok"]:
+                print(f"⏱️ {r['file']}: {r['seconds']:.1f}s")
+            else:
+                print(f"❌ {r['file']} failed after {r['seconds']:.1f}s: {r['error']}")
+
+    results.sort(key=lambda r: filenames.index(r["file"]))
+    failed = [r for r in results if not r["ok"]]
+    print(f"✅ Batch done in {time.time() - t_batch:.1f}s: "
+          f"{len(results) - len(failed)} ok, {len(failed)} failed")
+    return results
 
 # ✅ Example usage
 if __name__ == '__main__':
@@ -319,3 +401,7 @@ if __name__ == '__main__':
 # watermark_position      : "top-left", "top-right", "bottom-left", "bottom-right" (default: "bottom-right")
 # watermark_scale         : Float – relative width of watermark (e.g., 0.2 = 20% of video width) (default: 0.2)
 
+# workers                 : Int – concurrent encodes (default: VIDEO_EDITOR_WORKERS env or cpu_count // 4)
+#   - ffmpeg -threads is divided between workers
+#   - failures are reported per file; inputs are deleted only after their output is verified
+
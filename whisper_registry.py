@@ -0,0 +1,230 @@
+# whisper_registry.py — process-wide cache of loaded Whisper models
+#
+# whisper.load_model() takes seconds (base) to tens of seconds (large-v3).
+# Models are kept resident between server requests, keyed by
+# (model name, device, compute type), inside a memory budget with LRU eviction.
+#
+# Usage:
+#     from whisper_registry import whisper_model
+#     with whisper_model("large-v3") as model:
+#         result = model.transcribe(path, word_timestamps=True)
+#
+# Env overrides:
+#     WHISPER_MEMORY_BUDGET_MB   total resident budget (default 8000)
+#     WHISPER_WARMUP_MODELS      comma list loaded at server start, e.g. "base,large-v3"
+#     WHISPER_DEVICE             default device ("cuda" / "cpu"; default: whisper's choice)
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DEFAULT_MEMORY_BUDGET_MB = int(os.getenv("WHISPER_MEMORY_BUDGET_MB", "8000"))
+DEFAULT_COMPUTE_TYPE = "float32"
+
+# Rough resident sizes in fp32, used to make room *before* a load.
+# Real sizes are measured from the parameters once a model is loaded.
+MODEL_SIZE_MB = {
+    "tiny": 150, "tiny.en": 150,
+    "base": 290, "base.en": 290,
+    "small": 970, "small.en": 970,
+    "medium": 3060, "medium.en": 3060,
+    "large": 6180, "large-v1": 6180, "large-v2": 6180, "large-v3": 6180,
+    "turbo": 3240, "large-v3-turbo": 3240,
+}
+
+
+def _default_device():
+    dev = os.getenv("WHISPER_DEVICE")
+    if dev:
+        return dev
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+
+def _load_whisper(name, device, compute_type):
+    import whisper
+    model = whisper.load_model(name, device=device)
+    if compute_type in ("float16", "fp16") and device != "cpu":
+        model = model.half()
+    return model
+
+
+def _model_size_mb(model, name):
+    try:
+        return sum(p.numel() * p.element_size() for p in model.parameters()) / (1024 * 1024)
+    except Exception:
+        return float(MODEL_SIZE_MB.get(name, 1000))
+
+
+class _Entry:
+    def __init__(self, model, size_mb):
+        self.model = model
+        self.size_mb = size_mb
+        self.lock = threading.Lock()  # one transcribe at a time per model
+        self.loaded_at = time.time()
+        self.hits = 0
+
+
+class WhisperModelRegistry:
+    """LRU cache of loaded Whisper models inside a memory budget (MB)."""
+
+    def __init__(self, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, loader=_load_whisper):
+        self.memory_budget_mb = memory_budget_mb
+        self._loader = loader
+        self._entries = OrderedDict()  # key -> _Entry, most recently used last
+        self._lock = threading.Lock()
+        self._loading = {}  # key -> Lock, so one key is never loaded twice at once
+        self.loads = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(name, device=None, compute_type=None):
+        return (name, device or _default_device(), compute_type or DEFAULT_COMPUTE_TYPE)
+
+    def _used_mb(self):
+        return sum(e.size_mb for e in self._entries.values())
+
+    def _evict_for(self, needed_mb, keep=None):
+        """Drop least-recently-used models until `needed_mb` fits. Caller holds _lock."""
+        freed = False
+        while self._entries and self._used_mb() + needed_mb > self.memory_budget_mb:
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            entry = self._entries.pop(key)
+            self.evictions += 1
+            freed = True
+            print(f"[whisper] evicted {key} ({entry.size_mb:.0f} MB)")
+        return freed
+
+    @staticmethod
+    def _release_memory():
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def _entry(self, name, device=None, compute_type=None):
+        key = self.make_key(name, device, compute_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+                return entry
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    entry.hits += 1
+                    return entry
+                freed = self._evict_for(MODEL_SIZE_MB.get(name, 0))
+            if freed:
+                self._release_memory()
+
+            t0 = time.time()
+            try:
+                model = self._loader(key[0], key[1], key[2])
+            except Exception:
+                with self._lock:
+                    self._loading.pop(key, None)
+                raise
+            entry = _Entry(model, _model_size_mb(model, name))
+            print(f"[whisper] loaded {key} ({entry.size_mb:.0f} MB) in {time.time() - t0:.1f}s")
+
+            with self._lock:
+                self.loads += 1
+                self._entries[key] = entry
+                freed = self._evict_for(0, keep=key)
+                self._loading.pop(key, None)
+            if freed:
+                self._release_memory()
+            return entry
+
+    def get(self, name, device=None, compute_type=None):
+        """Return a resident model, loading it (and evicting LRU models) if needed."""
+        return self._entry(name, device, compute_type).model
+
+    @contextmanager
+    def use(self, name, device=None, compute_type=None):
+        """Like get(), but holds the model's lock so concurrent requests don't share a decode."""
+        entry = self._entry(name, device, compute_type)
+        with entry.lock:
+            yield entry.model
+
+    def warm_up(self, names, device=None, compute_type=None, background=True):
+        """Load `names` ahead of the first request (in a daemon thread by default)."""
+        names = [n.strip() for n in names if n and n.strip()]
+        if not names:
+            return None
+
+        def _run():
+            for n in names:
+                try:
+                    self.get(n, device, compute_type)
+                except Exception as e:
+                    print(f"[whisper] warm-up of {n!r} failed: {e}")
+
+        if not background:
+            _run()
+            return None
+        t = threading.Thread(target=_run, name="whisper-warmup", daemon=True)
+        t.start()
+        return t
+
+    def evict(self, name=None, device=None, compute_type=None):
+        """Evict one model, or everything when name is None."""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self.make_key(name, device, compute_type), None)
+        self._release_memory()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_budget_mb": self.memory_budget_mb,
+                "used_mb": round(self._used_mb(), 1),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "models": [
+                    {"name": k[0], "device": k[1], "compute_type": k[2],
+                     "size_mb": round(e.size_mb, 1), "hits": e.hits}
+                    for k, e in self._entries.items()
+                ],
+            }
+
+
+_registry = WhisperModelRegistry()
+
+
+def get_registry():
+    return _registry
+
+
+def get_whisper_model(name, device=None, compute_type=None):
+    return _registry.get(name, device, compute_type)
+
+
+def whisper_model(name, device=None, compute_type=None):
+    """Context manager: `with whisper_model("base") as model: model.transcribe(...)`."""
+    return _registry.use(name, device, compute_type)
+
+
+def warm_up_whisper_models(names=None, background=True):
+    """Warm the registry from `names` or WHISPER_WARMUP_MODELS (no-op when empty)."""
+    if names is None:
+        names = os.getenv("WHISPER_WARMUP_MODELS", "").split(",")
+    return _registry.warm_up(names, background=background)
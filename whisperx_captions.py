@@ -8,6 +8,9 @@ import sys
 from dataclasses import dataclass
 from typing import List, Optional, Tuple
 
+import media_probe
+import transcription_cache
+
 
 DEFAULT_MODEL = "large-v3"
 DEFAULT_COMPUTE_TYPE = "int8"
@@ -68,19 +71,10 @@ def pick_font_for_language(lang: str) -> str:
 
 def ffprobe_resolution(video_path: str) -> Tuple[int, int]:
     which_or_die("ffprobe")
-    cmd = [
-        "ffprobe", "-v", "error",
-        "-select_streams", "v:0",
-        "-show_entries", "stream=width,height",
-        "-of", "json",
-        video_path
-    ]
-    p = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    data = json.loads(p.stdout)
-    streams = data.get("streams", [])
-    if not streams:
+    res = media_probe.resolution(video_path)
+    if res is None:
         raise RuntimeError("Could not detect video resolution (no video stream found).")
-    return int(streams[0]["width"]), int(streams[0]["height"])
+    return res
 
 
 def extract_audio_wav(video_path: str, wav_path: str):
@@ -127,10 +121,29 @@ def newest_json(out_dir: str) -> str:
 
 
 def run_whisperx(wav_path: str, out_dir: str, model: str, compute_type: str, vad_method: str,
-                language: Optional[str] = None, device: Optional[str] = None) -> str:
-    which_or_die("whisperx")
+                language: Optional[str] = None, device: Optional[str] = None,
+                use_cache: bool = True) -> str:
     os.makedirs(out_dir, exist_ok=True)
 
+    # Same audio + model + language + decoding options -> reuse the cached JSON
+    cache_key = None
+    if use_cache:
+        cache_key = transcription_cache.make_key(
+            wav_path, model, language,
+            {"compute_type": compute_type, "vad_method": vad_method},
+            engine="whisperx",
+        )
+        cached = transcription_cache.get(cache_key)
+        if cached is not None:
+            base = os.path.splitext(os.path.basename(wav_path))[0]
+            json_path = os.path.join(out_dir, base + ".json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(cached, f, ensure_ascii=False)
+            print(f"[transcript-cache] hit {cache_key[:12]} -> {json_path}")
+            return json_path
+
+    which_or_die("whisperx")
+
     cmd = [
         "whisperx", wav_path,
         "--model", model,
@@ -145,7 +158,11 @@ def run_whisperx(wav_path: str, out_dir: str, model: str, compute_type: str, vad
         cmd += ["--device", device]
 
     run(cmd)
-    return newest_json(out_dir)
+    json_path = newest_json(out_dir)
+    if cache_key:
+        with open(json_path, "r", encoding="utf-8") as f:
+            transcription_cache.put(cache_key, json.load(f))
+    return json_path
 
 
 def flatten_words_from_whisperx(aligned_json: dict) -> List[Word]:
@@ -394,6 +411,7 @@ def main():
     ap.add_argument("--vad_method", default=DEFAULT_VAD_METHOD)
     ap.add_argument("--device", default=None)
     ap.add_argument("--keep", action="store_true")
+    ap.add_argument("--no-cache", action="store_true", help="Always run WhisperX, ignore the transcript cache")
     args = ap.parse_args()
 
     if not os.path.exists(args.video):
@@ -417,6 +435,7 @@ def main():
         vad_method=args.vad_method,
         language=args.language,
         device=args.device,
+        use_cache=not args.no_cache,
     )
 
     with open(json_path, "r", encoding="utf-8") as f: